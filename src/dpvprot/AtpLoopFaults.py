@@ -4,6 +4,15 @@
 
 Called from ATPLoopFaults.bat, reads ATPLoopFaults.dat.
 
+Each case runs in a scratch copy of the ATP directory, so that up to
+num_workers cases can run concurrently. The optional arguments after
+atp_dt are num_workers (default 1), the ATP executable (default runtp,
+any stand-in that writes atp_base.pl4 in its working directory will do),
+and the base seed for the fault inception times (default random). The
+seed, inception time, exit status and wall time of each case are written
+to AtpLoopFaults.csv in pl4path; rerun with the same base seed to
+reproduce the fault inception times exactly.
+
 Public Functions:
     :main: does the work
 """
@@ -15,6 +24,10 @@ import subprocess
 import os
 import shutil
 import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 fault_file = sys.argv[1]
 atp_base = sys.argv[2]
@@ -23,16 +36,38 @@ pl4path = sys.argv[4]
 source_vbase = float(sys.argv[5])
 atp_vpu = float(sys.argv[6])
 atp_dt = sys.argv[7]  # should be formatted to exactly fill 8 columns
+num_workers = 1
+atp_exe = 'runtp'
+base_seed = random.SystemRandom().getrandbits(32)
+if len(sys.argv) > 8:
+  num_workers = int(sys.argv[8])
+if len(sys.argv) > 9:
+  atp_exe = sys.argv[9]
+if len(sys.argv) > 10:
+  base_seed = int(sys.argv[10])
 
 atp_file = atp_base + '.atp'
-atp_list = atp_path + atp_base + '.lis'
-atp_parm = atp_path + atp_base + '.prm'
-atp_pl4 = atp_path + atp_base + '.pl4'
+atp_parm = atp_base + '.prm'
+atp_pl4 = atp_base + '.pl4'
+
+# each worker thread keeps one scratch copy of atp_path for all of its cases
+scratch = threading.local()
+scratch_dirs = []
+scratch_lock = threading.Lock()
+
+def get_scratch_dir():
+  if not hasattr (scratch, 'path'):
+    scratch.path = os.path.join (tempfile.mkdtemp (prefix='atp_'), 'atp')
+    shutil.copytree (atp_path, scratch.path, ignore=shutil.ignore_patterns ('*.pl4', '*.lis'))
+    with scratch_lock:
+      scratch_dirs.append (os.path.dirname (scratch.path))
+  return scratch.path
 
-def run_atp_fault_case(bus, phs, slgf, fname):
-  tfault = random.uniform(0.15, 0.15 + 1/60)
+def run_atp_fault_case(bus, phs, slgf, fname, seed):
+  tfault = random.Random(seed).uniform(0.15, 0.15 + 1/60)
   vsrc = '{:.2f}'.format (atp_vpu * source_vbase)
-  fp = open (atp_parm, mode='w')
+  work_path = get_scratch_dir()
+  fp = open (os.path.join (work_path, atp_parm), mode='w')
   print ('$PARAMETER', file=fp)
   print ('_FLT_=\'' + bus.ljust(5) + '\'', file=fp)
   print ('__DELTAT   ={:s}'.format (atp_dt), file=fp)
@@ -57,13 +92,22 @@ def run_atp_fault_case(bus, phs, slgf, fname):
     print ('_TFAULTC__ ={:.5f}'.format (tfault), file=fp)
   print ('BLANK END PARAMETER', file=fp)
   fp.close()
-  cmdline = 'runtp ' + atp_file + ' >nul'
-  pw0 = subprocess.Popen (cmdline, cwd=atp_path, shell=True)
-  pw0.wait()
+  t0 = time.perf_counter()
+  rc = subprocess.run (atp_exe + ' ' + atp_file, cwd=work_path, shell=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+  elapsed = time.perf_counter() - t0
   # move the pl4 file
-  print ('moving {:s} to {:s}'.format (atp_pl4, fname))
-  shutil.move (atp_pl4, fname)
+  pl4 = os.path.join (work_path, atp_pl4)
+  if os.path.exists (pl4):
+    print ('moving {:s} to {:s}'.format (pl4, fname))
+    shutil.move (pl4, fname)
+  else:
+    print ('{:s} did not produce {:s}, exit status {:d}'.format (atp_exe, fname, rc))
+    if rc == 0:
+      rc = -1
+  return tfault, rc, elapsed
 
+cases = []
 with open(fault_file, mode='r') as infile:
   for ln in infile:
     toks = ln.split()
@@ -75,8 +119,26 @@ with open(fault_file, mode='r') as infile:
     nph = len(toks[2])
     pl4name = pl4path + '/' + 'I1_' + atpbus + '.pl4'
     print ('running SLGF on {:s} at {:s} ({:s}), output to {:s}'.format (phs, atpbus, bus, pl4name))
-    run_atp_fault_case (atpbus, phs, slgf=True, fname=pl4name)
+    cases.append ((atpbus, phs, True, pl4name))
     if nph == 3:
       pl4name = pl4path + '/' + 'I3_' + atpbus + '.pl4'
       print ('running three-phase fault at {:s} ({:s}), output to {:s}'.format (atpbus, bus, pl4name))
-      run_atp_fault_case (atpbus, phs, slgf=False, fname=pl4name)
+      cases.append ((atpbus, phs, False, pl4name))
+
+# the case seeds depend only on base_seed and the case order, not on the scheduling
+rng = random.Random(base_seed)
+seeds = [rng.getrandbits(32) for case in cases]
+print ('{:d} cases on {:d} workers, base seed {:d}'.format (len(cases), num_workers, base_seed))
+try:
+  with ThreadPoolExecutor (max_workers=num_workers) as pool:
+    results = list (pool.map (lambda case, seed: run_atp_fault_case (*case, seed=seed), cases, seeds))
+finally:
+  for path in scratch_dirs:
+    shutil.rmtree (path, ignore_errors=True)
+
+fp = open (pl4path + '/AtpLoopFaults.csv', mode='w')
+print ('pl4,bus,phase,slgf,seed,tfault,status,seconds', file=fp)
+for (atpbus, phs, slgf, pl4name), seed, (tfault, rc, elapsed) in zip (cases, seeds, results):
+  print ('{:s},{:s},{:s},{:d},{:d},{:.5f},{:d},{:.3f}'.format (os.path.basename (pl4name), atpbus, phs,
+         int(slgf), seed, tfault, rc, elapsed), file=fp)
+fp.close()
@@ -3,7 +3,13 @@
 """ Writes a reduced-order ATP model, based on the model reduction of a full-size OpenDSS model.
 Must be called from RunReduction.py
  
+The impedances and model quantities of all reduced branches are computed
+together, as array operations, by PairTable. RunReduction.py writes the
+reduced OpenDSS model from the same table. Output lines are formatted from
+templates into a buffer, which is written to the file in one call.
+
 Public Functions:
+    :PairTable: impedances, line and transformer quantities of all reduced branches
     :WriteAtp: does the work
 
 Args:
@@ -14,6 +20,7 @@ Args:
     seqz (dict): sequence impedancs of retained branches, passed from RunReduction.py
     foundCapacitors (boolean): indicates whether feeder capacitors are in ReducedCapacitors.dss
     bNoCaps (boolean): indicates to ignore shunt capacitance in line pi-section models
+    table (dict): from PairTable, computed here if not provided
 
 Returns:
     str: writes a message if ATP file not produced
@@ -23,6 +30,7 @@ import csv
 import math
 import sys
 import subprocess
+import numpy as np
 import networkx as nx
 
 def GetAtpPhaseList(abc):
@@ -94,7 +102,110 @@ def AtpLoadXfmr(zb, v):
   else:
     return ' 1.0E5 2.0E5{:6.2f}'.format(v)
 
-def WriteAtp(atpfile, pairs, retained, buses, seqz, foundCapacitors, bNoCaps):
+SEPARATOR = 'C =============================================================================\n'
+RLC_HEADER = 'C < n 1>< n 2><ref1><ref2><       R      ><      L       ><      C       ><   >\n'
+XFMR_HEADER = 'C < n 1>< n 2><ref1><ref2><   R><   X><  KV>\n'
+
+LINE_TEMPLATE = SEPARATOR + 'C lumped line ({:s}) from {:s} to {:s}\n' + RLC_HEADER + '$VINTAGE,1\n'
+LINE_ROW_TEMPLATE = '{:d} {:s}{:s}' + PadBlanks (12) + '{:16e}{:16e}{:16e}\n'
+LINE_MUTUAL_TEMPLATE = '  ' + PadBlanks (24) + '{:16e}{:16e}{:16e}\n'
+XFMR_TEMPLATE = SEPARATOR + 'C transformer from {:s} to {:s} is {:s}\n' + XFMR_HEADER
+XFMR_PHASE_TEMPLATE = '  TRANSFORMER' + PadBlanks (25) + '{:s} 1.0E6\n' + '            9999\n' + \
+                      ' 1{:s}' + PadBlanks (12) + '{:s}\n' + ' 2{:s}' + PadBlanks (12) + '{:s}\n'
+LOAD_TEMPLATE = SEPARATOR + 'C parallel load at {:s} is {:.3f} + j{:.3f} kVA\n' + RLC_HEADER + '$VINTAGE,1\n'
+LOAD_R_TEMPLATE = '  {:s}' + PadBlanks (18) + '{:16e}\n'
+LOAD_X_TEMPLATE = '  {:s}' + PadBlanks (34) + '{:16e}\n'
+SHUNT_C_TEMPLATE = '  {:s}' + PadBlanks (50) + '{:16e}\n'
+LOAD_XFMR_TEMPLATE = '  TRANSFORMER' + PadBlanks (25) + '{:s} 1.0E6\n' + '            9999\n' + \
+                     ' 1{:s}' + PadBlanks (18) + '{:s}\n' + ' 2{:s}' + PadBlanks (18) + '{:s}\n'
+CAPACITOR_TEMPLATE = SEPARATOR + 'C capacitor {:s} at {:s} is {:.2f} kVAR\n' + RLC_HEADER + '$VINTAGE,1\n'
+
+def PairTable(pairs, buses, seqz):
+  """Computes the model quantities of every reduced branch, as arrays in the order of pairs.
+
+  Impedances are referred to the bus1 side. Line surge parameters apply where the
+  two ends have the same kV, transformer quantities where they do not.
+
+  Args:
+    pairs (array): link information passed from RunReduction.py
+    buses (dict): bus information, passed from RunReduction.py
+    seqz (dict): sequence impedances of retained buses, passed from RunReduction.py
+
+  Returns:
+    dict: of arrays, with keys kv1, kv2, km, pload, qload, nph (the fewer of the two ends),
+    side2 (phases taken from bus2), flip (bus1 is farther from the source), line,
+    r1, x1, r0, x0, rslgf, xslgf, overhead, z0, z1, v0, v1, c0, c1 (uF),
+    rs, xs, cs, rm, xm, cm (pi-section self and mutual values), delta1, delta2 (delta windings),
+    xhl, sbase, kv1base, kv2base (OpenDSS transformer ratings), xfR1, xfX1, xfN1, xfR2, xfX2, xfN2
+    (ATP transformer windings)
+  """
+  bus1 = [pair['bus1'] for pair in pairs]
+  bus2 = [pair['bus2'] for pair in pairs]
+  kv1 = np.array ([buses[bus]['kV'] for bus in bus1], dtype=float)
+  kv2 = np.array ([buses[bus]['kV'] for bus in bus2], dtype=float)
+  nph1 = np.array ([buses[bus]['nph'] for bus in bus1], dtype=int)
+  nph2 = np.array ([buses[bus]['nph'] for bus in bus2], dtype=int)
+  dist1 = np.array ([float(buses[bus]['dist']) for bus in bus1], dtype=float)
+  dist2 = np.array ([float(buses[bus]['dist']) for bus in bus2], dtype=float)
+  seqz1 = np.array ([seqz[bus][1:5] for bus in bus1], dtype=float).reshape (-1, 4)
+  seqz2 = np.array ([seqz[bus][1:5] for bus in bus2], dtype=float).reshape (-1, 4)
+
+  nt = kv1 / kv2
+  r1 = np.abs(seqz1[:,0] - seqz2[:,0]*nt*nt) # refer to side 1
+  x1 = np.abs(seqz1[:,1] - seqz2[:,1]*nt*nt)
+  r0 = np.abs(seqz1[:,2] - seqz2[:,2]*nt*nt)
+  x0 = np.abs(seqz1[:,3] - seqz2[:,3]*nt*nt)
+  rslgf = np.abs(((2*seqz1[:,0]+seqz1[:,2]) - (2*seqz2[:,0]+seqz2[:,2])*nt*nt) / 3.0)
+  xslgf = np.abs(((2*seqz1[:,1]+seqz1[:,3]) - (2*seqz2[:,1]+seqz2[:,3])*nt*nt) / 3.0)
+  side2 = nph2 < nph1
+  nph = np.where (side2, nph2, nph1)
+
+  # lumped pi sections, with typical surge impedances and velocities
+  overhead = x0 >= 2.0 * x1
+  z0 = np.where (overhead, 800.0, 30.0)
+  z1 = np.where (overhead, 450.0, 30.0)
+  v0 = np.where (overhead, 2.0e5, 1.0e5)  # km/s
+  v1 = np.where (overhead, 3.0e5, 1.0e5)
+  c0 = 1.0e6 / z0 / v0 / 377.0  # uF
+  c1 = 1.0e6 / z1 / v1 / 377.0
+  single = nph == 1
+  xs = np.where (single, xslgf, (x0 + x1 + x1) / 3.0)
+  rs = np.where (single, rslgf, (r0 + r1 + r1) / 3.0)
+  cs = np.where (single, c1, (c0 + c1 + c1) / 3.0)
+  xm = (x0 - x1) / 3.0
+  rm = (r0 - r1) / 3.0
+  cm = (c0 - c1) / 3.0
+
+  # transformers, with any delta winding on the high side
+  bDelta = x0 < 0.8 * x1
+  delta1 = bDelta & (kv1 > kv2)
+  delta2 = bDelta & ~(kv1 > kv2)
+  zbase = np.where (kv1 > kv2, kv1 * kv1, kv2 * kv2)
+  xhl = 100.0 * x1 / zbase
+  sbase = np.where (nph == 2, 1000.0 / 1.5, np.where (single, 1000.0 / 3.0, 1000.0))
+  kv1base = np.where (single & ~delta1, kv1 / math.sqrt(3), kv1)
+  kv2base = np.where (single & ~delta2, kv2 / math.sqrt(3), kv2)
+  xfR1 = 0.5 * r1
+  xfX1 = 0.5 * x1
+  xfR2 = xfR1 * kv2 * kv2 / kv1 / kv1
+  xfX2 = xfX1 * kv2 * kv2 / kv1 / kv1
+
+  return {'kv1': kv1, 'kv2': kv2,
+          'km': np.array ([pair['len'] for pair in pairs], dtype=float),
+          'pload': np.array ([sum(pair['pload']) for pair in pairs], dtype=float),
+          'qload': np.array ([sum(pair['qload']) for pair in pairs], dtype=float),
+          'nph': nph, 'side2': side2, 'flip': dist1 > dist2, 'line': np.abs(kv1 - kv2) < 0.2,
+          'r1': r1, 'x1': x1, 'r0': r0, 'x0': x0, 'rslgf': rslgf, 'xslgf': xslgf,
+          'overhead': overhead, 'z0': z0, 'z1': z1, 'v0': v0, 'v1': v1, 'c0': c0, 'c1': c1,
+          'rs': rs, 'xs': xs, 'cs': cs, 'rm': rm, 'xm': xm, 'cm': cm,
+          'delta1': delta1, 'delta2': delta2, 'xhl': xhl, 'sbase': sbase,
+          'kv1base': kv1base, 'kv2base': kv2base,
+          'xfR1': np.where (delta1, 3.0 * xfR1, xfR1), 'xfX1': np.where (delta1, 3.0 * xfX1, xfX1),
+          'xfN1': np.where (delta2, kv1 / math.sqrt(3.0), kv1),
+          'xfR2': np.where (delta2, 3.0 * xfR2, xfR2), 'xfX2': np.where (delta2, 3.0 * xfX2, xfX2),
+          'xfN2': np.where (delta1, kv2 / math.sqrt(3.0), kv2)}
+
+def WriteAtp(atpfile, pairs, retained, buses, seqz, foundCapacitors, bNoCaps, table=None):
   atp_buses = {}
   atp_loads = {}
   idx = 1
@@ -130,98 +241,46 @@ def WriteAtp(atpfile, pairs, retained, buses, seqz, foundCapacitors, bNoCaps):
               cap = tok[10:]
           atp_capacitors[bus1] = {'capacitor':cap,'atpbus':atp_buses[bus1],'kvar':kvar,'kv':kv,'phases':phases}
 
+  if table is None:
+    table = PairTable (pairs, buses, seqz)
+  cols = {key: val.tolist() for key, val in table.items()}
+  if bNoCaps:
+    cols['cs'] = [0.0] * len(pairs)
+    cols['cm'] = [0.0] * len(pairs)
+
   p_atp = 0.0
   q_atp = 0.0
-  ap = open (atpfile, mode='w')
-  for pair in pairs:
-    idx += 1
+  buf = []
+  for i, pair in enumerate(pairs):
     bus1 = pair['bus1']
     bus2 = pair['bus2']
-    kv1 = buses[bus1]['kV']
-    kv2 = buses[bus2]['kV']
-    nt = kv1 / kv2
-    seqz1 = seqz[pair['bus1']]
-    seqz2 = seqz[pair['bus2']]
-    r1 = abs(seqz1[1] - seqz2[1]*nt*nt) # refer to side 1
-    x1 = abs(seqz1[2] - seqz2[2]*nt*nt)
-    r0 = abs(seqz1[3] - seqz2[3]*nt*nt)
-    x0 = abs(seqz1[4] - seqz2[4]*nt*nt)
-    rslgf = abs(((2*seqz1[1]+seqz1[3]) - (2*seqz2[1]+seqz2[3])*nt*nt) / 3.0) 
-    xslgf = abs(((2*seqz1[2]+seqz1[4]) - (2*seqz2[2]+seqz2[4])*nt*nt) / 3.0) 
-    km = pair['len']
-    nph = buses[bus1]['nph']
-    nph2 = buses[bus2]['nph']
-    phases = GetAtpPhaseList (buses[bus1]['phases'])
-    phases2 = GetAtpPhaseList (buses[bus2]['phases'])
+    nph = cols['nph'][i]
+    phases = GetAtpPhaseList (buses[bus2 if cols['side2'][i] else bus1]['phases'])
     atp1 = atp_buses[bus1]
     atp2 = atp_buses[bus2]
-    if nph2 < nph:
-      nph = nph2
-      phases = phases2
-    if abs(kv1 - kv2) < 0.2:
-      if x0 >= 2.0 * x1: #overhead
-        z0 = 800.0
-        z1 = 450.0
-        v0 = 2.0e5  # km/s
-        v1 = 3.0e5
-        linetype = 'OH'
-      else: #underground
-        z0 = 30.0
-        z1 = 30.0
-        v0 = 1.0e5
-        v1 = 1.0e5
-        linetype = 'UG'
-      c0 = 1.0e6 / z0 / v0 / 377.0  # uF
-      c1 = 1.0e6 / z1 / v1 / 377.0
-      xs = (x0 + x1 + x1) / 3.0
-      xm = (x0 - x1) / 3.0
-      rs = (r0 + r1 + r1) / 3.0
-      rm = (r0 - r1) / 3.0
-      cs = (c0 + c1 + c1) / 3.0
-      cm = (c0 - c1) / 3.0
-      if nph == 1:
-        xs = xslgf
-        rs = rslgf
-        cs = c1
-      if bNoCaps:
-        cs = 0.0
-        cm = 0.0
-      print ('C =============================================================================', file=ap)
-      print ('C lumped line ({:s}) from {:s} to {:s}'.format (linetype, bus1, bus2), file=ap)
-      print ('C < n 1>< n 2><ref1><ref2><       R      ><      L       ><      C       ><   >', file=ap)
-  #    print ('C < n 1>< n 2><ref1><ref2><     R    ><    A     ><    B     ><  Length  ><><>0', file=ap)
-      print ('$VINTAGE,1', file=ap)
-      print ('1 ' + AtpNode (atp1, phases[0]) + AtpNode (atp2, phases[0]) + PadBlanks (12) + AtpRXC (rs, xs, cs), file=ap)
+    if cols['line'][i]:
+      linetype = 'OH' if cols['overhead'][i] else 'UG'
+      self_rxc = (cols['rs'][i], cols['xs'][i], cols['cs'][i])
+      mutual_rxc = (cols['rm'][i], cols['xm'][i], cols['cm'][i])
+      buf.append (LINE_TEMPLATE.format (linetype, bus1, bus2))
+      buf.append (LINE_ROW_TEMPLATE.format (1, AtpNode (atp1, phases[0]), AtpNode (atp2, phases[0]), *self_rxc))
       if nph > 1:
-        print ('2 ' + AtpNode (atp1, phases[1]) + AtpNode (atp2, phases[1]) + PadBlanks (12) + AtpRXC (rm, xm, cm), file=ap)
-        print ('  ' + PadBlanks (24) + AtpRXC (rs, xs, cs), file=ap)
+        buf.append (LINE_ROW_TEMPLATE.format (2, AtpNode (atp1, phases[1]), AtpNode (atp2, phases[1]), *mutual_rxc))
+        buf.append (LINE_MUTUAL_TEMPLATE.format (*self_rxc))
       if nph > 2:
-        print ('3 ' + AtpNode (atp1, phases[2]) + AtpNode (atp2, phases[2]) + PadBlanks (12) + AtpRXC (rm, xm, cm), file=ap)
-        print ('  ' + PadBlanks (24) + AtpRXC (rm, xm, cm), file=ap)
-        print ('  ' + PadBlanks (24) + AtpRXC (rs, xs, cs), file=ap)
-      print ('$VINTAGE,0', file=ap)
+        buf.append (LINE_ROW_TEMPLATE.format (3, AtpNode (atp1, phases[2]), AtpNode (atp2, phases[2]), *mutual_rxc))
+        buf.append (LINE_MUTUAL_TEMPLATE.format (*mutual_rxc))
+        buf.append (LINE_MUTUAL_TEMPLATE.format (*self_rxc))
+      buf.append ('$VINTAGE,0\n')
     else:
       conn = 'Wye-Wye'
-      xfR1 = 0.5 * r1
-      xfX1 = 0.5 * x1
-      xfR2 = xfR1 * kv2 * kv2 / kv1 / kv1
-      xfX2 = xfX1 * kv2 * kv2 / kv1 / kv1
-      xfN1 = kv1
-      xfN2 = kv2
-      if x0 < 0.8 * x1:
-        if kv1 > kv2:
-          conn = 'Delta-Wye'
-          xfN2 /= math.sqrt(3.0)
-          xfR1 *= 3.0
-          xfX1 *= 3.0
-        else:
-          conn = 'Wye-Delta'
-          xfN1 /= math.sqrt(3.0)
-          xfR2 *= 3.0
-          xfX2 *= 3.0
-      print ('C =============================================================================', file=ap)
-      print ('C transformer from {:s} to {:s} is {:s}'.format (bus1, bus2, conn), file=ap)
-      print ('C < n 1>< n 2><ref1><ref2><   R><   X><  KV>', file=ap)
+      if cols['delta1'][i]:
+        conn = 'Delta-Wye'
+      elif cols['delta2'][i]:
+        conn = 'Wye-Delta'
+      winding1 = AtpXfmr (cols['xfR1'][i], cols['xfX1'][i], cols['xfN1'][i])
+      winding2 = AtpXfmr (cols['xfR2'][i], cols['xfX2'][i], cols['xfN2'][i])
+      buf.append (XFMR_TEMPLATE.format (bus1, bus2, conn))
       for ph in phases:
         xfBuses1 = AtpNode (atp1, ph)
         xfBuses2 = AtpNode (atp2, ph)
@@ -234,13 +293,10 @@ def WriteAtp(atpfile, pairs, retained, buses, seqz, foundCapacitors, bNoCaps):
         elif conn == 'Wye-Delta':
           xfBuses1 += PadBlanks(6)
           xfBuses2 += AtpDeltaLaggingNode (atp2, ph)
-        print ('  TRANSFORMER' + PadBlanks (25) + AtpNode ('X' + atp2, ph) + ' 1.0E6', file=ap)
-        print ('            9999', file=ap)
-        print (' 1' + xfBuses1 + PadBlanks(12) + AtpXfmr (xfR1, xfX1, xfN1), file=ap)
-        print (' 2' + xfBuses2 + PadBlanks(12) + AtpXfmr (xfR2, xfX2, xfN2), file=ap)
-    pload = sum(pair['pload'])
+        buf.append (XFMR_PHASE_TEMPLATE.format (AtpNode ('X' + atp2, ph), xfBuses1, winding1, xfBuses2, winding2))
+    pload = cols['pload'][i]
     if pload > 0.0:
-      qload = sum(pair['qload'])
+      qload = cols['qload'][i]
       p_atp += pload
       q_atp += qload
       atp_loads[bus1]['p'] += 0.5 * pload
@@ -261,36 +317,33 @@ def WriteAtp(atpfile, pairs, retained, buses, seqz, foundCapacitors, bNoCaps):
       kv1 = buses[bus]['kV']
       nph = buses[bus]['nph']
       phases = GetAtpPhaseList (buses[bus]['phases'])
-      print ('C =============================================================================', file=ap)
-      print ('C parallel load at {:s} is {:.3f} + j{:.3f} kVA'.format (bus, pload, qload), file=ap)
-      print ('C < n 1>< n 2><ref1><ref2><       R      ><      L       ><      C       ><   >', file=ap)
-      print ('$VINTAGE,1', file=ap)
+      buf.append (LOAD_TEMPLATE.format (bus, pload, qload))
       pload *= 0.001 # converting kW to MW
       qload *= 0.001 # converting kVAR to MVAR
       rload = nph * kvld * kvld / pload
       for ph in phases:
-        print ('  ' + AtpNode (atp1, atpLoadPhase[ph]) + PadBlanks(18) + '{:16e}'.format(rload), file=ap)
+        buf.append (LOAD_R_TEMPLATE.format (AtpNode (atp1, atpLoadPhase[ph]), rload))
       if qload > 0.0:
         xload = nph * kvld * kvld / qload
         for ph in phases:
-          print ('  ' + AtpNode (atp1, atpLoadPhase[ph]) + PadBlanks(34) + '{:16e}'.format(xload), file=ap)
+          buf.append (LOAD_X_TEMPLATE.format (AtpNode (atp1, atpLoadPhase[ph]), xload))
       sload = math.sqrt (pload * pload + qload * qload) / nph # MVA per phase
       if bNoCaps == False:
         cuf = 20.0 * sload * 0.001  # 1 nF per 50 kVA transformer
         for ph in phases:
-          print ('  ' + AtpNode (atp1, ph) + PadBlanks(50) + '{:16e}'.format(cuf), file=ap)
-      print ('$VINTAGE,0', file=ap)
+          buf.append (SHUNT_C_TEMPLATE.format (AtpNode (atp1, ph), cuf))
+      buf.append ('$VINTAGE,0\n')
       if nph > 1:
         kv1 /= math.sqrt(3.0)
       zbase1 = 0.5 * kv1 * kv1 / sload  # half of each transformer impedance on each winding
       zbld = 0.5 * kvld * kvld / sload
+      winding1 = AtpLoadXfmr (zbase1, kv1)
+      winding2 = AtpLoadXfmr (zbld, kvld)
       nLoadXfmr += 1
-      print ('C < n 1>< n 2><ref1><ref2><   R><   X><  KV>', file=ap)
+      buf.append (XFMR_HEADER)
       for ph in phases:
-        print ('  TRANSFORMER' + PadBlanks (25) + AtpNode ('Y' + str(nLoadXfmr), ph) + ' 1.0E6', file=ap)
-        print ('            9999', file=ap)
-        print (' 1' + AtpNode (atp1, ph) + PadBlanks(18) + AtpLoadXfmr (zbase1, kv1), file=ap)
-        print (' 2' + AtpNode (atp1, atpLoadPhase[ph]) + PadBlanks(18) + AtpLoadXfmr (zbld, kvld), file=ap)
+        buf.append (LOAD_XFMR_TEMPLATE.format (AtpNode ('Y' + str(nLoadXfmr), ph), AtpNode (atp1, ph), winding1,
+                                               AtpNode (atp1, atpLoadPhase[ph]), winding2))
 
   for bus in atp_capacitors:
     atp1 = atp_capacitors[bus]['atpbus']
@@ -298,17 +351,12 @@ def WriteAtp(atpfile, pairs, retained, buses, seqz, foundCapacitors, bNoCaps):
     kv = atp_capacitors[bus]['kv']
     kvar = atp_capacitors[bus]['kvar']
     cuf = 1000.0 * kvar / kv / kv / 377.0
-    print ('C =============================================================================', file=ap)
-    print ('C capacitor {:s} at {:s} is {:.2f} kVAR'.format (cap, bus, kvar), file=ap)
-    print ('C < n 1>< n 2><ref1><ref2><       R      ><      L       ><      C       ><   >', file=ap)
-    print ('$VINTAGE,1', file=ap)
+    buf.append (CAPACITOR_TEMPLATE.format (cap, bus, kvar))
     for ph in ['A','B','C']:
-      print ('  ' + AtpCapNode (atp1, ph) + PadBlanks(50) + '{:16e}'.format(cuf), file=ap)
-    print ('$VINTAGE,0', file=ap)
-  ap.close()
-
-  ab = open ('ReducedNetwork.atpmap', mode='w')
-  for key in atp_buses:
-    print (key, atp_buses[key], buses[key]['phases'], file=ab)
-  ab.close()
+      buf.append (SHUNT_C_TEMPLATE.format (AtpCapNode (atp1, ph), cuf))
+    buf.append ('$VINTAGE,0\n')
+  with open (atpfile, mode='w') as ap:
+    ap.write (''.join (buf))
 
+  with open ('ReducedNetwork.atpmap', mode='w') as ab:
+    ab.write (''.join (['{:s} {:s} {:s}\n'.format (key, atp_buses[key], buses[key]['phases']) for key in atp_buses]))
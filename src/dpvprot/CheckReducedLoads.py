@@ -8,11 +8,12 @@ Public Functions:
     :main: does the work
 """
 
-import csv
 import math
 import sys
 import operator
 import subprocess
+import numpy as np
+import dpvprot.opendss_exports as dssx
 
 atp_base = sys.argv[1]
 atp_path = '../../ATP/'
@@ -45,6 +46,10 @@ if 'SHE' in atp_base:
   tokPVPCCB = 'PVTWOB'
   tokPVPCCC = 'PVTWOC'
 
+# nphases, kVbase and the first three node voltage magnitudes; the voltage
+# bases come from the same table, already parsed for the load flow
+VOLTAGES_ELEM_COLUMNS = [4, 6, 10, 14, 18]
+
 def atp_line_value(line, tok, pos):
   vals = line.split(tok)
   toks = vals[1].split()
@@ -176,63 +181,51 @@ def get_opendss_loadflow(basefile, irrad):
   vfdr = 0.0
   pfdr = 0.0
   qfdr = 0.0
-  with open (fdr_head + '_EXP_Summary.CSV', 'r') as fp:
-    reader = csv.reader(fp)
-    next (reader, None)
-    for row in reader:
-      vmax = float(row[15])
-      vmin = float(row[16])
-  with open (fdr_head + '_EXP_VOLTAGES_ELEM.CSV', 'r') as fp:
-    reader = csv.reader(fp)
-    next (reader, None)
-    for row in reader:
-      if (pv_elem == row[0].upper()) or (fdr_elem == row[0].upper()):
-        nph = float(row[4])
-        vavg = float(row[10])
-        if nph > 1.0:
-          vavg += float(row[14])
-        if nph > 2.0:
-          vavg += float(row[18])
-        vavg /= nph
-        if pv_elem == row[0].upper():
-          vpcc = vavg
-        else:
-          vfdr = vavg
-
-  with open (fdr_head + '_EXP_ElemPowers.CSV', 'r') as fp:
-    reader = csv.reader(fp)
-    next (reader, None)
-    for row in reader:
-      if (pv_elem == row[0].upper()) or (fdr_elem == row[0].upper()):
-        ncond = float(row[2])
-        psum = float(row[3])
-        qsum = float(row[4])
-        if ncond > 1.0:
-          psum += float(row[5])
-          qsum += float(row[6])
-        if ncond > 2.0:
-          psum += float(row[7])
-          qsum += float(row[8])
-        if pv_elem == row[0].upper():
-          ppcc = psum
-          qpcc = qsum
-        else:
-          pfdr = psum
-          qfdr = qsum
+  summary = dssx.read_csv_columns (fdr_head + '_EXP_Summary.CSV', [15, 16])
+  if len(summary) > 0:
+    name, vmax, vmin = summary[-1].tolist()
+
+  volts = dssx.read_csv_columns (fdr_head + '_EXP_VOLTAGES_ELEM.CSV', VOLTAGES_ELEM_COLUMNS)
+  for name, nph, kvbase, va, vb, vc in volts[np.isin (volts['name'], [pv_elem, fdr_elem])].tolist():
+    vavg = va
+    if nph > 1.0:
+      vavg += vb
+    if nph > 2.0:
+      vavg += vc
+    vavg /= nph
+    if pv_elem == name:
+      vpcc = vavg
+    else:
+      vfdr = vavg
+
+  flows = dssx.read_csv_columns (fdr_head + '_EXP_ElemPowers.CSV', [2, 3, 4, 5, 6, 7, 8])
+  for name, ncond, pa, qa, pb, qb, pc, qc in flows[np.isin (flows['name'], [pv_elem, fdr_elem])].tolist():
+    psum = pa
+    qsum = qa
+    if ncond > 1.0:
+      psum += pb
+      qsum += qb
+    if ncond > 2.0:
+      psum += pc
+      qsum += qc
+    if pv_elem == name:
+      ppcc = psum
+      qpcc = qsum
+    else:
+      pfdr = psum
+      qfdr = qsum
 
   return vmin, vmax, vfdr, vpcc, pfdr, qfdr, ppcc, qpcc
 
 def get_opendss_voltage_bases():
   vbase_fdr = 1.0
   vbase_pcc = 1.0
-  with open (fdr_head + '_EXP_VOLTAGES_ELEM.CSV', 'r') as fp:
-    reader = csv.reader(fp)
-    next (reader, None)
-    for row in reader:
-      if pv_elem == row[0].upper():
-        vbase_pcc = 1000.0 * float(row[6]) * math.sqrt(2.0/3.0)
-      elif fdr_elem == row[0].upper():
-        vbase_fdr = 1000.0 * float(row[6]) * math.sqrt(2.0/3.0)
+  volts = dssx.read_csv_columns (fdr_head + '_EXP_VOLTAGES_ELEM.CSV', VOLTAGES_ELEM_COLUMNS)
+  for name, nph, kvbase, va, vb, vc in volts[np.isin (volts['name'], [pv_elem, fdr_elem])].tolist():
+    if pv_elem == name:
+      vbase_pcc = 1000.0 * kvbase * math.sqrt(2.0/3.0)
+    else:
+      vbase_fdr = 1000.0 * kvbase * math.sqrt(2.0/3.0)
   return vbase_fdr, vbase_pcc
 
 print ('DESCRIPTION       Vmin   Vmax   Vfdr   Vpcc    Pfdr      Qfdr     Ppcc')
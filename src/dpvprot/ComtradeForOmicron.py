@@ -11,8 +11,9 @@ Public Functions:
 import sys
 import math
 from comtrade import Comtrade
+import atp_channels
+import decimation
 import numpy as np
-from scipy import signal
 import datetime as dt
 
 def comtrade_dt_format(ts):
@@ -59,8 +60,7 @@ for i in range(npv):
     xf = fdr['XFM'][i]
     pvnames.append(pv)
     xfnames[pv] = xf
-    pvChannels[pv] = {'Va':-1,'Vb':-1,'Vc':-1,'Ia':-1,'Ib':-1,'Ic':-1,
-        'XfVa':-1,'XfVb':-1,'XfVc':-1,'XfIa':-1,'XfIb':-1,'XfIc':-1}
+    pvChannels[pv] = {}
 
 rec = Comtrade()
 rec.load(atp_base + '.cfg', atp_base + '.dat')
@@ -71,44 +71,16 @@ fs = int(rec.cfg.sample_rates[0][0])  # there will be only one from ATP
 tdec = t[::q]
 ndec = int (tdec.shape[0])
 
-for i in range(rec.analog_count):
-    lbl = rec.analog_channel_ids[i]
-    vals = rec.analog[i]
-    a = rec.cfg.analog_channels[i].a
-    b = rec.cfg.analog_channels[i].b
-    if 'V-node' in lbl:
-        for pv in pvnames:
-            xf = xfnames[pv]
-            if xf+'A' in lbl:
-                pvChannels[pv]['XfVa'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif xf+'B' in lbl:
-                pvChannels[pv]['XfVb'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif xf+'C' in lbl:
-                pvChannels[pv]['XfVc'] = [signal.decimate (np.array (vals), int(q)), a, b]
-    elif 'I-branch' in lbl:
-        for pv in pvnames:
-            xf = xfnames[pv]
-            if pv+'A' in lbl:
-                pvChannels[pv]['Ia'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif pv+'B' in lbl:
-                pvChannels[pv]['Ib'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif pv+'C' in lbl:
-                pvChannels[pv]['Ic'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif xf+'A' in lbl:
-                pvChannels[pv]['XfIa'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif xf+'B' in lbl:
-                pvChannels[pv]['XfIb'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif xf+'C' in lbl:
-                pvChannels[pv]['XfIc'] = [signal.decimate (np.array (vals), int(q)), a, b]
-    elif 'V-branch' in lbl:
-        for pv in pvnames:
-            xf = xfnames[pv]
-            if pv+'A' in lbl:
-                pvChannels[pv]['Va'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif pv+'B' in lbl:
-                pvChannels[pv]['Vb'] = [signal.decimate (np.array (vals), int(q)), a, b]
-            elif pv+'C' in lbl:
-                pvChannels[pv]['Vc'] = [signal.decimate (np.array (vals), int(q)), a, b]
+chmap = atp_channels.parse_channel_ids (rec.analog_channel_ids)
+for pv in pvnames:
+    xf = xfnames[pv]
+    locations = {'V': ('V-branch', pv), 'I': ('I-branch', pv), 'XfV': ('V-node', xf), 'XfI': ('I-branch', xf, [pv])}
+    blocks = atp_channels.resolve_channels (rec, locations, process=lambda x: decimation.decimate (x, fs, fs / q), chmap=chmap)
+    for key, loc in locations.items():
+        for row, i in enumerate (atp_channels.find_phases (chmap, *loc)):
+            a = rec.cfg.analog_channels[i].a
+            b = rec.cfg.analog_channels[i].b
+            pvChannels[pv][key + 'abc'[row]] = [blocks[key][row], a, b]
 
 print ('original fs =', fs, 'n =', n, '; decimated by', q, 'to fs=', int (fs/q), 'and n=', ndec)
 print ('writing to', fpath + '.cfg')
@@ -11,6 +11,7 @@ Public Functions:
 import sys
 import math
 from comtrade import Comtrade
+import atp_channels
 import numpy as np
 from scipy import signal
 import datetime as dt
@@ -60,8 +61,7 @@ for i in range(npv):
     xf = fdr['XFM'][i]
     pvnames.append(pv)
     xfnames[pv] = xf
-    pvChannels[pv] = {'Va':-1,'Vb':-1,'Vc':-1,'Ia':-1,'Ib':-1,'Ic':-1,
-        'XfVa':-1,'XfVb':-1,'XfVc':-1,'XfIa':-1,'XfIb':-1,'XfIc':-1}
+    pvChannels[pv] = {}
 
 rec = Comtrade()
 rec.load(atp_base + '.cfg', atp_base + '.dat')
@@ -69,44 +69,16 @@ t = np.array(rec.time)
 n = int(rec.total_samples)
 fs = int(rec.cfg.sample_rates[0][0])  # there will be only one from ATP
 
-for i in range(rec.analog_count):
-    lbl = rec.analog_channel_ids[i]
-    vals = rec.analog[i]
-    a = rec.cfg.analog_channels[i].a
-    b = rec.cfg.analog_channels[i].b
-    if 'V-node' in lbl:
-        for pv in pvnames:
-            xf = xfnames[pv]
-            if xf+'A' in lbl:
-                pvChannels[pv]['XfVa'] = [np.array (vals), a, b]
-            elif xf+'B' in lbl:
-                pvChannels[pv]['XfVb'] = [np.array (vals), a, b]
-            elif xf+'C' in lbl:
-                pvChannels[pv]['XfVc'] = [np.array (vals), a, b]
-    elif 'I-branch' in lbl:
-        for pv in pvnames:
-            xf = xfnames[pv]
-            if pv+'A' in lbl:
-                pvChannels[pv]['Ia'] = [np.array (vals), a, b]
-            elif pv+'B' in lbl:
-                pvChannels[pv]['Ib'] = [np.array (vals), a, b]
-            elif pv+'C' in lbl:
-                pvChannels[pv]['Ic'] = [np.array (vals), a, b]
-            elif xf+'A' in lbl:
-                pvChannels[pv]['XfIa'] = [np.array (vals), a, b]
-            elif xf+'B' in lbl:
-                pvChannels[pv]['XfIb'] = [np.array (vals), a, b]
-            elif xf+'C' in lbl:
-                pvChannels[pv]['XfIc'] = [np.array (vals), a, b]
-    elif 'V-branch' in lbl:
-        for pv in pvnames:
-            xf = xfnames[pv]
-            if pv+'A' in lbl:
-                pvChannels[pv]['Va'] = [np.array (vals), a, b]
-            elif pv+'B' in lbl:
-                pvChannels[pv]['Vb'] = [np.array (vals), a, b]
-            elif pv+'C' in lbl:
-                pvChannels[pv]['Vc'] = [np.array (vals), a, b]
+chmap = atp_channels.parse_channel_ids (rec.analog_channel_ids)
+for pv in pvnames:
+    xf = xfnames[pv]
+    locations = {'V': ('V-branch', pv), 'I': ('I-branch', pv), 'XfV': ('V-node', xf), 'XfI': ('I-branch', xf, [pv])}
+    blocks = atp_channels.resolve_channels (rec, locations, chmap=chmap)
+    for key, loc in locations.items():
+        for row, i in enumerate (atp_channels.find_phases (chmap, *loc)):
+            a = rec.cfg.analog_channels[i].a
+            b = rec.cfg.analog_channels[i].b
+            pvChannels[pv][key + 'abc'[row]] = [blocks[key][row], a, b]
 
 print ('original fs =', fs, 'n =', n)
 print ('writing to', outpath + '.cfg')
@@ -12,71 +12,26 @@ import sys
 import math
 import matplotlib.pyplot as plt
 from comtrade import Comtrade
+import atp_channels
+import decimation
+import event_timing
 import numpy as np
-from scipy import signal
 
 td21_cycles = 1
 td21_m = 0.85
 td21_k = 1.05
 warm_cycles = 5
-
-def find_td21_pickedup_times (Da, Db, Dc, vthresh, t, tfault):
-    tlast = -1.0
-    td21t = -1.0
-    td21_len = 0.0
-    for i in range(Da.shape[0]):
-        if t[i] < tfault:
-            continue
-        if (Da[i] > vthresh) or (Db[i] > vthresh) or (Dc[i] > vthresh):
-            tlast = t[i] - tfault
-        if td21t < 0.0:
-            if (Da[i] > vthresh) or (Db[i] > vthresh) or (Dc[i] > vthresh):
-                td21t = t[i] - tfault
-    if td21t >= 0.0:
-        td21_len = tlast - td21t
-    return td21t, td21_len
-
-def get_phasors(v, ccos, csin):
-    ndec = v.shape[0]
-    rs = ccos.shape[0] - 1
-    re = np.zeros (ndec)
-    im = np.zeros (ndec)
-    rms = np.zeros(ndec)
-    ang = np.zeros(ndec)
-    cpx = np.zeros(ndec, dtype=complex)
-    scale = 2 / float(rs)
-    dang = 2 * math.pi / float(rs)
-    refang = 0
-    for i in range(ndec):
-        i1 = max (0, i-rs)
-        wlen = min (i, rs)
-        re[i] = scale * np.dot (v[i1:i], ccos[0:wlen])
-        im[i] = -scale * np.dot (v[i1:i], csin[0:wlen])
-        cpx.real[i] = re[i]
-        cpx.imag[i] = im[i]
-        rms[i] = math.sqrt(0.5 * (re[i]*re[i] + im[i]*im[i]))
-        raw = math.atan2(im[i],re[i]) + math.pi
-        ref = np.fmod (refang, 2 * math.pi)
-        raw = raw - ref
-        if raw < 0:
-            raw += 2 * math.pi
-        ang[i] = raw - math.pi
-        refang += dang
-    return cpx, rms, ang
+pre_cycles = 1
+post_cycles = 5
 
 def get_incremental(x, lookback):
-    n = x.shape[0] - lookback
-    d = np.zeros (n)
-    for i in range(n):
-        d[i] = x[i+lookback] - x[i]
-    return d
+    # one-cycle delta along the last axis of a signal or a block of signals
+    n = x.shape[-1] - lookback
+    return x[..., lookback:] - x[..., :n]
 
 def get_restraint(x, lookback):
-    n = x.shape[0] - lookback
-    d = np.zeros (n)
-    for i in range(n):
-        d[i] = x[i]
-    return d
+    n = x.shape[-1] - lookback
+    return x[..., :n].copy()
 
 def running_mean(x, N):
     cumsum = np.cumsum(np.insert(x, 0, 0)) 
@@ -88,7 +43,7 @@ def set_plot_options (ax, ylabel, xticks):
     ax.set_xticks(xticks)
     ax.set_xlim(xticks[0], xticks[-1])
 
-def plot_location(loc, title, Va, Vb, Vc, Ia, Ib, Ic, vnom, inom, tdec, tfault, rs, ccos, csin, ZL, vthresh, png_file = ''):
+def plot_location(loc, title, Va, Vb, Vc, Ia, Ib, Ic, vnom, inom, tdec, tfault, rs, ZL, vthresh, png_file = ''):
     mZL = td21_m * ZL
     vthresh = vthresh * td21_k / 1000.0
     vnom /= 1000.0
@@ -97,10 +52,10 @@ def plot_location(loc, title, Va, Vb, Vc, Ia, Ib, Ic, vnom, inom, tdec, tfault,
     ifirstz = warm_cycles * rs
     lookback = td21_cycles * rs
     dt = 1.0 / rs / 60.0
-    tstart = tfault - 1/60
-    tend = tfault + 5/60
-    nstart = int(tstart / dt + 0.5)
-    nend = int(tend / dt - 0.5)
+    tstart = tfault - pre_cycles / 60.0
+    tend = tfault + post_cycles / 60.0
+    nstart = int((tstart - tdec[0]) / dt + 0.5)
+    nend = int((tend - tdec[0]) / dt - 0.5)
     tplot = (tdec[nstart:nend] - tfault) * 60.0
     tthresh_plot = [tplot[0], tplot[-1]]
     vthresh_plot = [vthresh, vthresh]
@@ -111,16 +66,10 @@ def plot_location(loc, title, Va, Vb, Vc, Ia, Ib, Ic, vnom, inom, tdec, tfault,
 
     nd1 = nstart-lookback
     nd2 = nend-lookback
-    dIa = get_incremental (Ia, lookback)[nd1:nd2] / 1.0e3
-    dIb = get_incremental (Ib, lookback)[nd1:nd2] / 1.0e3
-    dIc = get_incremental (Ic, lookback)[nd1:nd2] / 1.0e3
-    dVa = get_incremental (Va, lookback)[nd1:nd2] / 1.0e3
-    dVb = get_incremental (Vb, lookback)[nd1:nd2] / 1.0e3
-    dVc = get_incremental (Vc, lookback)[nd1:nd2] / 1.0e3
+    block = np.vstack ((Ia, Ib, Ic, Va, Vb, Vc))
+    dIa, dIb, dIc, dVa, dVb, dVc = get_incremental (block, lookback)[:, nd1:nd2] / 1.0e3
     # restraint voltage - just for one cycle after the fault
-    Rag = get_restraint (Va, lookback)[nd1:nd2] / 1.0e3
-    Rbg = get_restraint (Vb, lookback)[nd1:nd2] / 1.0e3
-    Rcg = get_restraint (Vc, lookback)[nd1:nd2] / 1.0e3
+    Rag, Rbg, Rcg = get_restraint (block[3:], lookback)[:, nd1:nd2] / 1.0e3
     Rag[:rs] = 0.0
     Rag[2*rs:] = 0.0
     Rbg[:rs] = 0.0
@@ -157,8 +106,11 @@ def plot_location(loc, title, Va, Vb, Vc, Ia, Ib, Ic, vnom, inom, tdec, tfault,
     Dag = running_mean (np.absolute (dVa - mZL * dIa), Nmean)
     Dbg = running_mean (np.absolute (dVb - mZL * dIb), Nmean)
     Dcg = running_mean (np.absolute (dVc - mZL * dIc), Nmean)
-    td21p, td21p_len = find_td21_pickedup_times (Dab, Dbc, Dca, vthresh, tplot[Nmean-1:]/60, 0.0)
-    td21g, td21g_len = find_td21_pickedup_times (Dag, Dbg, Dcg, vthresh, tplot[Nmean-1:]/60, 0.0)
+    td21 = event_timing.pickup_times (np.vstack ((np.any (np.vstack ((Dab, Dbc, Dca)) > vthresh, axis=0),
+                                                  np.any (np.vstack ((Dag, Dbg, Dcg)) > vthresh, axis=0))),
+                                      tplot[Nmean-1:]/60, tmin=0.0)
+    td21p, td21g = td21['first']
+    td21p_len, td21g_len = td21['span']
 
     # operating voltage
     Dab = dVab - mZL * dIab
@@ -290,8 +242,6 @@ feeders = [{'directory':'c:/pl4/SHE215','FdrKV':12.47,'FdrZL':0.86,'FdrS':8.0,
            {'directory':'c:/pl4/Louisa','FdrKV':34.50,'FdrZL':3.15,'FdrS':20.0,
             'PV':['PVPCC'],'Vbase':[416.0],'Sbase':[20e6],'XFM':['PVXFM'],'PVZL':[8.28],
             'capdirectory':'c:/pl4/Capacitors'}]
-faultChannels = {'Ia':-1,'Ib':-1,'Ic':-1}
-feederChannels = {'Va':-1,'Vb':-1,'Vc':-1,'Ia':-1,'Ib':-1,'Ic':-1}
 pvChannels = {}
 pvnames = []
 vnoms = {}
@@ -334,7 +284,6 @@ if len(png_base) < 1:
     print (atp_base, busname, phases, fdr['PV'])
 
 npv = len(fdr['PV'])
-suffix = 0
 for i in range(npv):
     pv = fdr['PV'][i]
     xf = fdr['XFM'][i]
@@ -347,11 +296,6 @@ for i in range(npv):
     xfvnoms[pv] = fdrNomV
     xfinoms[pv] = inom * vnom / fdrNomV
     zmags[pv] = fdr['PVZL'][i]
-    if npv > 1:
-        suffix = i + 1
-    pvChannels[pv] = {'Va':-1,'Vb':-1,'Vc':-1,'Ia':-1,'Ib':-1,'Ic':-1,
-        'XfVa':-1,'XfVb':-1,'XfVc':-1,'XfIa':-1,'XfIb':-1,'XfIc':-1,
-        'wp':-1,'ang':-1,'Vmag':-1,'Imag':-1,'ModelSuffix':suffix}
 
 rec = Comtrade()
 rec.load(atp_base + '.cfg', atp_base + '.dat')
@@ -360,106 +304,26 @@ n = rec.total_samples
 fs = rec.cfg.sample_rates[0][0]  # there will be only one from ATP
 
 rs = 256
-q = fs / rs / 60
-intq = int(q+0.5)
+up, down = decimation.rate_factors (fs, rs * 60)
 if len(png_base) < 1:
-    print ('fsample = {:.2f}, for {:d} samples per cycle, the decimation factor is {:.4f} rounded to {:d}'.format (fs, rs, q, intq))
-tdec = t[::intq]
-ndec = tdec.shape[0]
-ccos = np.ones(rs+1)
-csin = np.ones(rs+1)
-for i in range(rs+1):
-    arg = 2.0 * math.pi * float(i) / float(rs)
-    ccos[i] = math.cos(arg)
-    csin[i] = math.sin(arg)
-
-for i in range(rec.analog_count):
-    lbl = rec.analog_channel_ids[i]
-#    print (i, lbl)
-    if 'V-node' in lbl:
-        if 'FDR  A' in lbl:
-            feederChannels['Va'] = signal.decimate (np.array (rec.analog[i]), intq)
-        elif 'FDR  B' in lbl:
-            feederChannels['Vb'] = signal.decimate (np.array (rec.analog[i]), intq)
-        elif 'FDR  C' in lbl:
-            feederChannels['Vc'] = signal.decimate (np.array (rec.analog[i]), intq)
-        else:
-            for pv in pvnames:
-                xf = xfnames[pv]
-                if xf+'A' in lbl:
-                    pvChannels[pv]['XfVa'] = signal.decimate (np.array (rec.analog[i]), intq)
-                elif xf+'B' in lbl:
-                    pvChannels[pv]['XfVb'] = signal.decimate (np.array (rec.analog[i]), intq)
-                elif xf+'C' in lbl:
-                    pvChannels[pv]['XfVc'] = signal.decimate (np.array (rec.analog[i]), intq)
-
-    elif 'I-branch' in lbl:
-        for pv in pvnames:
-            xf = xfnames[pv]
-            if pvChannels[pv]['ModelSuffix'] > 0:
-                wpMatch = 'MODELS WP' + str(pvChannels[pv]['ModelSuffix'])
-                angMatch = 'MODELS ANG' + str(pvChannels[pv]['ModelSuffix'])
-                vMatch = 'MODELS MAG' + str(pvChannels[pv]['ModelSuffix'])
-                iMatch = 'MODELS IRMS' + str(pvChannels[pv]['ModelSuffix'])
-            else:
-                wpMatch = 'MODELS WP'
-                angMatch = 'MODELS ANG'
-                vMatch = 'MODELS MAG'
-                iMatch = 'MODELS IRMS1'
-            if pv+'A' in lbl:
-                pvChannels[pv]['Ia'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif pv+'B' in lbl:
-                pvChannels[pv]['Ib'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif pv+'C' in lbl:
-                pvChannels[pv]['Ic'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif xf+'A' in lbl:
-                pvChannels[pv]['XfIa'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif xf+'B' in lbl:
-                pvChannels[pv]['XfIb'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif xf+'C' in lbl:
-                pvChannels[pv]['XfIc'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif wpMatch in lbl:
-                pvChannels[pv]['wp'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif angMatch in lbl:
-                pvChannels[pv]['ang'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif vMatch in lbl:
-                pvChannels[pv]['Vmag'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif iMatch in lbl:
-                pvChannels[pv]['Imag'] = signal.decimate (np.array (rec.analog[i]), intq)
-        if 'FDR  A' in lbl:
-            feederChannels['Ia'] = signal.decimate (np.array (rec.analog[i]), intq)
-        elif 'FDR  B' in lbl:
-            feederChannels['Ib'] = signal.decimate (np.array (rec.analog[i]), intq)
-        elif 'FDR  C' in lbl:
-            feederChannels['Ic'] = signal.decimate (np.array (rec.analog[i]), intq)
-        if 'FAULTA' in lbl:
-            faultChannels['Ia'] = signal.decimate (np.array (rec.analog[i]), intq)
-        elif 'FAULTB' in lbl:
-            faultChannels['Ib'] = signal.decimate (np.array (rec.analog[i]), intq)
-        elif 'FAULTC' in lbl:
-            faultChannels['Ic'] = signal.decimate (np.array (rec.analog[i]), intq)
-    elif 'V-branch' in lbl:
-        for pv in pvnames:
-            xf = xfnames[pv]
-            if pv+'A' in lbl:
-                pvChannels[pv]['Va'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif pv+'B' in lbl:
-                pvChannels[pv]['Vb'] = signal.decimate (np.array (rec.analog[i]), intq)
-            elif pv+'C' in lbl:
-                pvChannels[pv]['Vc'] = signal.decimate (np.array (rec.analog[i]), intq)
-
-tfault = 0.0
-ithresh = 10.0
-for i in range(ndec):
-    if abs(faultChannels['Ia'][i]) > ithresh:
-        tfault = tdec[i]
-        break
-    if abs(faultChannels['Ib'][i]) > ithresh:
-        tfault = tdec[i]
-        break
-    if abs(faultChannels['Ic'][i]) > ithresh:
-        tfault = tdec[i]
-        break
+    print ('fsample = {:.2f}, for {:d} samples per cycle, the rate changes by {:d}/{:d}'.format (fs, rs, up, down))
+
+chmap = atp_channels.parse_channel_ids (rec.analog_channel_ids)
+# find the fault on the raw channels, then decimate only the plotted window, lookback and warm-up
+ifault = atp_channels.resolve_channels (rec, {'I': ('I-branch', 'FAULT')}, chmap=chmap)['I']
+tfault = atp_channels.fault_inception (t, ifault)
+nstart = np.searchsorted (t, tfault - (pre_cycles + td21_cycles + warm_cycles) / 60.0)
+nend = np.searchsorted (t, tfault + (post_cycles + warm_cycles) / 60.0)
+
+decimate = lambda x: decimation.decimate (x[..., nstart:nend], fs, rs * 60)
+feederChannels = atp_channels.resolve_channels (rec, {'V': ('V-node', 'FDR'), 'I': ('I-branch', 'FDR')},
+                                                process=decimate, chmap=chmap)
+for pv in pvnames:
+    xf = xfnames[pv]
+    pvChannels[pv] = atp_channels.resolve_channels (rec, {'XfV': ('V-node', xf), 'XfI': ('I-branch', xf, [pv])},
+                                                    process=decimate, chmap=chmap)
+ndec = feederChannels['V'].shape[-1]
+tdec = decimation.decimated_times (t[nstart], ndec, rs * 60)
 
 if len(png_base) < 1:
     print ('Fault on at {:.6f}'.format(tfault))
@@ -471,9 +335,8 @@ if len(png_base) > 0:
     png_file = '{:s}_{:s}.png'.format (png_base, 'Feeder')
 ZL = fdr['FdrZL']
 vthresh = fdrNomV
-plot_location ('Feeder', title, feederChannels['Va'], feederChannels['Vb'], feederChannels['Vc'], \
-               feederChannels['Ia'], feederChannels['Ib'], feederChannels['Ic'], fdrNomV, fdrNomI, \
-               tdec, tfault, rs, ccos, csin, ZL, vthresh, png_file)
+plot_location ('Feeder', title, *feederChannels['V'], *feederChannels['I'], fdrNomV, fdrNomI, \
+               tdec, tfault, rs, ZL, vthresh, png_file)
 #quit()
 for pv in pvnames:
 #   title = '{:s}, {:s}'.format (case_title, pv)
@@ -481,15 +344,14 @@ for pv in pvnames:
 #       png_file = '{:s}_{:s}.png'.format (png_base, pv)
 #   vthresh = vnoms[pv]
 #   ZL = zmags[pv] * vthresh * vthresh / fdrNomV / fdrNomV # on the low side
-#   plot_location (pv, title, pvChannels[pv]['Va'], pvChannels[pv]['Vb'], pvChannels[pv]['Vc'], \
-#                  pvChannels[pv]['Ia'], pvChannels[pv]['Ib'], pvChannels[pv]['Ic'], vnoms[pv], inoms[pv], \
-#                  tdec, tfault, rs, ccos, csin, ZL, vthresh, png_file)
+#   (also resolve 'V': ('V-branch', pv) and 'I': ('I-branch', pv) above)
+#   plot_location (pv, title, *pvChannels[pv]['V'], *pvChannels[pv]['I'], vnoms[pv], inoms[pv], \
+#                  tdec, tfault, rs, ZL, vthresh, png_file)
 
     title = '{:s}, {:s} TD21'.format (case_title, xfnames[pv])
     if len(png_base) > 0:
         png_file = '{:s}_{:s}.png'.format (png_base, xfnames[pv])
     vthresh = xfvnoms[pv]
     ZL = zmags[pv]   # on the high side
-    plot_location (xfnames[pv], title, pvChannels[pv]['XfVa'], pvChannels[pv]['XfVb'], pvChannels[pv]['XfVc'], \
-                   pvChannels[pv]['XfIa'], pvChannels[pv]['XfIb'], pvChannels[pv]['XfIc'], xfvnoms[pv], xfinoms[pv], \
-                   tdec, tfault, rs, ccos, csin, ZL, vthresh, png_file)
+    plot_location (xfnames[pv], title, *pvChannels[pv]['XfV'], *pvChannels[pv]['XfI'], xfvnoms[pv], xfinoms[pv], \
+                   tdec, tfault, rs, ZL, vthresh, png_file)
@@ -0,0 +1,361 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: ReductionSweep.py
+""" Choose the retained buses for RunReduction.py automatically, and keep
+the smallest reduced model that meets an error budget.
+
+Reads the same OpenDSS solution files as RunReduction.py, from solving
+ReductionStudy.dss, and builds the feeder tree from the energymeter zone.
+The buses to keep, e.g. relays, reclosers, capacitors and large PV, come
+from the keep and keep_files entries of a JSON file. Each candidate set
+of retained buses contains:
+
+- the first bus of the meter zone, and the buses to keep
+- the remote end of each branch that carries at least one of the lateral_loads, per unit of the feeder load in the snapshot power flow; the end is found by following the most heavily loaded branch at each junction
+- the junctions where paths to two or more of those buses part
+- intermediate buses, at the first bus more than one of the max_lengths past the last retained bus, in the distance units of the EXP_Profile export; a length of 0 adds none
+
+Each candidate runs RunReduction.py in its own copy of the study directory,
+created next to it so that relative paths still resolve, with buspairs.dat
+linking each retained bus to the nearest retained bus upstream, and with
+bus_loads, so that the load beyond the retained buses is not lost. Then
+OpenDSS solves check_dss, e.g. Reduced.dss, which must redirect the
+ReducedNetwork.dss of the candidate, for a snapshot power flow, then for
+the short-circuit impedances after applying the fault_edits. full_dss is
+solved once for the reference snapshot, while the reference impedances are
+those of the full model in cktname_EXP_SEQZ.CSV. Candidates run
+concurrently. The load error is the change in total circuit power,
+relative to the full model. The fault error is the largest change in
+3-phase or 1-phase fault current at any retained bus, relative to the full
+model, from the ratio of positive-sequence or 2Z1+Z0 impedances. The smallest candidate within load_tol and fault_tol wins; its
+outputs are copied to the study directory, with its bus pairs written to
+buspairs_auto.dat. Every candidate is summarized in ReductionSweep.csv.
+
+JSON keys, all but full_dss optional:
+
+- keep (list): bus names to retain
+- keep_files (list): files with a bus name to retain at the start of each line, comma or space separated, // for comments
+- lateral_loads (list): per-unit branch loads to try, defaults to [0.1, 0.05, 0.02, 0.01]
+- max_lengths (list): segment lengths to try, defaults to [0, 8, 4, 2, 1, 0.5]
+- check_dss (str): the reduced circuit to check, defaults to Reduced.dss
+- full_dss (str): the full circuit to check against, e.g. Master_noPV.dss
+- load_tol (float): per-unit tolerance on total circuit power, defaults to 0.02
+- fault_tol (float): per-unit tolerance on fault currents, defaults to 0.05
+- fault_edits (list): OpenDSS commands before the fault study, defaults to disabling the capacitors as in ReductionStudy.dss, and the lumped loads
+
+Public Functions:
+    :load_feeder_tree: the zone tree, bus distances and branch loads of the full model
+    :select_retained: one candidate set of retained buses
+    :make_pairs: links of retained buses for buspairs.dat
+    :main: does the work
+
+Args:
+    cktname (str): the root name of the full OpenDSS circuit
+    sweep (str): the JSON file described above
+    workers (int): the number of candidates to evaluate at once, defaults to 1
+    atpfile (str): the name of the ATP file to write for the winner, defaults to ReducedNetwork.atp
+"""
+
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import networkx as nx
+import dpvprot.opendss_exports as dssx
+import dpvprot.feeder_tree as ft
+
+DEFAULT_SWEEP = {
+  'keep': [],
+  'keep_files': [],
+  'lateral_loads': [0.1, 0.05, 0.02, 0.01],
+  'max_lengths': [0, 8.0, 4.0, 2.0, 1.0, 0.5],
+  'check_dss': 'Reduced.dss',
+  'load_tol': 0.02,
+  'fault_tol': 0.05,
+  'fault_edits': ['batchedit capacitor..* enabled=no', 'batchedit load..* enabled=no']
+}
+
+# RunReduction.py outputs copied back from the winning candidate, besides the ATP file
+REDUCED_FILES = ['ReducedNetwork.dss', 'ReducedXY.dss', 'ReducedNetwork.atpmap']
+
+# outputs of previous sweeps, not copied into the candidate directories
+SKIP_FILES = ['ReductionSweep.csv', 'buspairs_auto.dat', 'sweep_summary.csv', 'sweep_seqz.csv']
+
+def load_feeder_tree (cktname):
+  """Reads the zone tree, profile distances and snapshot branch loads of the full model.
+
+  Returns:
+    dict: from feeder_tree.tree_index, rooted at the first bus of the meter zone
+    dict: distance of each bus from the profile export
+    dict: real power [kW] into the subtree of each bus, from its parent, or the total at the root
+  """
+  branch_buses = {}
+  lines = {}
+  for key, bclass, bname, bus1, bus2 in dssx.read_elements (cktname + '_Elements.Txt').tolist():
+    if bclass in ['LINE', 'TRANSFORMER']:
+      branch_buses[key] = [bus1, bus2]
+    if bclass == 'LINE':
+      lines[bname] = [bus1, bus2]
+  dist = {}
+  for branch, d1, d2 in dssx.read_profile (cktname + '_EXP_Profile.CSV').tolist():
+    if branch in lines:
+      dist[lines[branch][0]] = d1
+      dist[lines[branch][1]] = d2
+  G = nx.Graph()
+  source_bus = None
+  for branch, level in dssx.read_zone (cktname + '_ZoneOut_feeder.txt').tolist():
+    if branch in branch_buses:
+      bus1, bus2 = branch_buses[branch]
+      if source_bus is None:
+        source_bus = bus1
+      G.add_edge (bus1, bus2)
+      G[bus1][bus2]['name'] = branch
+  tree = ft.tree_index (G, source_bus)
+
+  keys, flows = dssx.read_branch_powers (cktname + '_Power_elem_kVA.txt')
+  terminal_kw = {}
+  for key, bus, phs, p, q in flows.tolist():
+    terminal_kw[(key, bus)] = terminal_kw.get ((key, bus), 0.0) + p
+  load = {}
+  parent = tree['parent']
+  for bus in tree['order'][1:]:
+    load[bus] = terminal_kw.get ((G[parent[bus]][bus]['name'], parent[bus]), 0.0)
+  load[source_bus] = sum ([load[child] for child in tree['children'][source_bus]])
+  return tree, dist, load
+
+def read_keep_file (fname):
+  keep = []
+  with open (fname, mode='r') as infile:
+    for ln in infile:
+      toks = ln.split('//')[0].replace(',', ' ').split()
+      if len(toks) > 0:
+        keep.append (toks[0].upper().split('.')[0])
+  return keep
+
+def select_retained (tree, dist, load, keep, lateral_load, max_length):
+  """Chooses one candidate set of retained buses, in linear passes over the tree.
+
+  Args:
+    tree (dict): from feeder_tree.tree_index
+    dist (dict): profile distance of each bus; buses without one take their parent's
+    load (dict): real power into the subtree of each bus
+    keep (iterable): buses that must be retained, those outside the tree are ignored
+    lateral_load (float): per-unit load of the branches whose remote ends are retained
+    max_length (float): spacing of the intermediate buses, or 0 for none
+
+  Returns:
+    set: the retained buses
+  """
+  parent = tree['parent']
+  order = tree['order']
+  children = tree['children']
+  retained = set ([tree['source']]) | (set (keep) & set (order))
+  # leaves up: the remote end of each bus, following its most heavily loaded children
+  remote = {}
+  for bus in reversed (order):
+    if len(children[bus]) > 0:
+      remote[bus] = remote[max (children[bus], key=lambda child: load.get (child, 0.0))]
+    else:
+      remote[bus] = bus
+  min_load = lateral_load * abs(load[tree['source']])
+  for bus in order[1:]:
+    if abs(load.get (bus, 0.0)) >= min_load:
+      retained.add (remote[bus])
+  # leaves up: count the children whose subtrees hold retained buses, keep the junctions
+  nbranches = dict.fromkeys (order, 0)
+  for bus in reversed (order):
+    if nbranches[bus] > 1:
+      retained.add (bus)
+    if (bus in retained or nbranches[bus] > 0) and parent[bus] is not None:
+      nbranches[parent[bus]] += 1
+  # source down: split long segments on the paths that lead to retained buses
+  if max_length > 0.0:
+    d = {}
+    anchor = {}
+    for bus in order:
+      up = parent[bus]
+      d[bus] = dist.get (bus, d[up] if up is not None else 0.0)
+      if up is None:
+        anchor[bus] = d[bus]
+        continue
+      if bus not in retained and nbranches[bus] > 0 and abs(d[bus] - anchor[up]) > max_length:
+        retained.add (bus)
+      anchor[bus] = d[bus] if bus in retained else anchor[up]
+  return retained
+
+def make_pairs (tree, retained):
+  """Links each retained bus to the nearest retained bus upstream, in tree order"""
+  parent = tree['parent']
+  pairs = []
+  for bus in tree['order']:
+    if bus not in retained or parent[bus] is None:
+      continue
+    up = parent[bus]
+    while up not in retained:
+      up = parent[up]
+    pairs.append ((up, bus))
+  return pairs
+
+def make_work_dir (title):
+  study_dir = os.path.abspath ('.')
+  path = tempfile.mkdtemp (prefix='.{:s}_{:s}_'.format (os.path.basename (study_dir), title), dir=os.path.dirname (study_dir))
+  for fname in os.listdir (study_dir):
+    if os.path.isfile (fname) and fname not in SKIP_FILES:
+      shutil.copy2 (fname, path)
+  return path
+
+def solve_check (path, dss_file, fault_edits=None):
+  """Solves dss_file for a snapshot in path, then for short-circuit impedances after fault_edits.
+
+  Returns:
+    complex: total circuit power [MVA], or None if OpenDSS failed
+    dict: positive and zero sequence impedances by bus, if fault_edits is not None
+  """
+  with open (os.path.join (path, 'sweep_check.dss'), mode='w') as fp:
+    print ('redirect', dss_file, file=fp)
+    print ('solve mode=snap', file=fp)
+    print ('export summary (sweep_summary.csv)', file=fp)
+    if fault_edits is not None:
+      for cmd in fault_edits:
+        print (cmd, file=fp)
+      print ('solve mode=faultstudy', file=fp)
+      print ('export seqz (sweep_seqz.csv)', file=fp)
+  subprocess.run (['opendsscmd', 'sweep_check.dss'], cwd=path, capture_output=True)
+  fsummary = os.path.join (path, 'sweep_summary.csv')
+  fseqz = os.path.join (path, 'sweep_seqz.csv')
+  if not os.path.exists (fsummary) or (fault_edits is not None and not os.path.exists (fseqz)):
+    return None, {}
+  summary = dssx.read_csv_columns (fsummary, [17, 18])
+  if len(summary) < 1:
+    return None, {}
+  name, mw, mvar = summary[-1].tolist()
+  if fault_edits is None:
+    return complex (mw, mvar), {}
+  return complex (mw, mvar), read_seqz (fseqz)
+
+def read_seqz (fname):
+  seqz = {}
+  for bus, nph, r1, x1, r0, x0 in dssx.read_seqz (fname).tolist():
+    seqz[bus] = (complex (r1, x1), complex (r0, x0))
+  return seqz
+
+def compare_checks (full, reduced, retained):
+  """Returns the per-unit load error and fault error of a reduced model against the full model.
+
+  Args:
+    full (tuple): total circuit power, and sequence impedances by bus, of the full model
+    reduced (tuple): from solve_check for the reduced model
+    retained (set): the buses to compare fault currents at
+  """
+  if reduced[0] is None:
+    return math.inf, math.inf
+  load_err = abs(reduced[0] - full[0]) / max (abs(full[0]), 1.0e-6)
+  fault_err = 0.0
+  for bus in retained:
+    if bus in full[1] and bus in reduced[1]:
+      zf1, zf0 = full[1][bus]
+      zr1, zr0 = reduced[1][bus]
+      for zf, zr in [(zf1, zr1), (2.0*zf1 + zf0, 2.0*zr1 + zr0)]:
+        if abs(zr) > 0.0:
+          fault_err = max (fault_err, abs(abs(zf) / abs(zr) - 1.0))
+  return load_err, fault_err
+
+def run_candidate (cand, cktname, sweep, src_path):
+  """Reduces and checks one candidate in its own directory.
+
+  Returns:
+    int: the RunReduction.py exit status
+    tuple: from solve_check
+    str: the candidate directory
+  """
+  path = make_work_dir (cand['title'])
+  with open (os.path.join (path, 'buspairs.dat'), mode='w') as fp:
+    for bus1, bus2 in cand['pairs']:
+      print ('{:s},{:s},'.format (bus1, bus2), file=fp)
+  rc = subprocess.run ([sys.executable, os.path.join (src_path, 'RunReduction.py'), cktname, 'sweep.atp', '1'],
+                       cwd=path, stdout=subprocess.DEVNULL).returncode
+  if rc != 0:
+    return rc, (None, {}), path
+  return rc, solve_check (path, sweep['check_dss'], sweep['fault_edits']), path
+
+if __name__ == '__main__':
+  cktname = sys.argv[1]
+  sweep = dict (DEFAULT_SWEEP)
+  with open (sys.argv[2], mode='r') as fp:
+    sweep.update (json.load (fp))
+  workers = 1
+  atpfile = 'ReducedNetwork.atp'
+  if len(sys.argv) > 3:
+    workers = int(sys.argv[3])
+  if len(sys.argv) > 4:
+    atpfile = sys.argv[4]
+  src_path = os.path.dirname (os.path.abspath (__file__))
+
+  tree, dist, load = load_feeder_tree (cktname)
+  keep = [bus.upper() for bus in sweep['keep']]
+  for fname in sweep['keep_files']:
+    keep += read_keep_file (fname)
+  missing = sorted (set (keep) - set (tree['order']))
+  if len(missing) > 0:
+    print ('ignoring {:d} buses to keep that are not in the meter zone:'.format (len(missing)), missing)
+
+  # the candidates that retain the same buses are evaluated only once
+  cands = []
+  seen = set()
+  for lateral_load in sweep['lateral_loads']:
+    for max_length in sweep['max_lengths']:
+      retained = select_retained (tree, dist, load, keep, float(lateral_load), float(max_length))
+      if frozenset (retained) in seen:
+        continue
+      seen.add (frozenset (retained))
+      cands.append ({'title': 'lat{:g}_len{:g}'.format (lateral_load, max_length), 'lateral_load': lateral_load,
+                     'max_length': max_length, 'retained': retained, 'pairs': make_pairs (tree, retained)})
+  print ('{:d} buses in the meter zone, {:d} candidates with {:s} retained buses'.format (len(tree['order']),
+         len(cands), ', '.join ([str(len(cand['retained'])) for cand in cands])))
+
+  def run_full ():
+    path = make_work_dir ('full')
+    try:
+      return solve_check (path, sweep['full_dss'])
+    finally:
+      shutil.rmtree (path, ignore_errors=True)
+
+  with ThreadPoolExecutor (max_workers=workers) as pool:
+    full_job = pool.submit (run_full)
+    results = list (pool.map (lambda cand: run_candidate (cand, cktname, sweep, src_path), cands))
+    full = full_job.result()
+  full = (full[0], read_seqz (cktname + '_EXP_SEQZ.CSV'))
+  if full[0] is None:
+    print ('OpenDSS did not solve', sweep['full_dss'])
+    for rc, checks, path in results:
+      shutil.rmtree (path, ignore_errors=True)
+    quit(1)
+
+  winner = None
+  fp = open ('ReductionSweep.csv', mode='w')
+  print ('lateral_load,max_length,buses,pairs,status,load_err,fault_err,passed', file=fp)
+  for cand, (rc, checks, path) in zip (cands, results):
+    load_err, fault_err = compare_checks (full, checks, cand['retained'])
+    cand['passed'] = (load_err <= sweep['load_tol']) and (fault_err <= sweep['fault_tol'])
+    cand['path'] = path
+    print ('{:g},{:g},{:d},{:d},{:d},{:.5f},{:.5f},{:d}'.format (cand['lateral_load'], cand['max_length'], len(cand['retained']),
+           len(cand['pairs']), rc, load_err, fault_err, int(cand['passed'])), file=fp)
+    print ('{:16s} {:5d} buses  load error {:8.4f}  fault error {:8.4f}  {:s}'.format (cand['title'],
+           len(cand['retained']), load_err, fault_err, 'passed' if cand['passed'] else 'failed'))
+    if cand['passed'] and (winner is None or len(cand['retained']) < len(winner['retained'])):
+      winner = cand
+  fp.close()
+
+  if winner is None:
+    print ('no candidate met load_tol={:g} and fault_tol={:g}; see ReductionSweep.csv'.format (sweep['load_tol'], sweep['fault_tol']))
+  else:
+    print ('keeping {:s} with {:d} retained buses'.format (winner['title'], len(winner['retained'])))
+    for fname in REDUCED_FILES:
+      shutil.copy (os.path.join (winner['path'], fname), fname)
+    shutil.copy (os.path.join (winner['path'], 'sweep.atp'), atpfile)
+    shutil.copy (os.path.join (winner['path'], 'buspairs.dat'), 'buspairs_auto.dat')
+  for cand in cands:
+    shutil.rmtree (cand['path'], ignore_errors=True)
@@ -1,61 +1,165 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: RunEventStudy.py
+""" Run the OpenDSS event study over a grid of protection schemes,
+IEEE 1547 categories and PV penetration levels.
+
+Each cell of the grid runs the PV scaling script and RunFaults.py in its
+own copy of the study directory, created next to it so that relative
+paths still resolve, and copies events.out back to the study directory
+as pv_<pct>_cat<n><suffix>.out. Cells run concurrently. The completed
+cells are recorded in RunEventStudy.manifest, so that an interrupted
+study resumes with only the missing cells. The grid may be described
+in a JSON file, whose keys replace those of DEFAULT_STUDY:
+
+- pv_pcts (list): PV penetration levels, in percent
+- pv_command (str): the PV scaling script and its arguments, formatted with src_path, pct, frac (pct/100) and cat
+- schemes (list): each with suffix for the output name, cats to run, and the relays and buslist files to use with PV, and without PV (relays_nopv, buslist_nopv)
+
+Public Functions:
+    :main: does the work
+
+Args:
+    ckt_name (str): the root name of the OpenDSS circuit, for RunFaults.py
+    src_path (str): path to ScalePV.py and RunFaults.py, defaults to ../code/
+    workers (int): the number of cells to run at once, defaults to 1
+    study (str): optional JSON file describing the grid
+"""
+
 import subprocess
 import sys
+import os
+import json
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MANIFEST = 'RunEventStudy.manifest'
+
+DEFAULT_STUDY = {
+  'pv_pcts': [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100],
+  'pv_command': '{src_path}ScalePV.py {frac:.3f} {cat:d}',
+  'schemes': [
+    {'suffix': '', 'cats': [1, 2, 3],
+     'relays': 'TOCRelays.dss', 'relays_nopv': 'TOCRelays.dss',
+     'buslist': 'buslist_toc.dat', 'buslist_nopv': 'buslist_nopv.dat'},
+    {'suffix': '_dist', 'cats': [3],
+     'relays': 'DistanceRelaysPV.dss', 'relays_nopv': 'DistanceRelays.dss',
+     'buslist': 'buslist_dist.dat', 'buslist_nopv': 'buslist_nopv.dat'}]
+}
+
+# outputs of previous runs, not copied into the cell directories
+SKIP_FILES = ['events.out', 'dofaults.rpt', 'events.csv', MANIFEST]
 
-ckt_name = 'DgProtFdr'
-src_path = '../code/'
-if len(sys.argv) > 1:
+def make_cells (study):
+  cells = []
+  for scheme in study['schemes']:
+    for cat in scheme['cats']:
+      for pct in study['pv_pcts']:
+        cells.append ({'title': 'pv_{:d}_cat{:d}{:s}'.format (pct, cat, scheme['suffix']),
+                       'pct': pct, 'cat': cat, 'scheme': scheme})
+  return cells
+
+def load_manifest ():
+  if os.path.exists (MANIFEST):
+    with open (MANIFEST, mode='r') as fp:
+      return json.load (fp)
+  return {}
+
+def save_manifest (manifest):
+  with open (MANIFEST + '.tmp', mode='w') as fp:
+    json.dump (manifest, fp, indent=2)
+  os.replace (MANIFEST + '.tmp', MANIFEST)
+
+def make_cell_dir (title):
+  study_dir = os.path.abspath ('.')
+  path = tempfile.mkdtemp (prefix='.{:s}_{:s}_'.format (os.path.basename (study_dir), title), dir=os.path.dirname (study_dir))
+  for fname in os.listdir (study_dir):
+    if os.path.isfile (fname) and fname not in SKIP_FILES and not fname.endswith('.out'):
+      shutil.copy2 (fname, path)
+  return path
+
+def run_cell (cell, study, ckt_name, src_path):
+  """Runs one cell of the grid in its own directory.
+
+  Returns:
+    int: 0 on success, otherwise the failing exit status, or -1 if no events.out
+    str: the cell directory, kept for inspection if the cell failed
+  """
+  scheme = cell['scheme']
+  pct = cell['pct']
+  if pct == 0:
+    relays = scheme['relays_nopv']
+    buslist = scheme['buslist_nopv']
+  else:
+    relays = scheme['relays']
+    buslist = scheme['buslist']
+  path = make_cell_dir (cell['title'])
+  pv_args = study['pv_command'].format (src_path=src_path, pct=pct, frac=0.01*pct, cat=cell['cat']).split()
+  rc = subprocess.run ([sys.executable] + pv_args, cwd=path).returncode
+  if rc == 0:
+    # ScalePV.py writes DistanceRelaysPV.dss, so copy the relays afterward
+    shutil.copy (os.path.join (path, relays), os.path.join (path, 'UtilityRelays.dss'))
+    shutil.copy (os.path.join (path, buslist), os.path.join (path, 'buslist.dat'))
+    rc = subprocess.run ([sys.executable, src_path + 'RunFaults.py', ckt_name], cwd=path).returncode
+  events = os.path.join (path, 'events.out')
+  if rc == 0 and not os.path.exists (events):
+    rc = -1
+  if rc == 0:
+    shutil.copy (events, cell['title'] + '.out')
+    shutil.rmtree (path, ignore_errors=True)
+  else:
+    print ('{:s} failed with status {:d}, see {:s}'.format (cell['title'], rc, path))
+  return rc, path
+
+if __name__ == '__main__':
+  ckt_name = 'DgProtFdr'
+  src_path = '../code/'
+  workers = 1
+  study = dict (DEFAULT_STUDY)
+  if len(sys.argv) > 1:
     ckt_name = sys.argv[1]
-if len(sys.argv) > 2:
+  if len(sys.argv) > 2:
     src_path = sys.argv[2]
+  if len(sys.argv) > 3:
+    workers = int(sys.argv[3])
+  if len(sys.argv) > 4:
+    with open (sys.argv[4], mode='r') as fp:
+      study.update (json.load (fp))
+
+  manifest = load_manifest ()
+  lock = threading.Lock()
+  all_cells = make_cells (study)
+  cells = []
+  for cell in all_cells:
+    entry = manifest.get (cell['title'], {})
+    if entry.get ('status') == 'done' and os.path.exists (cell['title'] + '.out'):
+      continue
+    cells.append (cell)
+  print ('{:d} cells to run, {:d} already done'.format (len(cells), len(all_cells) - len(cells)))
 
-uv_cats = [1, 2, 3]
-pv_pcts = [0, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]
-
-pw0 = subprocess.Popen ('copy /y TOCRelays.dss UtilityRelays.dss', shell=True)
-pw0.wait()
-
-for cat in uv_cats:
-    for pct in pv_pcts:
-        if pct == 0:
-            pw0 = subprocess.Popen ('copy /y buslist_nopv.dat buslist.dat', shell=True)
-        else:
-            pw0 = subprocess.Popen ('copy /y buslist_toc.dat buslist.dat', shell=True)
-        pw0.wait()
-        scale = 0.01 * pct
-        casetitle = 'pv_{:d}_cat{:d}'.format (pct, cat)
-        cmdline1 = 'python {:s}ScalePV.py {:.3f} {:d}'.format (src_path, scale, cat)
-        cmdline2 = 'python {:s}runfaults.py {:s}'.format (src_path, ckt_name)
-        cmdline3 = 'copy /y events.out {:s}.out'.format (casetitle)
-        pw1 = subprocess.Popen (cmdline1, shell=True)
-        pw1.wait()
-        print ('**************', casetitle)
-        pw2 = subprocess.Popen (cmdline2, shell=True)
-        pw2.wait()
-        pw3 = subprocess.Popen (cmdline3, shell=True)
-        pw3.wait()
-
-cat = 3
-for pct in pv_pcts:
-    if pct == 0:
-        pw0 = subprocess.Popen ('copy /y DistanceRelays.dss UtilityRelays.dss', shell=True)
-        pw0.wait()
-        pw0 = subprocess.Popen ('copy /y buslist_nopv.dat buslist.dat', shell=True)
-        pw0.wait()
-    else:
-        pw0 = subprocess.Popen ('copy /y DistanceRelaysPV.dss UtilityRelays.dss', shell=True)
-        pw0.wait()
-        pw0 = subprocess.Popen ('copy /y buslist_dist.dat buslist.dat', shell=True)
-        pw0.wait()
-    scale = 0.01 * pct
-    casetitle = 'pv_{:d}_cat{:d}_dist'.format (pct, cat)
-    cmdline1 = 'python {:s}ScalePV.py {:.3f} {:d}'.format (src_path, scale, cat)
-    cmdline2 = 'python {:s}runfaults.py {:s}'.format (src_path, ckt_name)
-    cmdline3 = 'copy /y events.out {:s}.out'.format (casetitle)
-    pw1 = subprocess.Popen (cmdline1, shell=True)
-    pw1.wait()
-    print ('**************', casetitle)
-    pw2 = subprocess.Popen (cmdline2, shell=True)
-    pw2.wait()
-    pw3 = subprocess.Popen (cmdline3, shell=True)
-    pw3.wait()
+  def run_one (cell):
+    print ('**************', cell['title'])
+    # a retried cell no longer needs the directory of its failed run
+    with lock:
+      old_path = manifest.get (cell['title'], {}).get ('path')
+    if old_path is not None:
+      shutil.rmtree (old_path, ignore_errors=True)
+    t0 = time.time()
+    rc, path = run_cell (cell, study, ckt_name, src_path)
+    with lock:
+      entry = {'status': 'done' if rc == 0 else 'failed', 'exit': rc,
+               'seconds': round (time.time() - t0, 1),
+               'finished': time.strftime ('%Y-%m-%d %H:%M:%S')}
+      if rc != 0:
+        entry['path'] = path
+      manifest[cell['title']] = entry
+      save_manifest (manifest)
+    return rc
 
+  with ThreadPoolExecutor (max_workers=workers) as pool:
+    results = list (pool.map (run_one, cells))
+  nfailed = sum ([rc != 0 for rc in results])
+  if nfailed > 0:
+    print ('{:d} cells failed; run again to retry them'.format (nfailed))
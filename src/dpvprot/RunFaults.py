@@ -20,6 +20,18 @@ The script writes scripted_fault.dss for each fault to simulate,
 then invokes opendsscmd on EventStudy.dss, which needs to include
 scripted_fault.dss.
 
+With more than one worker, each worker copies the files of the study
+directory into its own sandbox directory, created next to the study
+directory so that relative paths like ../Test_Hull still resolve. The
+faults are simulated concurrently in the sandboxes, and the results are
+merged into events.out and dofaults.rpt in the order of the fault list.
+
+Alternatively, the 'direct' backend runs OpenDSS in-process through the
+opendssdirect package. It compiles EventStudy.dss once for the first fault,
+then edits fault.flt, resets and re-solves the dynamic study for each of
+the others, reading the fault monitor and event log from memory. If
+opendssdirect can't be imported, the script falls back to opendsscmd.
+
 Writes events.out with summary information.
 
 Appends to dofaults.rpt with summary information, ending with a list of devices 
@@ -51,6 +63,8 @@ Public Functions:
 
 Args:
     cktname (str): the root name (not the file name) of the OpenDSS circuit. The script needs this to find summary and monitor outputs from each fault simulation.
+    workers (int): the number of concurrent opendsscmd simulations, optional, defaults to 1
+    backend (str): opendsscmd or direct, optional, defaults to opendsscmd
 
 Returns:
     str: writes a progress message as each fault is simulated
@@ -62,6 +76,13 @@ import math
 import sys
 import subprocess
 import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# files of the study directory that are outputs, not copied into the sandboxes
+SANDBOX_SKIP = ['events.out', 'dofaults.rpt', 'events.csv', 'scripted_fault.dss']
 
 def getSLGFbus (bus, phases):
   if 'C' in phases:
@@ -96,6 +117,169 @@ def is_pv_device (dvc):
     return True
   return False
 
+class Sandboxes:
+  """Gives each worker thread its own copy of the study directory, or the
+  study directory itself when there is only one worker."""
+  def __init__ (self, workers):
+    self.workers = workers
+    self.local = threading.local()
+    self.paths = []
+    self.lock = threading.Lock()
+
+  def get_path (self):
+    if self.workers < 2:
+      return '.'
+    if not hasattr (self.local, 'path'):
+      study = os.path.abspath ('.')
+      path = tempfile.mkdtemp (prefix='.' + os.path.basename (study) + '_', dir=os.path.dirname (study))
+      for fname in os.listdir (study):
+        if os.path.isfile (fname) and fname not in SANDBOX_SKIP:
+          shutil.copy2 (fname, path)
+      self.local.path = path
+      with self.lock:
+        self.paths.append (path)
+    return self.local.path
+
+  def cleanup (self):
+    for path in self.paths:
+      shutil.rmtree (path, ignore_errors=True)
+
+def fault_command (flt, verb):
+  if flt['temporary']:
+    temporary = 'yes'
+  else:
+    temporary = 'no'
+  return '{:s} fault.flt bus1={:s} phases={:d} ontime={:.3f} r={:.3f} temporary={:s}'.format (verb, flt['bus'], flt['phases'], flt['ontime'], flt['rf'], temporary)
+
+def parse_events (rows):
+  """Tabulates the tripping device events from rows of the OpenDSS event log.
+
+  Returns:
+    dict: the final state of each tripping device
+    set: the operated devices, not counting the fault
+    float: the time that the fault was applied, or -1
+    float: the time that the fault was cleared, or -1
+  """
+  states = {}
+  tcleared = -1.0
+  tapplied = -1.0
+  operated = set()
+  for row in rows:
+    sec = row[1].split('=')[1]
+    dvc = row[3].split('=')[1]
+    act = row[4].split('=')[1]
+    if len(dvc) > 0:
+      dvc = dvc.lower()
+    if is_tripping_device (dvc):
+      if dvc == 'fault.flt':
+        if act == '**APPLIED**':
+          tapplied = float (sec)
+        if act == '**CLEARED**':
+          tcleared = float (sec)
+      else:
+        operated.add (dvc)
+      states[dvc] = act
+  return states, operated, tapplied, tcleared
+
+def simulate_fault (flt, ckt_name, sandboxes):
+  """Runs one fault in a sandbox and parses the OpenDSS outputs there.
+
+  Returns:
+    dict: solveStatus, ifault, tapplied, tcleared, the final state of each tripping device, and the set of operated devices
+  """
+  path = sandboxes.get_path()
+  nph = flt['phases']
+  fp = open (os.path.join (path, 'scripted_fault.dss'), 'w')
+  print (fault_command (flt, 'new'), file=fp)
+  fp.close()
+
+  subprocess.run (['opendsscmd', 'EventStudy.dss'], cwd=path)
+
+  solveStatus = '?'
+
+  sname = os.path.join (path, ckt_name + '_EXP_Summary.CSV')
+  if os.path.exists(sname):
+    with open(sname, mode='r') as infile:
+      reader = csv.reader(infile)
+      next(reader)
+      for row in reader:
+        solveStatus = (row[2]).strip()
+    os.remove(sname)
+
+  ifault = 0.0
+  with open(os.path.join (path, ckt_name + '_Mon_flt.csv'), mode='r') as infile:
+    i1 = 2 + nph
+    i2 = i1 + nph
+    reader = csv.reader(infile)
+    next(reader)
+    for row in reader:
+      for i in range (i1, i2):
+        ival = float (row[i])
+        if ival > ifault:
+          ifault = ival
+
+  with open(os.path.join (path, 'events.csv'), mode='r') as infile:
+    states, operated, tapplied, tcleared = parse_events (csv.reader(infile))
+  return {'solveStatus': solveStatus, 'ifault': ifault, 'tapplied': tapplied, 'tcleared': tcleared,
+          'states': states, 'operated': operated}
+
+class DirectBackend:
+  """Simulates the faults in-process with opendssdirect, one at a time, in the study directory.
+
+  The first fault compiles EventStudy.dss through scripted_fault.dss, as opendsscmd would.
+  The other faults edit fault.flt and re-solve the dynamic study without recompiling,
+  starting from the same zero-load power flow as the compiled study.
+  """
+  def __init__ (self, ckt_name):
+    import opendssdirect
+    self.dss = opendssdirect
+    self.ckt_name = ckt_name
+    self.compiled = False
+
+  def simulate (self, flt):
+    dss = self.dss
+    if not self.compiled:
+      fp = open ('scripted_fault.dss', 'w')
+      print (fault_command (flt, 'new'), file=fp)
+      fp.close()
+      dss.Text.Command ('redirect EventStudy.dss')
+      self.number = dss.Solution.Number()
+      self.stepsize = dss.Solution.StepSize()
+      # the exported summary is not needed in this backend
+      sname = self.ckt_name + '_EXP_Summary.CSV'
+      if os.path.exists(sname):
+        os.remove(sname)
+      self.compiled = True
+    else:
+      dss.Text.Command (fault_command (flt, 'edit'))
+      # the fault monitor has to be resized if the number of fault phases changed
+      dss.Text.Command ('edit monitor.flt element=fault.flt')
+      dss.Text.Command ('reset')
+      # leave dynamic mode, and restore the zero-load power flow that calcv leaves at the end of
+      #  the compilation, so that the machines initialize from the same state as in a fresh
+      #  opendsscmd run, rather than from the end of the last fault; re-entering dynamic mode
+      #  also restores the step size and number of steps
+      dss.Text.Command ('set mode=snapshot')
+      dss.Text.Command ('calcv')
+      dss.Text.Command ('set mode=dynamic controlmode=time time=(0,0) stepsize={:s} number={:d}'.format (repr(self.stepsize), self.number))
+      dss.Text.Command ('solve')
+
+    if dss.Solution.Converged():
+      solveStatus = 'SOLVED'
+    else:
+      solveStatus = 'UNSOLVED'
+
+    # the fault monitor channels are nph voltage magnitudes, then nph current magnitudes
+    nph = flt['phases']
+    ifault = 0.0
+    dss.Monitors.Name ('flt')
+    for i in range (nph + 1, 2 * nph + 1):
+      ifault = max (ifault, max (dss.Monitors.Channel (i)))
+
+    states, operated, tapplied, tcleared = parse_events ([ln.split(',') for ln in dss.Solution.EventLog()])
+    return {'solveStatus': solveStatus, 'ifault': ifault, 'tapplied': tapplied, 'tcleared': tcleared,
+            'states': states, 'operated': operated}
+
 if __name__ == '__main__':
   bus_targets = {}
   bus_phases = {}
@@ -106,6 +290,15 @@ if __name__ == '__main__':
   rf_bolt = 0.01
   vary_slgf_rf = False
   ckt_name = sys.argv[1]
+  workers = 1
+  if len(sys.argv) > 2:
+    workers = int(sys.argv[2])
+  direct = None
+  if len(sys.argv) > 3 and sys.argv[3] == 'direct':
+    try:
+      direct = DirectBackend (ckt_name)
+    except ImportError:
+      print ('opendssdirect is not available, running the faults with opendsscmd')
 
   with open('buslist.dat', mode='r') as infile:
     reader = csv.reader(infile)
@@ -143,7 +336,26 @@ if __name__ == '__main__':
   print ('Bus,Nphases,Rf,If,Status,Cleared?,Tcleared,Nopen,Nreclosed,Nfailed,Nfalse,Npv,Sopen,Sreclosed,Sfailed,Sfalse,Spv', file=op)
   print ('Bus,Nphases,Rf,If,Status,Cleared?,Tcleared,Nopen,Nreclosed,Nfailed,Nfalse,Npv,Sopen,Sreclosed,Sfailed,Sfalse,Spv', file=rp)
 
-  for flt in faults:
+  sandboxes = Sandboxes (workers)
+  def run_one (flt):
+    if direct is not None:
+      res = direct.simulate (flt)
+    else:
+      res = simulate_fault (flt, ckt_name, sandboxes)
+    print ('finished fault at {:s}, {:d} phases, rf={:.3f}'.format (flt['bus'], flt['phases'], flt['rf']))
+    return res
+  if direct is not None:
+    # the in-process OpenDSS has to run on the main thread
+    results = [run_one (flt) for flt in faults]
+  else:
+    try:
+      with ThreadPoolExecutor (max_workers=workers) as pool:
+        results = list (pool.map (run_one, faults))
+    finally:
+      sandboxes.cleanup()
+
+  # merge the results in the order of the fault list
+  for flt, res in zip (faults, results):
     idx += 1
     targets = flt['targets']
     bus = flt['bus']
@@ -159,63 +371,18 @@ if __name__ == '__main__':
     print ('  target devices are ', targets, file=rp)
     print ('{:d} of {:d} faults'.format (idx, nflt))
 
-    fp = open ('scripted_fault.dss', 'w')
-    print ('new fault.flt bus1={:s} phases={:d} ontime={:.3f} r={:.3f} temporary={:s}'.format (bus, nph, ontime, rf, temporary), file=fp)
-    fp.close()
-
-    subprocess.run (['opendsscmd', 'EventStudy.dss'])
-
-    states = {}
-    events = {}
-    tcleared = -1.0
+    states = res['states']
+    tcleared = res['tcleared']
     bcleared = False
-    tapplied = -1.0
-    operated = set()
+    tapplied = res['tapplied']
+    operated = res['operated']
     lockopen = set()
     failtrips = set()
     falsetrips = set()
     pvtrips = set()
-    solveStatus = '?'
-
-    sname = ckt_name + '_EXP_Summary.CSV'
-    if os.path.exists(sname):
-      with open(sname, mode='r') as infile:
-        reader = csv.reader(infile)
-        next(reader)
-        for row in reader:
-          solveStatus = (row[2]).strip()
-      os.remove(sname)
-    
-    ifault = 0.0
-    with open(ckt_name + '_Mon_flt.csv', mode='r') as infile:
-      i1 = 2 + nph
-      i2 = i1 + nph
-      reader = csv.reader(infile)
-      next(reader)
-      for row in reader:
-        for i in range (i1, i2):
-          ival = float (row[i])
-          if ival > ifault:
-            ifault = ival
+    solveStatus = res['solveStatus']
+    ifault = res['ifault']
 
-    with open('events.csv', mode='r') as infile:
-      reader = csv.reader(infile)
-      for row in reader:
-        sec = row[1].split('=')[1]
-        dvc = row[3].split('=')[1]
-        act = row[4].split('=')[1]
-        if len(dvc) > 0:
-          dvc = dvc.lower()
-        if is_tripping_device (dvc):
-          if dvc == 'fault.flt':
-            if act == '**APPLIED**':
-              tapplied = float (sec)
-            if act == '**CLEARED**':
-              tcleared = float (sec)
-          else:
-            operated.add (dvc)
-          states[dvc] = act
-          events[sec, dvc] = act
     if tcleared > 0.0:
       tcleared -= tapplied
       bcleared = True
@@ -244,7 +411,7 @@ if __name__ == '__main__':
           failed_trip_faults[dvc].append(bus)
     event_line = '"{:s}",{:d},{:.3f},{:.1f},{:s},{:s},{:.4f},{:d},{:d},{:d},{:d},{:d},"{:s}","{:s}","{:s}","{:s}","{:s}"'.format (bus,nph,rf,ifault,solveStatus,str(bcleared),tcleared,
       len(lockopen), len(momentary), len (failtrips), len (falsetrips), len (pvtrips),
-      ','.join(lockopen), ','.join(momentary), ','.join(failtrips), ','.join(falsetrips), ','.join(pvtrips))
+      ','.join(sorted(lockopen)), ','.join(sorted(momentary)), ','.join(sorted(failtrips)), ','.join(sorted(falsetrips)), ','.join(sorted(pvtrips)))
     print (event_line, file=op)
     print (event_line, file=rp)
 
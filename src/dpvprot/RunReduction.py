@@ -67,6 +67,7 @@ Public Functions:
 Args:
     cktname (str): the root name of the OpenDSS circuit to be reduced
     atpfile (str): the name of the ATP file to write
+    bus_loads (int): 1 to add the power used at each retained bus, or leaving it through branches to buses that are not retained, to the load of a reduced branch at that bus. Otherwise that power is left out, as with the default of 0.
 
 Returns:
     str: writes total PV kW to console
@@ -78,9 +79,20 @@ import sys
 import subprocess
 import networkx as nx
 import dpvprot.AtpReduction as atp
+import dpvprot.opendss_exports as dssx
+import dpvprot.feeder_tree as ft
 
 bNoCaps = False  # set True if we want to ignore capacitance in the ATP line pi-section models
 
+DSS_LINE_TEMPLATE = 'new line.{:d} phases={:d} bus1={:s} bus2={:s}\n'
+DSS_LINE_SEQ_TEMPLATE = '~   r1={:.5f} x1={:.5f} r0={:.5f} x0={:.5f} c1={:.5f} c0={:.5f} // len={:.5f}\n'
+DSS_LINE_1PH_TEMPLATE = '~   rmatrix=[{:5f}] xmatrix=[{:.5f}] cmatrix=[0] // len={:.5f}\n'
+DSS_XFMR_TEMPLATE = 'new transformer.{:d} phases={:d} buses=({:s} {:s}) conns={:s}\n' + \
+                    '~   kvs=({:.3f} {:.3f}) kvas=({:.2f} {:.2f}) xhl={:.5f}\n' + \
+                    '~   // r1={:.5f} x1={:.5f} r0={:.5f} x0={:.5f}\n'
+DSS_LOAD_TEMPLATE = 'new load.{:d}_{:d} phases={:d} bus1={:s} kv={!s} conn=wye model=2 kw={:.3f} kvar={:.3f}\n'
+DSS_XY_TEMPLATE = '{:s}\t{:.5f}\t{:.5f}\t{:9.5f}\n'
+
 def GetOpenDSSPhases(abc):
   retval = ''
   if 'A' in abc:
@@ -104,6 +116,9 @@ def GetAtpPhaseList(abc):
 if __name__ == '__main__':
   cktname = sys.argv[1]
   atpfile = sys.argv[2]
+  bBusLoads = False
+  if len(sys.argv) > 3:
+    bBusLoads = int(sys.argv[3]) > 0
   fname_bus = cktname + '_Buses.Txt'
   fname_profile = cktname + '_EXP_Profile.CSV'
   fname_seqz = cktname + '_EXP_SEQZ.CSV'
@@ -136,107 +151,34 @@ if __name__ == '__main__':
   # subprocess.run (['opendsscmd', 'ReductionStudy.dss'])
 
   seqz = {}
-  with open(fname_seqz, mode='r') as infile:
-    reader = csv.reader(infile)
-    next (reader, None)
-    for row in reader:
-      bus = row[0].upper()
-      nph = int(row[1])
-      r1 = float(row[2])
-      x1 = float(row[3])
-      r0 = float(row[4])
-      x0 = float(row[5])
-      seqz[bus] = [nph,r1,x1,r0,x0]
-
-  dist = {}
-  with open(fname_profile, mode='r') as infile:
-    reader = csv.reader(infile)
-    next (reader, None)
-    for row in reader:
-      branch = row[0].upper()
-      d1 = float(row[1])
-      d2 = float(row[3])
-      dist[branch] = [d1,d2]
+  for bus, nph, r1, x1, r0, x0 in dssx.read_seqz (fname_seqz).tolist():
+    seqz[bus] = [nph,r1,x1,r0,x0]
 
   buses = {}
-  with open(fname_bus, mode='r') as infile:
-    for i in range(6):
-      next (infile)
-    for line in infile:
-  #    print (line)
-      row = line.split()
-      bus = row[0].strip('"').upper()
-      kV = float(row[1])
-      nph_col = 8
-      try:
-          x = float(row[3])
-      except:
-          x = 0.0
-          nph_col = 7 # because the NA, appears as one token, not NA ,
-      try:
-          y = float(row[5])
-      except:
-          y = 0.0
-      nph = int(row[nph_col])
-      phA = False
-      phB = False
-      phC = False
-      for i in range(nph):
-          phs = int(row[nph_col+1+i])
-          if phs == 1:
-              phA = True
-          elif phs == 2:
-              phB = True
-          elif phs == 3:
-              phC = True
-      phases = ''
-      if phA:
-          phases = phases + 'A'
-      if phB:
-          phases = phases + 'B'
-      if phC:
-          phases = phases + 'C'
-      buses[bus] = {'kV':kV, 'x':x, 'y':y, 'nph': nph, 'phases': phases, 'dist': 0}
+  for bus, kV, x, y, nph, phases in dssx.read_buses (fname_bus).tolist():
+    buses[bus] = {'kV':kV, 'x':x, 'y':y, 'nph': nph, 'phases': phases, 'dist': 0}
 
   foundCapacitors = False
   nCapacitors = 0
   lines = {}
   transformers = {}
   elements = {}
-  with open(fname_elements, mode='r') as infile:
-    for i in range(7):
-      next (infile)
-    for line in infile:
-      row = line.split()
-      if len(row) < 1:
-        break  # one-bus power conversion elements are up next
-      key = row[0].strip('"').upper()
-      bus1 = row[1].upper()
-      bus2 = row[2].upper()
-      toks = key.split('.')
-      elements[key] = {'class':toks[0],'name':toks[1],'bus1':bus1,'bus2':bus2}
-      if toks[0] == 'CAPACITOR':
-        foundCapacitors = True
-        nCapacitors += 1
-      elif toks[0] == 'LINE':
-        lines[toks[1]] = {'bus1':bus1,'bus2':bus2}
-      elif toks[0] == 'TRANSFORMER':
-        transformers[toks[1]] = {'bus1':bus1,'bus2':bus2}
+  for key, bclass, bname, bus1, bus2 in dssx.read_elements (fname_elements).tolist():
+    elements[key] = {'class':bclass,'name':bname,'bus1':bus1,'bus2':bus2}
+    if bclass == 'CAPACITOR':
+      foundCapacitors = True
+      nCapacitors += 1
+    elif bclass == 'LINE':
+      lines[bname] = {'bus1':bus1,'bus2':bus2}
+    elif bclass == 'TRANSFORMER':
+      transformers[bname] = {'bus1':bus1,'bus2':bus2}
 
   print ('Found', nCapacitors, 'Capacitors')
 
-  dist = {}
-  with open(fname_profile, mode='r') as infile:
-      reader = csv.reader(infile)
-      next (reader, None)
-      for row in reader:
-          branch = row[0].upper()
-          d1 = float(row[1])
-          d2 = float(row[3])
-          dist[branch] = [d1,d2]
-          if branch in lines:
-              buses[lines[branch]['bus1']]['dist'] = d1
-              buses[lines[branch]['bus2']]['dist'] = d2
+  for branch, d1, d2 in dssx.read_profile (fname_profile).tolist():
+    if branch in lines:
+      buses[lines[branch]['bus1']]['dist'] = d1
+      buses[lines[branch]['bus2']]['dist'] = d2
 
   for pair in pairs:
       seqz1 = seqz[pair['bus1']]
@@ -247,61 +189,30 @@ if __name__ == '__main__':
   print ('there are', len(pairs), 'reduced branches')
 
   # read the snapshot power flows at retained buses
-  bInElement = False
-  #bBus1 = False
-  #bBus2 = False
-  bus1 = ''
-  bus2 = ''
-  bus_phs_p = [[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]
-  bus_phs_q = [[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]
   powers = {}
   branch_buses = {}
-  with open(fname_power, mode='r') as infile:
-    for ln in infile:
-      line = ln.strip()
-      if len(line) < 1:
-        continue
-      if 'ELEMENT =' in line:
-        row = line.split()
-        key = row[2].strip('"').upper()
-        toks = key.split('.')
-        bclass = toks[0]
-        bname = toks[1]
-        bInElement = False
-        if bclass == 'LINE':
-          bus1 = lines[bname]['bus1']
-          bus2 = lines[bname]['bus2']
-          bInElement = True
-        elif bclass == 'TRANSFORMER':
-          bus1 = transformers[bname]['bus1']
-          bus2 = transformers[bname]['bus2']
-          bInElement = True
-        if bInElement:
-          bus_phs_p = [[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]
-          bus_phs_q = [[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]
-          branch_buses[bclass + '.' + bname] = [bus1, bus2]
-          if bus1 in retained or bus2 in retained:
-            powers[key] = {'class':bclass,'name':bname,'bus1':bus1,'bus2':bus2,'p':bus_phs_p,'q':bus_phs_q}
-      elif 'TERMINAL TOTAL' in line:
-        continue
-      elif 'Power Conversion Elements' in line:
-        break
-      elif '= = = = = = =' in line:
-        break
-      elif bInElement == True:
-  #      print (line)
-        row = line.split()
-        bus = row[0].strip('"').upper()
-        phs = int(row[1])
-        p = float(row[2])
-        q = float(row[4])
-        if phs > 0:
-          if bus == bus1:
-            bus_phs_p[0][phs-1] = p
-            bus_phs_q[0][phs-1] = q
-          elif bus == bus2:
-            bus_phs_p[1][phs-1] = p
-            bus_phs_q[1][phs-1] = q
+  keys, flows = dssx.read_branch_powers (fname_power)
+  for key in keys.tolist():
+    bclass, bname = key.split('.')[:2]
+    if bclass == 'LINE':
+      bus1 = lines[bname]['bus1']
+      bus2 = lines[bname]['bus2']
+    else:
+      bus1 = transformers[bname]['bus1']
+      bus2 = transformers[bname]['bus2']
+    branch_buses[bclass + '.' + bname] = [bus1, bus2]
+    if bus1 in retained or bus2 in retained:
+      powers[key] = {'class':bclass,'name':bname,'bus1':bus1,'bus2':bus2,
+                     'p':[[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]],'q':[[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]}
+  for key, bus, phs, p, q in flows.tolist():
+    if key in powers:
+      val = powers[key]
+      if bus == val['bus1']:
+        val['p'][0][phs-1] = p
+        val['q'][0][phs-1] = q
+      elif bus == val['bus2']:
+        val['p'][1][phs-1] = p
+        val['q'][1][phs-1] = q
 
   print ('**', len(powers),'branch power flows at retained buses')
   #for key in powers:
@@ -312,57 +223,37 @@ if __name__ == '__main__':
   G = nx.Graph()
   nAdded = 0
   nNotAdded = 0
-  with open(fname_zone, mode='r') as infile:
-    for ln in infile:
-      line = ln.strip().upper()
-      if ('LINE.' in line) or ('TRANSFORMER.' in line):
-        level = ln.count('\t')
-        idx = line.find('(')
-        idxb = line.find(' ')
-        if idxb >= 0 and idxb < idx:
-          idx = idxb
-        branch = line[:idx]
-        if branch in branch_buses:
-            bus1 = branch_buses[branch][0]
-            bus2 = branch_buses[branch][1]
-            G.add_edge (bus1, bus2)
-            G[bus1][bus2]['name'] = branch
-            nAdded += 1
-        else:
-            nNotAdded += 1
-  #      print (level, branch, bus1, bus2)
+  source_bus = None
+  for branch, level in dssx.read_zone (fname_zone).tolist():
+    if branch in branch_buses:
+      bus1 = branch_buses[branch][0]
+      if source_bus is None:
+        source_bus = bus1
+      bus2 = branch_buses[branch][1]
+      G.add_edge (bus1, bus2)
+      G[bus1][bus2]['name'] = branch
+      nAdded += 1
+    else:
+      nNotAdded += 1
   print ('Branches added to graph =', nAdded, 'not added =', nNotAdded)
 
-  # print (nx.shortest_path (G, '172049D0', '87375'))
+  # index the retained branch flows by (bus, neighbor), and the tree paths between buses
+  branch_ends = {}
+  for key, val in powers.items():
+    branch_ends[(val['bus1'], val['bus2'])] = (key, 1)
+    branch_ends[(val['bus2'], val['bus1'])] = (key, 2)
+  tree = ft.tree_index (G, source_bus)
+
   # try to match up the full-network branch flows to the corresponding reduced branch
   total_pload = 0.0
   total_qload = 0.0
   for pair in pairs:
     bus1 = pair['bus1']
     bus2 = pair['bus2']
-    path12 = nx.shortest_path (G, bus1, bus2)
-    path21 = nx.shortest_path (G, bus2, bus1)
-    next12 = path12[1]
-    next21 = path21[1]
-    key12 = ''
-    end12 = 0
-    key21 = ''
-    end21 = 0
-    for key in powers:
-      br1 = powers[key]['bus1']
-      br2 = powers[key]['bus2']
-      if (br1 == bus1) and (br2 == next12):
-        key12 = key
-        end12 = 1
-      elif (br1 == next12) and (br2 == bus1):
-        key12 = key
-        end12 = 2
-      if (br1 == bus2) and (br2 == next21):
-        key21 = key
-        end21 = 1
-      elif (br1 == next21) and (br2 == bus2):
-        key21 = key
-        end21 = 2
+    next12 = ft.next_hop (tree, bus1, bus2)
+    next21 = ft.next_hop (tree, bus2, bus1)
+    key12, end12 = branch_ends[(bus1, next12)]
+    key21, end21 = branch_ends[(bus2, next21)]
     p12 = powers[key12]['p'][end12-1]
     q12 = powers[key12]['q'][end12-1]
     p21 = powers[key21]['p'][end21-1]
@@ -380,94 +271,76 @@ if __name__ == '__main__':
     pair['qload'] = qload
   print ('found total load of {:.3f} + j{:.3f} kva in the pairs'.format (total_pload, total_qload))
 
+  if bBusLoads:
+    # the pair flows miss the power used at retained buses, and the power leaving them into
+    # branches that are not on a reduced path, which is whatever the path branches deliver
+    path_nbrs = {bus: set() for bus in retained}
+    for pair in pairs:
+      path_nbrs[pair['bus1']].add (ft.next_hop (tree, pair['bus1'], pair['bus2']))
+      path_nbrs[pair['bus2']].add (ft.next_hop (tree, pair['bus2'], pair['bus1']))
+    # each bus adds its power to the pair that links it toward the source, half at each end
+    bus_pair = {}
+    for pair in pairs:
+      for bus, other in [(pair['bus1'], pair['bus2']), (pair['bus2'], pair['bus1'])]:
+        if bus not in bus_pair or tree['depth'][other] < tree['depth'][bus_pair[bus][1]]:
+          bus_pair[bus] = (pair, other)
+    bus_pload = {bus: [0.0, 0.0, 0.0] for bus in bus_pair}
+    bus_qload = {bus: [0.0, 0.0, 0.0] for bus in bus_pair}
+    for (bus, nbr), (key, end) in branch_ends.items():
+      if bus in bus_pair and (nbr in path_nbrs[bus] or nbr not in tree['parent']):
+        for i in range(3):
+          bus_pload[bus][i] -= powers[key]['p'][end-1][i]
+          bus_qload[bus][i] -= powers[key]['q'][end-1][i]
+    for bus, (pair, other) in bus_pair.items():
+      pair['pload'] = [round(a_i + b_i,3) for a_i, b_i in zip(pair['pload'], bus_pload[bus])]
+      pair['qload'] = [round(a_i + b_i,3) for a_i, b_i in zip(pair['qload'], bus_qload[bus])]
+      total_pload += sum(bus_pload[bus])
+      total_qload += sum(bus_qload[bus])
+    print ('found total load of {:.3f} + j{:.3f} kva with the retained buses'.format (total_pload, total_qload))
+
+  table = atp.PairTable (pairs, buses, seqz)
+  cols = {key: val.tolist() for key, val in table.items()}
+  c0 = (1.0e9 / table['z0'] / table['v0'] / 377.0).tolist()  # nF
+  c1 = (1.0e9 / table['z1'] / table['v1'] / 377.0).tolist()
   total_pload = 0.0
   total_qload = 0.0
-  idx = 0
-  op = open ('ReducedNetwork.dss', mode='w')
-  for pair in pairs:
-    idx += 1
+  buf = []
+  for i, pair in enumerate(pairs):
+    idx = i + 1
     bus1 = pair['bus1']
     bus2 = pair['bus2']
-    kv1 = buses[bus1]['kV']
-    kv2 = buses[bus2]['kV']
-    nt = kv1 / kv2
-    seqz1 = seqz[pair['bus1']]
-    seqz2 = seqz[pair['bus2']]
-    km = pair['len']
-    nph = buses[bus1]['nph']
-    nph2 = buses[bus2]['nph']
-    phases = GetOpenDSSPhases (buses[bus1]['phases'])
-    phases2 = GetOpenDSSPhases (buses[bus2]['phases'])
-    r1 = abs(seqz1[1] - seqz2[1]*nt*nt) # refer to side 1
-    x1 = abs(seqz1[2] - seqz2[2]*nt*nt)
-    r0 = abs(seqz1[3] - seqz2[3]*nt*nt)
-    x0 = abs(seqz1[4] - seqz2[4]*nt*nt)
-    rslgf = abs(((2*seqz1[1]+seqz1[3]) - (2*seqz2[1]+seqz2[3])*nt*nt) / 3.0) 
-    xslgf = abs(((2*seqz1[2]+seqz1[4]) - (2*seqz2[2]+seqz2[4])*nt*nt) / 3.0) 
-    if nph2 < nph:
-      nph = nph2
-      phases = phases2
-    if float(buses[bus1]['dist']) > float(buses[bus2]['dist']):
+    nph = cols['nph'][i]
+    phases = GetOpenDSSPhases (buses[bus2 if cols['side2'][i] else bus1]['phases'])
+    r1, x1, r0, x0 = cols['r1'][i], cols['x1'][i], cols['r0'][i], cols['x0'][i]
+    if cols['flip'][i]:
       bus1phs = bus2 + phases
       bus2phs = bus1 + phases
-      kv1 = buses[bus2]['kV']
-      kv2 = buses[bus1]['kV']
+      kv1, kv2 = cols['kv2'][i], cols['kv1'][i]
+      kv1base, kv2base = cols['kv2base'][i], cols['kv1base'][i]
+      bPrimaryDelta = cols['delta2'][i]
     else:
       bus1phs = bus1 + phases
       bus2phs = bus2 + phases
-    if abs(kv1 - kv2) < 0.2:
-      if x0 >= 2.0 * x1: #overhead
-        z0 = 800.0
-        z1 = 450.0
-        v0 = 2.0e5  # km/s
-        v1 = 3.0e5
-      else: #underground
-        z0 = 30.0
-        z1 = 30.0
-        v0 = 1.0e5
-        v1 = 1.0e5
-      c0 = 1.0e9 / z0 / v0 / 377.0  # nF
-      c1 = 1.0e9 / z1 / v1 / 377.0
-      print ('new line.' + str(idx) + ' phases=' + str(nph) + 
-             ' bus1=' + bus1phs + ' bus2=' + bus2phs, file=op);
+      kv1, kv2 = cols['kv1'][i], cols['kv2'][i]
+      kv1base, kv2base = cols['kv1base'][i], cols['kv2base'][i]
+      bPrimaryDelta = cols['delta1'][i]
+    if cols['line'][i]:
+      buf.append (DSS_LINE_TEMPLATE.format (idx, nph, bus1phs, bus2phs))
       if nph > 1:
-        print ('~   r1={:.5f}'.format(r1) + ' x1={:.5f}'.format(x1) + 
-               ' r0={:.5f}'.format(r0) + ' x0={:.5f}'.format(x0) +
-               ' c1={:.5f} c0={:.5f} // len={:.5f}'.format(c1, c0, km), file=op)
+        buf.append (DSS_LINE_SEQ_TEMPLATE.format (r1, x1, r0, x0, c1[i], c0[i], cols['km'][i]))
       else:
-        print ('~   rmatrix=[{:5f}] xmatrix=[{:.5f}] cmatrix=[0] // len={:.5f}'.format(rslgf, xslgf, km), file=op)
+        buf.append (DSS_LINE_1PH_TEMPLATE.format (cols['rslgf'][i], cols['xslgf'][i], cols['km'][i]))
     else:
-      if kv1 > kv2:
-        zbase = kv1 * kv1
-      else:
-        zbase = kv2 * kv2
       conns = '(w w)'
-      bSecondaryDelta = False
-      bPrimaryDelta = False
-      if x0 < 0.8 * x1:
-        if kv1 > kv2:
-          conns = '(d w)'
-          bPrimaryDelta = True
-        else:
-          conns = '(w d)'
-          bSecondaryDelta = True
-      xhl = 100.0 * x1 / zbase
-      sbase = 1000.0
-      kv1base = kv1
-      kv2base = kv2
-      if nph == 2:
-        sbase /= 1.5
-      elif nph == 1:
-        sbase /= 3.0
-        if bSecondaryDelta == False:
-          kv2base /= math.sqrt(3)
-        if bPrimaryDelta == False:
-          kv1base /= math.sqrt(3)
-      print ('new transformer.{:d} phases={:d} buses=({:s} {:s}) conns={:s}'.format (idx, nph, bus1phs, bus2phs, conns), file=op);
-      print ('~   kvs=({:.3f} {:.3f}) kvas=({:.2f} {:.2f}) xhl={:.5f}'.format(kv1base,kv2base,sbase,sbase,xhl), file=op)
-      print ('~   // r1={:.5f} x1={:.5f} r0={:.5f} x0={:.5f}'.format(r1, x1, r0, x0), file=op)
-    pload = sum(pair['pload'])
-    qload = sum(pair['qload'])
+      if bPrimaryDelta:
+        conns = '(d w)'
+      elif cols['delta1'][i] or cols['delta2'][i]:
+        conns = '(w d)'
+      sbase = cols['sbase'][i]
+      buf.append (DSS_XFMR_TEMPLATE.format (idx, nph, bus1phs, bus2phs, conns,
+                                            kv1base, kv2base, sbase, sbase, cols['xhl'][i], r1, x1, r0, x0))
+    pload = cols['pload'][i]
+    qload = cols['qload'][i]
     if pload > 0.0:
       total_pload += pload
       total_qload += qload
@@ -481,24 +354,18 @@ if __name__ == '__main__':
           kv2 /= math.sqrt(3)
           kv1 = round(kv1, 3)
           kv2 = round(kv2, 3)
-      print ('new load.' + str(idx) + '_1 phases=' + str(nph) + \
-             ' bus1=' + bus1phs + ' kv=' + str(kv1) + ' conn=wye model=2' + \
-             ' kw={:.3f}'.format(pload) + ' kvar={:.3f}'.format(qload), file=op)
-      print ('new load.' + str(idx) + '_2 phases=' + str(nph) + \
-             ' bus1=' + bus2phs + ' kv=' + str(kv2) + ' conn=wye model=2' + \
-             ' kw={:.3f}'.format(pload) + ' kvar={:.3f}'.format(qload), file=op)
-
-  op.close()
+      buf.append (DSS_LOAD_TEMPLATE.format (idx, 1, nph, bus1phs, kv1, pload, qload))
+      buf.append (DSS_LOAD_TEMPLATE.format (idx, 2, nph, bus2phs, kv2, pload, qload))
+
+  with open ('ReducedNetwork.dss', mode='w') as op:
+    op.write (''.join (buf))
   print ('wrote total load of {:.3f} + j{:.3f} kva to the reduced OpenDSS network file'.format (total_pload, total_qload))
 
-  xp = open ('ReducedXY.dss', mode='w')
-  for val in sorted(retained):
-    bus = buses[val]
-    print (val,'{:.5f}'.format(float(bus['x'])),'{:.5f}'.format(float(bus['y'])),
-           '{:9.5f}'.format(float(bus['dist'])),sep='\t',file=xp)
-  xp.close()
+  with open ('ReducedXY.dss', mode='w') as xp:
+    xp.write (''.join ([DSS_XY_TEMPLATE.format (val, float(buses[val]['x']), float(buses[val]['y']),
+                                                float(buses[val]['dist'])) for val in sorted(retained)]))
 
-  atp.WriteAtp(atpfile, pairs, retained, buses, seqz, foundCapacitors, bNoCaps)
+  atp.WriteAtp(atpfile, pairs, retained, buses, seqz, foundCapacitors, bNoCaps, table)
   quit()
 
   # informational output for debugging
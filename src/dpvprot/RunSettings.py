@@ -74,6 +74,8 @@ import csv
 import math
 import sys
 import networkx as nx
+import dpvprot.opendss_exports as dssx
+import dpvprot.feeder_tree as ft
 
 if __name__ == '__main__':
   cktname = sys.argv[1]
@@ -85,90 +87,27 @@ if __name__ == '__main__':
   fname_zone = cktname + '_ZoneOut_feeder.txt'
 
   seqz = {}
-  with open(fname_seqz, mode='r') as infile:
-    reader = csv.reader(infile)
-    next (reader, None)
-    for row in reader:
-      bus = row[0].upper()
-      nph = int(row[1])
-      r1 = float(row[2])
-      x1 = float(row[3])
-      r0 = float(row[4])
-      x0 = float(row[5])
-      seqz[bus] = [nph,r1,x1,r0,x0]
+  for bus, nph, r1, x1, r0, x0 in dssx.read_seqz (fname_seqz).tolist():
+    seqz[bus] = [nph,r1,x1,r0,x0]
 
   buses = {}
-  with open(fname_bus, mode='r') as infile:
-    for i in range(6):
-      next (infile)
-    for line in infile:
-  #    print (line)
-      row = line.split()
-      bus = row[0].strip('"').upper()
-      kV = float(row[1])
-      nph_col = 8
-      try:
-          x = float(row[3])
-      except:
-          x = 0.0
-          nph_col = 7 # because the NA, appears as one token, not NA ,
-      try:
-          y = float(row[5])
-      except:
-          y = 0.0
-      nph = int(row[nph_col])
-      phA = False
-      phB = False
-      phC = False
-      for i in range(nph):
-          phs = int(row[nph_col+1+i])
-          if phs == 1:
-              phA = True
-          elif phs == 2:
-              phB = True
-          elif phs == 3:
-              phC = True
-      phases = ''
-      if phA:
-          phases = phases + 'A'
-      if phB:
-          phases = phases + 'B'
-      if phC:
-          phases = phases + 'C'
-      buses[bus] = {'kV':kV, 'x':x, 'y':y, 'nph': nph, 'phases': phases, 'dist': 0}
+  for bus, kV, x, y, nph, phases in dssx.read_buses (fname_bus).tolist():
+    buses[bus] = {'kV':kV, 'x':x, 'y':y, 'nph': nph, 'phases': phases, 'dist': 0}
 
   lines = {}
   transformers = {}
   elements = {}
-  with open(fname_elements, mode='r') as infile:
-    for i in range(7):
-      next (infile)
-    for line in infile:
-      row = line.split()
-      if len(row) < 1:
-        break  # one-bus power conversion elements are up next
-      key = row[0].strip('"').upper()
-      bus1 = row[1].upper()
-      bus2 = row[2].upper()
-      toks = key.split('.')
-      elements[key] = {'class':toks[0],'name':toks[1],'bus1':bus1,'bus2':bus2}
-      if toks[0] == 'LINE':
-        lines[toks[1]] = {'bus1':bus1,'bus2':bus2}
-      elif toks[0] == 'TRANSFORMER':
-        transformers[toks[1]] = {'bus1':bus1,'bus2':bus2}
+  for key, bclass, bname, bus1, bus2 in dssx.read_elements (fname_elements).tolist():
+    elements[key] = {'class':bclass,'name':bname,'bus1':bus1,'bus2':bus2}
+    if bclass == 'LINE':
+      lines[bname] = {'bus1':bus1,'bus2':bus2}
+    elif bclass == 'TRANSFORMER':
+      transformers[bname] = {'bus1':bus1,'bus2':bus2}
 
-  dist = {}
-  with open(fname_profile, mode='r') as infile:
-      reader = csv.reader(infile)
-      next (reader, None)
-      for row in reader:
-          branch = row[0].upper()
-          d1 = float(row[1])
-          d2 = float(row[3])
-          dist[branch] = [d1,d2]
-          if branch in lines:
-              buses[lines[branch]['bus1']]['dist'] = d1
-              buses[lines[branch]['bus2']]['dist'] = d2
+  for branch, d1, d2 in dssx.read_profile (fname_profile).tolist():
+    if branch in lines:
+      buses[lines[branch]['bus1']]['dist'] = d1
+      buses[lines[branch]['bus2']]['dist'] = d2
 
   reclosers = {}
   retained = []
@@ -189,59 +128,30 @@ if __name__ == '__main__':
   # print ('retained {:d} recloser buses'.format(len(retained)), retained)
 
   # read the snapshot power flows at recloser buses
-  bInElement = False
-  bus1 = ''
-  bus2 = ''
-  bus_phs_p = [[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]
-  bus_phs_q = [[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]
   powers = {}
   branch_buses = {}
-  with open(fname_power, mode='r') as infile:
-    for ln in infile:
-      line = ln.strip()
-      if len(line) < 1:
-        continue
-      if 'ELEMENT =' in line:
-        row = line.split()
-        key = row[2].strip('"').upper()
-        toks = key.split('.')
-        bclass = toks[0]
-        bname = toks[1]
-        bInElement = False
-        if bclass == 'LINE':
-          bus1 = lines[bname]['bus1']
-          bus2 = lines[bname]['bus2']
-          bInElement = True
-        elif bclass == 'TRANSFORMER':
-          bus1 = transformers[bname]['bus1']
-          bus2 = transformers[bname]['bus2']
-          bInElement = True
-        if bInElement:
-          bus_phs_p = [[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]
-          bus_phs_q = [[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]
-          branch_buses[bclass + '.' + bname] = [bus1, bus2]
-          if bus1 in retained or bus2 in retained:
-            powers[key] = {'class':bclass,'name':bname,'bus1':bus1,'bus2':bus2,'p':bus_phs_p,'q':bus_phs_q}
-      elif 'TERMINAL TOTAL' in line:
-        continue
-      elif 'Power Conversion Elements' in line:
-        break
-      elif '= = = = = = =' in line:
-        break
-      elif bInElement == True:
-  #      print (line)
-        row = line.split()
-        bus = row[0].strip('"').upper()
-        phs = int(row[1])
-        p = float(row[2])
-        q = float(row[4])
-        if phs > 0:
-          if bus == bus1:
-            bus_phs_p[0][phs-1] = p
-            bus_phs_q[0][phs-1] = q
-          elif bus == bus2:
-            bus_phs_p[1][phs-1] = p
-            bus_phs_q[1][phs-1] = q
+  keys, flows = dssx.read_branch_powers (fname_power)
+  for key in keys.tolist():
+    bclass, bname = key.split('.')[:2]
+    if bclass == 'LINE':
+      bus1 = lines[bname]['bus1']
+      bus2 = lines[bname]['bus2']
+    else:
+      bus1 = transformers[bname]['bus1']
+      bus2 = transformers[bname]['bus2']
+    branch_buses[bclass + '.' + bname] = [bus1, bus2]
+    if bus1 in retained or bus2 in retained:
+      powers[key] = {'class':bclass,'name':bname,'bus1':bus1,'bus2':bus2,
+                     'p':[[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]],'q':[[0.0, 0.0, 0.0],[0.0, 0.0, 0.0]]}
+  for key, bus, phs, p, q in flows.tolist():
+    if key in powers:
+      val = powers[key]
+      if bus == val['bus1']:
+        val['p'][0][phs-1] = p
+        val['q'][0][phs-1] = q
+      elif bus == val['bus2']:
+        val['p'][1][phs-1] = p
+        val['q'][1][phs-1] = q
 
   print (len(powers),'branch power flows at retained buses')
   for rec, recval in reclosers.items():
@@ -289,78 +199,63 @@ if __name__ == '__main__':
   nAdded = 0
   nNotAdded = 0
   source_bus = None
-  with open(fname_zone, mode='r') as infile:
-    for ln in infile:
-      line = ln.strip().upper()
-      if ('LINE.' in line) or ('TRANSFORMER.' in line):
-        level = ln.count('\t')
-        idx = line.find('(')
-        idxb = line.find(' ')
-        if idxb >= 0 and idxb < idx:
-          idx = idxb
-        branch = line[:idx]
-        if branch in branch_buses:
-            bus1 = branch_buses[branch][0]
-            if source_bus is None:
-                source_bus = bus1
-            bus2 = branch_buses[branch][1]
-            G.add_edge (bus1, bus2)
-            G[bus1][bus2]['name'] = branch
-            nAdded += 1
-        else:
-            nNotAdded += 1
-  #      print (level, branch, bus1, bus2)
+  for branch, level in dssx.read_zone (fname_zone).tolist():
+    if branch in branch_buses:
+      bus1 = branch_buses[branch][0]
+      if source_bus is None:
+        source_bus = bus1
+      bus2 = branch_buses[branch][1]
+      G.add_edge (bus1, bus2)
+      G[bus1][bus2]['name'] = branch
+      nAdded += 1
+    else:
+      nNotAdded += 1
   print ('Added {:d} branches to graph, {:d} not added, source bus is {:s}'.format (nAdded, nNotAdded, source_bus))
 
-  # Now check all the faultable buses; trace back to source; stop at the first recloser.
-  #   If that first recloser and faultable bus are at the same voltage level, update Z values for that recloser.
-  #   Otherwise, continue to the next faultable bus. (At least for now, we are not attempting to coordinate through transformers.)
+  # Now check all the faultable buses; each belongs to the zone of the first recloser toward the source
+  #   at the same voltage level, and updates the Z values for that recloser.
+  #   (At least for now, we are not attempting to coordinate through transformers.)
+  tree = ft.tree_index (G, source_bus, reclosers)
+  zones = ft.protection_zones (tree, level={bus: bval['kV'] for bus, bval in buses.items()}, tolerance=0.1)
   for bus, bval in buses.items():
-      if bus not in G.nodes():  # could be the transmission source, or another bus behind the EnergyMeter
+      if bus not in tree['parent']:  # could be the transmission source, or another bus behind the EnergyMeter
+          continue
+      b = zones['zone'][bus]
+      if b is None:
           continue
-      bkV = bval['kV']
       r1 = seqz[bus][1]
       x1 = seqz[bus][2]
       r0 = seqz[bus][3]
       x0 = seqz[bus][4]
-  #    print (bus, bkV, r1, x1, r0, x0)
-      route = nx.shortest_path(G, bus, source_bus)
-  #    print (route)
-      for b in route:
-          if b in reclosers:
-              rec = reclosers[b]
-              if abs(rec['kV'] - bkV) < 0.1:
-  #                print ('found {:s} at same voltage level'.format (rec['tag']))
-                  rec['Nzone'] += 1
-                  if r1 > rec['Zr1.re']:
-                      rec['Zr1.re'] = r1
-                  if x1 > rec['Zr1.im']:
-                      rec['Zr1.im'] = x1
-                      rec['RemoteBus'] = bus
-                  if r0 > rec['Zr0.re']:
-                      rec['Zr0.re'] = r0
-                  if r0 > rec['Zr0.im']:
-                      rec['Zr0.im'] = x0
-                  break
+  #    print (bus, bval['kV'], r1, x1, r0, x0)
+      rec = reclosers[b]
+      rec['Nzone'] += 1
+      if r1 > rec['Zr1.re']:
+          rec['Zr1.re'] = r1
+      if x1 > rec['Zr1.im']:
+          rec['Zr1.im'] = x1
+          rec['RemoteBus'] = bus
+      if r0 > rec['Zr0.re']:
+          rec['Zr0.re'] = r0
+      if r0 > rec['Zr0.im']:
+          rec['Zr0.im'] = x0
 
   # now find the downstream reclosers
   for bus, rec in reclosers.items():
+      if bus not in tree['parent']:
+          continue
       r1 = seqz[bus][1]
       x1 = seqz[bus][2]
       r0 = seqz[bus][3]
       x0 = seqz[bus][4]
-      route = nx.shortest_path(G, bus, source_bus)
-      for b in route:
-           if bus == b:
-               continue
-           if b in reclosers:
-               if x1 < reclosers[b]['Zn1.im']:
-                   reclosers[b]['Zn1.re'] = r1
-                   reclosers[b]['Zn1.im'] = x1
-                   reclosers[b]['Zn0.re'] = r0
-                   reclosers[b]['Zn0.im'] = x0
-                   reclosers[b]['NearestDownstream'] = rec['tag']
-               break
+      for b in ft.upstream_devices (tree, bus, include_self=False):
+          if x1 < reclosers[b]['Zn1.im']:
+              reclosers[b]['Zn1.re'] = r1
+              reclosers[b]['Zn1.im'] = x1
+              reclosers[b]['Zn0.re'] = r0
+              reclosers[b]['Zn0.im'] = x0
+              reclosers[b]['NearestDownstream'] = rec['tag']
+          break
 
 
   print ('\nRecloser Setting Data for {:s} from {:s}'.format(cktname, source_bus))
@@ -11,11 +11,31 @@ Public Functions:
 
 import sys
 from comtrade import Comtrade
+import decimation
+import event_timing
 import numpy as np
 import math
 from scipy import signal
 
+def _expand (p, nd):
+    """Appends nd axes to a per-setting array, so it broadcasts against the loop
+    and sample axes of a T400LBatch; scalar settings pass through unchanged."""
+    if np.ndim (p) == 0:
+        return p
+    return np.reshape (p, np.shape (p) + (1,) * nd)
+
+def _each (f, p):
+    """Applies a scalar math function to a setting, or to each of an array of settings."""
+    if np.ndim (p) == 0:
+        return f (p)
+    return np.array ([f (x) for x in p])
+
 class T400L:
+    # row order of the loop matrices built by construct_relay_model
+    LOOPS = ['AG', 'BG', 'CG', 'AB', 'BC', 'CA']
+    # the TD32 and I32 names use the phase alone for ground loops
+    LOOPS32 = ['A', 'B', 'C', 'AB', 'BC', 'CA']
+
     def __init__(self):
         # factory default settings
         self.VMIN=0.03           # overcurrent minimum pickup, eq. 2.8
@@ -62,228 +82,123 @@ class T400L:
                 print ('Setting {:s} not found in T400L'.format (key))
 
     def make_td21_rt (self, VLOOP, ILOOP, ncy, m):
-        vdel = VLOOP - m * self.Z1MAG * ILOOP
-        vr = np.zeros (vdel.size)
-        vr[ncy:] = vdel[:-ncy]
+        vdel = VLOOP - m * _expand (self.Z1MAG, 2) * ILOOP
+        vr = np.zeros (vdel.shape)
+        vr[..., ncy:] = vdel[..., :-ncy]
         return vr
 
     def make_td21_trip (self, OP, RT, VT):
-        condition_1 = np.ones(OP.size) * (np.absolute(OP) > np.absolute(RT))
-        condition_2 = np.ones(OP.size) * (np.sign(OP * RT) < 0)
-        condition_3 = np.ones(OP.size) * (np.absolute(OP) > np.absolute(VT))
+        condition_1 = np.ones(OP.shape) * (np.absolute(OP) > np.absolute(RT))
+        condition_2 = np.ones(OP.shape) * (np.sign(OP * RT) < 0)
+        condition_3 = np.ones(OP.shape) * (np.absolute(OP) > np.absolute(VT))
         return np.logical_and (condition_1, np.logical_and (condition_2, condition_3))
 
     def supervise_21_trip (self, P21, P32, POC):
         return np.logical_and (P21, np.logical_and (P32, POC))
 
     def construct_relay_model (self):
+        # the six loops are rows of (..., 6, npt) matrices, in the order of LOOPS;
+        #  any leading axes come from T400LBatch, with settings broadcast over them
+        DV = np.stack ((self.DVA, self.DVB, self.DVC, self.DVAB, self.DVBC, self.DVCA), axis=-2)
+        DIZ = np.stack ((self.DIZA0, self.DIZB0, self.DIZC0, self.DIZAB, self.DIZBC, self.DIZCA), axis=-2)
+        VLOOP = np.stack ((self.VA, self.VB, self.VC, self.VAB, self.VBC, self.VCA), axis=-2)
+        ILOOP = np.stack ((self.IA0, self.IB0, self.IC0, self.IAB, self.IBC, self.ICA), axis=-2)
+        ground = np.array ([True, True, True, False, False, False])[:,np.newaxis]
+        cols = np.arange (self.npt)
+
         # restrain thresholds
-        self.RPP = self.VNOM * math.sqrt(2.0) * np.ones(self.npt)
-        self.RPG = self.VNOM * math.sqrt(2.0/3.0) * np.ones(self.npt)
+        self.RPP = _expand (self.VNOM, 1) * math.sqrt(2.0) * np.ones(self.npt)
+        self.RPG = _expand (self.VNOM, 1) * math.sqrt(2.0/3.0) * np.ones(self.npt)
         # predicting the starting voltages and times
-        self.VSTAG = np.absolute(self.DVA) + self.VSTARTF * self.Z1MAG * np.absolute(self.DIZA0)
-        self.VSTBG = np.absolute(self.DVB) + self.VSTARTF * self.Z1MAG * np.absolute(self.DIZB0)
-        self.VSTCG = np.absolute(self.DVC) + self.VSTARTF * self.Z1MAG * np.absolute(self.DIZC0)
-        self.VSTAB = np.absolute(self.DVAB) + self.VSTARTF * self.Z1MAG * np.absolute(self.DIZAB)
-        self.VSTBC = np.absolute(self.DVBC) + self.VSTARTF * self.Z1MAG * np.absolute(self.DIZBC)
-        self.VSTCA = np.absolute(self.DVCA) + self.VSTARTF * self.Z1MAG * np.absolute(self.DIZCA)
+        self.VST = np.absolute(DV) + _expand (self.VSTARTF * self.Z1MAG, 2) * np.absolute(DIZ)
         # predict the loop starting signals
-        self.PSTAG = np.ones(self.npt) * (self.VSTAG > self.VSTARTG)
-        self.PSTBG = np.ones(self.npt) * (self.VSTBG > self.VSTARTG)
-        self.PSTCG = np.ones(self.npt) * (self.VSTCG > self.VSTARTG)
-        self.PSTAB = np.ones(self.npt) * (self.VSTAB > self.VSTARTP)
-        self.PSTBC = np.ones(self.npt) * (self.VSTBC > self.VSTARTP)
-        self.PSTCA = np.ones(self.npt) * (self.VSTCA > self.VSTARTP)
+        self.PST = np.ones(DV.shape) * (self.VST > np.where (ground, _expand (self.VSTARTG, 2), _expand (self.VSTARTP, 2)))
         # predict the overall START signal
-        istarts = [np.argmax(self.PSTAG > 0),
-                   np.argmax(self.PSTBG > 0),
-                   np.argmax(self.PSTCG > 0),
-                   np.argmax(self.PSTAB > 0),
-                   np.argmax(self.PSTBC > 0),
-                   np.argmax(self.PSTCA > 0)]
+        istarts = np.argmax(self.PST > 0, axis=-1)
         idx1 = self.npt - self.ncy - 1
-        for idx in istarts:
-            if (idx > 0) and (idx < idx1):
-                idx1 = idx
+        early = (istarts > 0) & (istarts < idx1)
+        idx1 = np.min (np.where (early, istarts, idx1), axis=-1)
         idx2 = idx1 + self.ncy
 #        print (istarts, idx1, idx2)
 #        print ('START active from {:.4f}s to {:.3f}s'.format (self.t[idx1], self.t[idx2]))
-        self.PSTART = np.zeros (self.npt)
-        self.PSTART[idx1:idx2] = 1
+        lo = np.asarray (idx1)[..., np.newaxis]
+        hi = np.asarray (idx2)[..., np.newaxis]
+        self.PSTART = np.ones (self.npt) * ((cols >= lo) & (cols < hi))
         # suppress the starting signals outside of the one-cycle window
-        self.PSTAG = self.PSTAG * self.PSTART
-        self.PSTBG = self.PSTBG * self.PSTART
-        self.PSTCG = self.PSTCG * self.PSTART
-        self.PSTAB = self.PSTAB * self.PSTART
-        self.PSTBC = self.PSTBC * self.PSTART
-        self.PSTCA = self.PSTCA * self.PSTART
+        self.PST = self.PST * self.PSTART[..., np.newaxis, :]
 
         # calculate the raw TD32 operating quantities early, to (future) assist in fault identification as the manual describes
-        self.RAW32AG=-self.DVA*self.DIZA0
-        self.RAW32BG=-self.DVB*self.DIZB0
-        self.RAW32CG=-self.DVC*self.DIZC0
-        self.RAW32AB=-self.DVAB*self.DIZAB
-        self.RAW32BC=-self.DVBC*self.DIZBC
-        self.RAW32CA=-self.DVCA*self.DIZCA
-        self.RAW32MAX = np.maximum(self.RAW32AG, np.maximum(self.RAW32BG, np.maximum(self.RAW32CG, np.maximum(self.RAW32AB, np.maximum(self.RAW32BC, self.RAW32CA)))))
-        raw_thresh = self.RAW_THRESH * self.RAW32MAX
+        self.RAW32 = -DV*DIZ
+        self.RAW32MAX = np.max (self.RAW32, axis=-2)
+        raw_thresh = _expand (self.RAW_THRESH, 1) * self.RAW32MAX
 
         # perform a fault identification based on starting signals
         # for now, choose fault type based on comparing VSTART operating quantities to the highest of them,
         #  and disable any changes after an adjustable time, FID_WINDOW
-        self.PFSAG = np.zeros(self.npt)
-        self.PFSBG = np.zeros(self.npt)
-        self.PFSCG = np.zeros(self.npt)
-        self.PFSAB = np.zeros(self.npt)
-        self.PFSBC = np.zeros(self.npt)
-        self.PFSCA = np.zeros(self.npt)
-        self.VSTMAX = np.maximum(self.VSTAG, np.maximum(self.VSTBG, np.maximum(self.VSTCG, np.maximum(self.VSTAB, np.maximum(self.VSTBC, self.VSTCA)))))
-        vst_thresh = self.VST_THRESH * self.VSTMAX
-        FSAG = 0.0
-        FSBG = 0.0
-        FSCG = 0.0
-        FSAB = 0.0
-        FSBC = 0.0
-        FSCA = 0.0
-        idxWindow = idx1 + round(self.FID_WINDOW / self.dt)
-        print ('FID idx1={:d}, idx2={:d}, idxWindow={:d}, FID_WINDOW={:.6f}, dt={:.6f}'.format (idx1, idx2, idxWindow, self.FID_WINDOW, self.dt))
-        for i in range(idx1, idx2+1):  # FS can only be positive while START is positive
-            if i < idxWindow:
-                if self.PSTAG[i] > 0.0 and self.VSTAG[i] >= vst_thresh[i]:
-                    FSAG = 1.0
-                if self.PSTBG[i] > 0.0 and self.VSTBG[i] >= vst_thresh[i]:
-                    FSBG = 1.0
-                if self.PSTCG[i] > 0.0 and self.VSTCG[i] >= vst_thresh[i]:
-                    FSCG = 1.0
-                if self.PSTAB[i] > 0.0 and self.VSTAB[i] >= vst_thresh[i]:
-                    FSAB = 1.0
-                if self.PSTBC[i] > 0.0 and self.VSTBC[i] >= vst_thresh[i]:
-                    FSBC = 1.0
-                if self.PSTCA[i] > 0.0 and self.VSTCA[i] >= vst_thresh[i]:
-                    FSCA = 1.0
-            self.PFSAG[i] = FSAG
-            self.PFSBG[i] = FSBG
-            self.PFSCG[i] = FSCG
-            self.PFSAB[i] = FSAB
-            self.PFSBC[i] = FSBC
-            self.PFSCA[i] = FSCA
+        self.VSTMAX = np.max (self.VST, axis=-2)
+        vst_thresh = _expand (self.VST_THRESH, 1) * self.VSTMAX
+        idxWindow = idx1 + np.round (np.divide (self.FID_WINDOW, self.dt)).astype (int)
+        if np.ndim (idx1) == 0:
+            print ('FID idx1={:d}, idx2={:d}, idxWindow={:d}, FID_WINDOW={:.6f}, dt={:.6f}'.format (int(idx1), int(idx2), int(idxWindow), self.FID_WINDOW, self.dt))
+        # FS latches at the first qualifying sample in the window, and can only be positive while START is positive
+        idxEnd = np.maximum (idx1, np.minimum (idxWindow, idx2+1))
+        inwin = (cols >= lo) & (cols < np.asarray (idxEnd)[..., np.newaxis])
+        hits = (self.PST > 0.0) & (self.VST >= vst_thresh[..., np.newaxis, :]) & inwin[..., np.newaxis, :]
+        ifirst = np.where (np.any (hits, axis=-1), np.argmax (hits, axis=-1), self.npt)
+        self.PFS = np.ones(DV.shape) * np.logical_and (cols >= ifirst[..., np.newaxis], cols <= hi[..., np.newaxis])
 
         ########## TD32 Equations for SynchroWave Event, but use predicted instead of actual FSAG
-        ########## TD32A
-        print ('rest_offset', self.rest_offset)
-        self.TD32OA=self.RAW32AG*self.PFSAG
-        self.TD32RFA=(self.rest_offset + self.DIZA0*self.DIZA0*self.TD32ZF)*self.PSTART
-        self.TD32RRA=(-self.rest_offset - self.DIZA0*self.DIZA0*self.TD32ZR)*self.PSTART
-        ##########  TD32B
-        self.TD32OB=self.RAW32BG*self.PFSBG
-        self.TD32RFB=(self.rest_offset + self.DIZB0*self.DIZB0*self.TD32ZF)*self.PSTART
-        self.TD32RRB=(-self.rest_offset - self.DIZB0*self.DIZB0*self.TD32ZR)*self.PSTART
-        ##########  TD32C
-        self.TD32OC=self.RAW32CG*self.PFSCG
-        self.TD32RFC=(self.rest_offset + self.DIZC0*self.DIZC0*self.TD32ZF)*self.PSTART
-        self.TD32RRC=(-self.rest_offset - self.DIZC0*self.DIZC0*self.TD32ZR)*self.PSTART
-        ##########  self.TD32AB
-        self.TD32OAB=self.RAW32AB*self.PFSAB
-        self.TD32RFAB=(self.rest_offset + self.DIZAB*self.DIZAB*self.TD32ZF)*self.PSTART
-        self.TD32RRAB=(-self.rest_offset - self.DIZAB*self.DIZAB*self.TD32ZR)*self.PSTART
-        ##########  self.TD32BC
-        self.TD32OBC=self.RAW32BC*self.PFSBC
-        self.TD32RFBC=(self.rest_offset + self.DIZBC*self.DIZBC*self.TD32ZF)*self.PSTART
-        self.TD32RRBC=(-self.rest_offset - self.DIZBC*self.DIZBC*self.TD32ZR)*self.PSTART
-        ##########  self.TD32CA
-        self.TD32OCA=self.RAW32CA*self.PFSCA
-        self.TD32RFCA=(self.rest_offset + self.DIZCA*self.DIZCA*self.TD32ZF)*self.PSTART
-        self.TD32RRCA=(-self.rest_offset - self.DIZCA*self.DIZCA*self.TD32ZR)*self.PSTART
+        if np.ndim (idx1) == 0:
+            print ('rest_offset', self.rest_offset)
+        PSTART = self.PSTART[..., np.newaxis, :]
+        self.TD32O=self.RAW32*self.PFS
+        self.TD32RF=(_expand (self.rest_offset, 2) + DIZ*DIZ*_expand (self.TD32ZF, 2))*PSTART
+        self.TD32RR=(-_expand (self.rest_offset, 2) - DIZ*DIZ*_expand (self.TD32ZR, 2))*PSTART
 
         ##########  self.TD21 Equations for SynchroWave Event
-        ##########  Operate for AG, BG, CG Loops
-        self.TD21OAG=(self.DVA-self.DIZA0*self.TD21MG*self.Z1MAG)*self.PFSAG  # was PSTAG, etc.
-        self.TD21OBG=(self.DVB-self.DIZB0*self.TD21MG*self.Z1MAG)*self.PFSBG
-        self.TD21OCG=(self.DVC-self.DIZC0*self.TD21MG*self.Z1MAG)*self.PFSCG
-        ##########  Operate for AB, BC, CA Loops
-        self.TD21OAB=(self.DVAB-self.DIZAB*self.TD21MP*self.Z1MAG)*self.PFSAB
-        self.TD21OBC=(self.DVBC-self.DIZBC*self.TD21MP*self.Z1MAG)*self.PFSBC
-        self.TD21OCA=(self.DVCA-self.DIZCA*self.TD21MP*self.Z1MAG)*self.PFSCA
+        ##########  Operate for AG, BG, CG, AB, BC, CA Loops
+        TD21M = np.where (ground, _expand (self.TD21MG, 2), _expand (self.TD21MP, 2))
+        self.TD21O=(DV-DIZ*TD21M*_expand (self.Z1MAG, 2))*self.PFS  # was PSTAG, etc.
 
         # construct the TD21 restraint and tripping quantities
-        self.TD21RAB = self.make_td21_rt (self.VAB, self.IAB, self.ncy, self.TD21MP)
-        self.TD21RBC = self.make_td21_rt (self.VBC, self.IBC, self.ncy, self.TD21MP)
-        self.TD21RCA = self.make_td21_rt (self.VCA, self.ICA, self.ncy, self.TD21MP)
-        self.TD21RAG = self.make_td21_rt (self.VA, self.IA0, self.ncy, self.TD21MG)
-        self.TD21RBG = self.make_td21_rt (self.VB, self.IB0, self.ncy, self.TD21MG)
-        self.TD21RCG = self.make_td21_rt (self.VC, self.IC0, self.ncy, self.TD21MG)
-        self.P21AB = self.make_td21_trip (self.TD21OAB, self.TD21RAB, self.spu*self.RPP)
-        self.P21BC = self.make_td21_trip (self.TD21OBC, self.TD21RBC, self.spu*self.RPP)
-        self.P21CA = self.make_td21_trip (self.TD21OCA, self.TD21RCA, self.spu*self.RPP)
-        self.P21AG = self.make_td21_trip (self.TD21OAG, self.TD21RAG, self.spu*self.RPG)
-        self.P21BG = self.make_td21_trip (self.TD21OBG, self.TD21RBG, self.spu*self.RPG)
-        self.P21CG = self.make_td21_trip (self.TD21OCG, self.TD21RCG, self.spu*self.RPG)
+        self.TD21R = self.make_td21_rt (VLOOP, ILOOP, self.ncy, TD21M)
+        self.P21 = self.make_td21_trip (self.TD21O, self.TD21R,
+                                        _expand (self.spu, 2)*np.where (ground, self.RPG[..., np.newaxis, :], self.RPP[..., np.newaxis, :]))
 
         # integrating the TD32 operating and restraining torques
-        self.I32OA = self.dt * np.cumsum (self.TD32OA)
-        self.I32OB = self.dt * np.cumsum (self.TD32OB)
-        self.I32OC = self.dt * np.cumsum (self.TD32OC)
-        self.I32RFA = self.dt * np.cumsum (self.TD32RFA)
-        self.I32RFB = self.dt * np.cumsum (self.TD32RFB)
-        self.I32RFC = self.dt * np.cumsum (self.TD32RFC)
-        self.I32RRA = self.dt * np.cumsum (self.TD32RRA)
-        self.I32RRB = self.dt * np.cumsum (self.TD32RRB)
-        self.I32RRC = self.dt * np.cumsum (self.TD32RRC)
-        self.I32OAB = self.dt * np.cumsum (self.TD32OAB)
-        self.I32OBC = self.dt * np.cumsum (self.TD32OBC)
-        self.I32OCA = self.dt * np.cumsum (self.TD32OCA)
-        self.I32RFAB = self.dt * np.cumsum (self.TD32RFAB)
-        self.I32RFBC = self.dt * np.cumsum (self.TD32RFBC)
-        self.I32RFCA = self.dt * np.cumsum (self.TD32RFCA)
-        self.I32RRAB = self.dt * np.cumsum (self.TD32RRAB)
-        self.I32RRBC = self.dt * np.cumsum (self.TD32RRBC)
-        self.I32RRCA = self.dt * np.cumsum (self.TD32RRCA)
+        self.I32O = self.dt * np.cumsum (self.TD32O, axis=-1)
+        self.I32RF = self.dt * np.cumsum (self.TD32RF, axis=-1)
+        self.I32RR = self.dt * np.cumsum (self.TD32RR, axis=-1)
         # predict the directional signals
-        self.P32FAG = np.ones(self.npt) * (self.I32OA > self.I32RFA) * self.PFSAG # PSTART
-        self.P32FBG = np.ones(self.npt) * (self.I32OB > self.I32RFB) * self.PFSBG # PSTART
-        self.P32FCG = np.ones(self.npt) * (self.I32OC > self.I32RFC) * self.PFSCG # PSTART
-        self.P32FAB = np.ones(self.npt) * (self.I32OAB > self.I32RFAB) * self.PFSAB # PSTART
-        self.P32FBC = np.ones(self.npt) * (self.I32OBC > self.I32RFBC) * self.PFSBC # PSTART
-        self.P32FCA = np.ones(self.npt) * (self.I32OCA > self.I32RFCA) * self.PFSCA # PSTART
-        self.P32RAG = np.ones(self.npt) * (self.I32OA < self.I32RRA) * self.PFSAG # PSTART
-        self.P32RBG = np.ones(self.npt) * (self.I32OB < self.I32RRB) * self.PFSBG # PSTART
-        self.P32RCG = np.ones(self.npt) * (self.I32OC < self.I32RRC) * self.PFSCG # PSTART
-        self.P32RAB = np.ones(self.npt) * (self.I32OAB < self.I32RRAB) * self.PFSAB # PSTART
-        self.P32RBC = np.ones(self.npt) * (self.I32OBC < self.I32RRBC) * self.PFSBC # PSTART
-        self.P32RCA = np.ones(self.npt) * (self.I32OCA < self.I32RRCA) * self.PFSCA # PSTART
-        self.P32FA = np.logical_or (np.logical_or (self.P32FAG, self.P32FAB), self.P32FCA)
-        self.P32FB = np.logical_or (np.logical_or (self.P32FBG, self.P32FAB), self.P32FBC)
-        self.P32FC = np.logical_or (np.logical_or (self.P32FCG, self.P32FBC), self.P32FCA)
-        self.P32RA = np.logical_or (np.logical_or (self.P32RAG, self.P32RAB), self.P32RCA)
-        self.P32RB = np.logical_or (np.logical_or (self.P32RBG, self.P32RAB), self.P32RBC)
-        self.P32RC = np.logical_or (np.logical_or (self.P32RCG, self.P32RBC), self.P32RCA)
+        self.P32F = np.ones(DV.shape) * (self.I32O > self.I32RF) * self.PFS # PSTART
+        self.P32R = np.ones(DV.shape) * (self.I32O < self.I32RR) * self.PFS # PSTART
 
         # integrate the overcurrent signal and pickup from self.PSTART
-        self.IOCAB = self.dt * np.cumsum(np.absolute(self.DIZAB)*self.PSTART) # self.PSTAB, etc.
-        self.IOCBC = self.dt * np.cumsum(np.absolute(self.DIZBC)*self.PSTART)
-        self.IOCCA = self.dt * np.cumsum(np.absolute(self.DIZCA)*self.PSTART)
-        self.IOCAG = self.dt * np.cumsum(np.absolute(self.DIZA0)*self.PSTART)
-        self.IOCBG = self.dt * np.cumsum(np.absolute(self.DIZB0)*self.PSTART)
-        self.IOCCG = self.dt * np.cumsum(np.absolute(self.DIZC0)*self.PSTART)
+        self.IOC = self.dt * np.cumsum(np.absolute(DIZ)*PSTART, axis=-1) # self.PSTAB, etc.
         pup = self.VNOM*self.VMIN/(1-self.TD21MP)/self.Z1MAG
         pug = self.VNOM*self.VMIN/(1-self.TD21MG)/self.Z1MAG/math.sqrt(3.0)
-        self.IOCPUP = self.dt * np.cumsum(np.ones(self.npt)*pup*self.PSTART) + self.secmarg_oc
-        self.IOCPUG = self.dt * np.cumsum(np.ones(self.npt)*pug*self.PSTART) + self.secmarg_oc
+        self.IOCPUP = self.dt * np.cumsum(np.ones(self.npt)*_expand (pup, 1)*self.PSTART, axis=-1) + _expand (self.secmarg_oc, 1)
+        self.IOCPUG = self.dt * np.cumsum(np.ones(self.npt)*_expand (pug, 1)*self.PSTART, axis=-1) + _expand (self.secmarg_oc, 1)
         # predict the OC21 supervision signals
-        self.POCAB = np.ones(self.npt) * (self.IOCAB > self.IOCPUP) * self.PSTART
-        self.POCBC = np.ones(self.npt) * (self.IOCBC > self.IOCPUP) * self.PSTART
-        self.POCCA = np.ones(self.npt) * (self.IOCCA > self.IOCPUP) * self.PSTART
-        self.POCAG = np.ones(self.npt) * (self.IOCAG > self.IOCPUG) * self.PSTART
-        self.POCBG = np.ones(self.npt) * (self.IOCBG > self.IOCPUG) * self.PSTART
-        self.POCCG = np.ones(self.npt) * (self.IOCCG > self.IOCPUG) * self.PSTART
+        self.POC = np.ones(DV.shape) * (self.IOC > np.where (ground, self.IOCPUG[..., np.newaxis, :], self.IOCPUP[..., np.newaxis, :])) * PSTART
 
         # predict the supervised TD21 trip signals
-        self.S21AB = self.supervise_21_trip (self.P21AB, self.P32FAB, self.POCAB)
-        self.S21BC = self.supervise_21_trip (self.P21BC, self.P32FBC, self.POCBC)
-        self.S21CA = self.supervise_21_trip (self.P21CA, self.P32FCA, self.POCCA)
-        self.S21AG = self.supervise_21_trip (self.P21AG, self.P32FAG, self.POCAG)
-        self.S21BG = self.supervise_21_trip (self.P21BG, self.P32FBG, self.POCBG)
-        self.S21CG = self.supervise_21_trip (self.P21CG, self.P32FCG, self.POCCG)
+        self.S21 = self.supervise_21_trip (self.P21, self.P32F, self.POC)
+
+        # per-loop views of the matrices, for plotting
+        for k in range(len(self.LOOPS)):
+            loop = self.LOOPS[k]
+            for key in ['VST', 'PST', 'RAW32', 'PFS', 'TD21O', 'TD21R', 'P21', 'IOC', 'P32F', 'P32R', 'POC', 'S21']:
+                setattr (self, key + loop, getattr (self, key)[..., k, :])
+            loop = self.LOOPS32[k]
+            for key in ['TD32O', 'TD32RF', 'TD32RR', 'I32O', 'I32RF', 'I32RR']:
+                setattr (self, key + loop, getattr (self, key)[..., k, :])
+        self.P32FA = np.logical_or (np.logical_or (self.P32FAG, self.P32FAB), self.P32FCA)
+        self.P32FB = np.logical_or (np.logical_or (self.P32FBG, self.P32FAB), self.P32FBC)
+        self.P32FC = np.logical_or (np.logical_or (self.P32FCG, self.P32FBC), self.P32FCA)
+        self.P32RA = np.logical_or (np.logical_or (self.P32RAG, self.P32RAB), self.P32RCA)
+        self.P32RB = np.logical_or (np.logical_or (self.P32RBG, self.P32RAB), self.P32RBC)
+        self.P32RC = np.logical_or (np.logical_or (self.P32RCG, self.P32RBC), self.P32RCA)
 
     # backfill missing signals for plotting, in the case of 1-MHz COMTRADE data
     def save_signals (self):
@@ -385,33 +300,22 @@ class T400L:
             self.DIZB0 = self.chan['DIZB']-self.chan['DIZ0']
             self.DIZC0 = self.chan['DIZC']-self.chan['DIZ0']
         else: # 1-MHz data only has the phase currents and voltages
-            q = 65
             tfault = 0.05
 
-            self.VA = self.my_decimate (self.chan['VA'], q) # / self.PTR
-#            print ('Decimating 1-MHz data', self.npt, self.ncy, self.dt, self.VA.size)
             self.rs = 256
             self.ncy = self.rs
-            self.npt = self.VA.size
-            self.dt *= q
+            block = decimation.decimate (np.array ([self.chan['VA'], self.chan['VB'], self.chan['VC'],
+                                                    self.chan['IAW'], self.chan['IBW'], self.chan['ICW']]),
+                                         1.0 / self.dt, self.rs * 60.0)
+#            print ('Decimating 1-MHz data', self.npt, self.ncy, self.dt, block.shape)
+            self.npt = block.shape[-1]
+            self.dt = 1.0 / self.rs / 60.0
             self.t = np.linspace (0.0, self.dt * (self.npt - 1), self.npt)
 #            print ('Now at 15.36 kHz', self.npt, self.ncy, self.dt, self.t.size)
-            self.VB = self.my_decimate (self.chan['VB'], q) # / self.PTR
-            self.VC = self.my_decimate (self.chan['VC'], q) # / self.PTR
-            self.IA = self.my_decimate (self.chan['IAW'], q) # / self.CTRW
-            self.IB = self.my_decimate (self.chan['IBW'], q) # / self.CTRW
-            self.IC = self.my_decimate (self.chan['ICW'], q) # / self.CTRW
+            self.VA, self.VB, self.VC = block[0:3] # / self.PTR
+            self.IA, self.IB, self.IC = block[3:6] # / self.CTRW
             # construct the incremental and replica signals as for ATP
-            self.VAB = self.VA - self.VB
-            self.VBC = self.VB - self.VC
-            self.VCA = self.VC - self.VA
-            self.IAB = self.IA - self.IB
-            self.IBC = self.IB - self.IC
-            self.ICA = self.IC - self.IA
-            self.I0 = (self.IA + self.IB + self.IC) / 3.0
-            self.IA0 = self.IA - self.I0
-            self.IB0 = self.IB - self.I0
-            self.IC0 = self.IC - self.I0
+            self.make_loop_signals ()
             self.make_incremental_signals (tfault)
             # backfill the channels for plotting
             self.chan['DIZA'] = self.DIZA
@@ -425,15 +329,32 @@ class T400L:
         self.construct_relay_model ()
         self.save_signals ()
 
-    def get_incremental(self, x, lookback, a, b):
-        n = x.shape[0]
-        d = np.zeros (n)
-        for i in range(lookback, n):
-            d[i] = x[i] - x[i-lookback]
+    def make_loop_signals (self):
+        """Phase-to-phase and zero-sequence-removed loop signals from VA..IC"""
+        self.VAB = self.VA - self.VB
+        self.VBC = self.VB - self.VC
+        self.VCA = self.VC - self.VA
+        self.IAB = self.IA - self.IB
+        self.IBC = self.IB - self.IC
+        self.ICA = self.IC - self.IA
+        self.I0 = (self.IA + self.IB + self.IC) / 3.0
+        self.IA0 = self.IA - self.I0
+        self.IB0 = self.IB - self.I0
+        self.IC0 = self.IC - self.I0
+
+    def get_incremental(self, x, lookback, a, b, zi=None):
+        """One-cycle delta of x along its last axis, low-pass filtered by (b, a).
 
-        y = signal.lfilter (b, a, d)
+        x may be a single signal or a block of signals, e.g. shape (6, npt).
+        If the filter state zi is given, returns (y, zf) as signal.lfilter does.
+        """
+        n = x.shape[-1]
+        d = np.zeros (x.shape)
+        d[..., lookback:] = x[..., lookback:] - x[..., :n-lookback]
 
-        return y # d
+        if zi is None:
+            return signal.lfilter (b, a, d, axis=-1)
+        return signal.lfilter (b, a, d, axis=-1, zi=zi)
 
     def make_incremental_signals(self, tfault):
         td21_cycles = 1
@@ -441,20 +362,16 @@ class T400L:
 
         b, a = signal.butter (2, 1.0 / 64.0, btype='lowpass', analog=False)
 #        print ('LP', b, a)
-        self.DVA = self.get_incremental (self.VA, lookback, a, b)
-        self.DVB = self.get_incremental (self.VB, lookback, a, b)
-        self.DVC = self.get_incremental (self.VC, lookback, a, b)
+        # filter the three phase voltages and currents as one block
+        block = np.stack ((self.VA, self.VB, self.VC, self.IA, self.IB, self.IC), axis=-2)
+        self.DVA, self.DVB, self.DVC, self.DIA, self.DIB, self.DIC = np.moveaxis (self.get_incremental (block, lookback, a, b), -2, 0)
         self.DVAB = self.DVA - self.DVB
         self.DVBC = self.DVB - self.DVC
         self.DVCA = self.DVC - self.DVA
 #        print ('lookback, DVA size, first, last', lookback, self.DVA.size, self.DVA[0], self.DVA[-1], self.DVA)
 
-        self.DIA = self.get_incremental (self.IA, lookback, a, b)
-        self.DIB = self.get_incremental (self.IB, lookback, a, b)
-        self.DIC = self.get_incremental (self.IC, lookback, a, b)
-
-        d10 = math.cos(math.radians(self.Z1ANG))
-        d11 = math.sin(math.radians(self.Z1ANG)) / 2.0 / math.pi / self.NFREQ
+        d10 = _expand (_each (math.cos, _each (math.radians, self.Z1ANG)), 1)
+        d11 = _expand (_each (math.sin, _each (math.radians, self.Z1ANG)) / 2.0 / math.pi / self.NFREQ, 1)
         ddtIa = np.diff (self.DIA, prepend=0.0) / self.dt
         ddtIb = np.diff (self.DIB, prepend=0.0) / self.dt
         ddtIc = np.diff (self.DIC, prepend=0.0) / self.dt
@@ -468,9 +385,9 @@ class T400L:
         self.DIZBC = self.DIZB - self.DIZC
         self.DIZCA = self.DIZC - self.DIZA
 
-        d00 = math.cos(math.radians(self.Z0ANG))
-        d01 = math.sin(math.radians(self.Z0ANG)) / 2.0 / math.pi / self.NFREQ
-        rat = self.Z0MAG / self.Z1MAG
+        d00 = _expand (_each (math.cos, _each (math.radians, self.Z0ANG)), 1)
+        d01 = _expand (_each (math.sin, _each (math.radians, self.Z0ANG)) / 2.0 / math.pi / self.NFREQ, 1)
+        rat = _expand (self.Z0MAG / self.Z1MAG, 1)
 #        print ('d00={:.4f}, d01={:.6f}, Z0/Z1={:.4f}'.format (d00, d01, rat))
         self.DI0 = (self.DIA + self.DIB + self.DIC) / 3.0
         ddtI0 = np.diff (self.DI0, prepend=0.0) / self.dt
@@ -479,53 +396,372 @@ class T400L:
         self.DIZB0 = self.DIZB - self.DIZ0
         self.DIZC0 = self.DIZC - self.DIZ0
 
-    def my_decimate(self, x, q):
-        if q == 65:  # downsampling 1 MHz signals to 256 samples per 60-Hz cycle
-            return signal.decimate (signal.decimate(x, 5), 13)
-        elif q <= 13:
-            return signal.decimate (x, q)
-        else:
-            return signal.decimate (x, q, ftype='fir', n=None)
-
     def load_atp(self, t, fs, tfault, va, vb, vc, ia, ib, ic):
         self.rs = 256
         self.ncy = self.rs
-        fq = fs / self.rs / 60.0
         dt = t[1] - t[0]
-        q = int(fq+0.5)
         tstart = tfault - 3.0 / 60
         tend = tfault + 5.0 / 60
         nstart = int(tstart / dt + 0.5)
         nend = int(tend / dt - 0.5)
-        twindow = t[nstart:nend]
 
         # window and downsample the ATP signals, 3 cycles before to 5 cycles after the actual fault time
-        self.t = twindow[::q] - tfault
-        self.dt = dt * q
-        self.npt = self.t.size
+        raw = np.array ([va[nstart:nend], vb[nstart:nend], vc[nstart:nend],
+                         ia[nstart:nend], ib[nstart:nend], ic[nstart:nend]])
+        block = decimation.decimate (raw, fs, self.rs * 60.0)
+        self.dt = 1.0 / self.rs / 60.0
+        self.npt = block.shape[-1]
+        self.t = decimation.decimated_times (t[nstart], self.npt, self.rs * 60.0) - tfault
         #   print ('{:d} {:d} {:.8f}'.format (self.npt, self.rs, self.dt))
-        self.VA = self.my_decimate (va[nstart:nend], q) / self.PTR
-        #   print ('t size, first, last', self.t.size, self.t[0], self.t[-1], self.t)
-        #   print ('VA size', self.VA.size, self.VA)
-        #   print ('{:d} {:f} {:f} {:d} {:f} {:f} {:d} {:d}'.format (self.rs, dt, fq, q, tstart, tend, nstart, nend))
-        self.VB = self.my_decimate (vb[nstart:nend], q) / self.PTR
-        self.VC = self.my_decimate (vc[nstart:nend], q) / self.PTR
-        self.IA = self.my_decimate (ia[nstart:nend], q) / self.CTRW  # doesn't have I0 yet
-        self.IB = self.my_decimate (ib[nstart:nend], q) / self.CTRW
-        self.IC = self.my_decimate (ic[nstart:nend], q) / self.CTRW
+        self.VA, self.VB, self.VC = block[0:3] / self.PTR
+        self.IA, self.IB, self.IC = block[3:6] / self.CTRW  # doesn't have I0 yet
 
         # process the others
-        self.VAB = self.VA - self.VB
-        self.VBC = self.VB - self.VC
-        self.VCA = self.VC - self.VA
-        self.IAB = self.IA - self.IB
-        self.IBC = self.IB - self.IC
-        self.ICA = self.IC - self.IA
-        self.I0 = (self.IA + self.IB + self.IC) / 3.0
-        self.IA0 = self.IA - self.I0
-        self.IB0 = self.IB - self.I0
-        self.IC0 = self.IC - self.I0
+        self.make_loop_signals ()
 
         self.make_incremental_signals (tfault)
         self.construct_relay_model ()
 
+
+class T400LBatch (T400L):
+    """Evaluates the T400L model for K waveform sets against M setting dictionaries.
+
+    The relay quantities become (K, M, 6, npt) matrices and the settings become
+    arrays of length M, so that a whole sweep is computed with the same array
+    operations as one relay. Memory grows with K * M, so large sweeps should be
+    evaluated in chunks of cases.
+    """
+    # first pickup times reported by pickup_table, and the loop signals they OR together
+    PICKUPS = [('START', 'PSTART', None),
+               ('TD32F', 'P32F', slice(0, 6)),
+               ('OC21P', 'POC', slice(3, 6)),
+               ('OC21G', 'POC', slice(0, 3)),
+               ('TD21P', 'S21', slice(3, 6)),
+               ('TD21G', 'S21', slice(0, 3)),
+               ('TRIP', 'S21', slice(0, 6))]
+
+    def __init__(self, settings=None):
+        T400L.__init__ (self)
+        if settings is None:
+            settings = [{}]
+        keys = [key for key in vars(self) if key != 'haveDigitalOutputs']
+        relays = []
+        for dict in settings:
+            rly = T400L ()
+            rly.update_settings (dict)
+            relays.append (rly)
+        for key in keys:
+            setattr (self, key, np.array ([getattr (rly, key) for rly in relays], dtype=float))
+        self.nsettings = len(relays)
+
+    def load_atp(self, t, fs, tfault, waveforms):
+        """Windows, downsamples and evaluates K sets of ATP waveforms.
+
+        Args:
+            t (array): common time points of the waveforms
+            fs (float): sampling rate of the waveforms
+            tfault (float): actual fault time, scalar or one per waveform set
+            waveforms (array): shape (K, 6, n), rows va, vb, vc, ia, ib, ic
+        """
+        waveforms = np.asarray (waveforms, dtype=float)
+        ncases = waveforms.shape[0]
+        self.tfault = np.broadcast_to (np.asarray (tfault, dtype=float), (ncases,))
+        self.rs = 256
+        self.ncy = self.rs
+        dt = t[1] - t[0]
+        nstart = [int((tf - 3.0 / 60) / dt + 0.5) for tf in self.tfault]
+        nend = [int((tf + 5.0 / 60) / dt - 0.5) for tf in self.tfault]
+        # rounding may leave the windows one sample apart, so all take the shortest length
+        nwin = min ([n2 - n1 for n1, n2 in zip (nstart, nend)])
+        raw = np.stack ([waveforms[k, :, nstart[k]:nstart[k]+nwin] for k in range(ncases)])
+        raw = decimation.decimate (raw, fs, self.rs * 60.0)
+
+        self.dt = 1.0 / self.rs / 60.0
+        self.npt = raw.shape[-1]
+        self.t = np.stack ([decimation.decimated_times (t[nstart[k]], self.npt, self.rs * 60.0) - self.tfault[k]
+                            for k in range(ncases)])
+        ratio = np.stack ((self.PTR, self.PTR, self.PTR, self.CTRW, self.CTRW, self.CTRW), axis=-1)
+        block = raw[:, np.newaxis] / ratio[..., np.newaxis]
+        self.VA, self.VB, self.VC, self.IA, self.IB, self.IC = np.moveaxis (block, -2, 0)
+
+        self.make_loop_signals ()
+        self.make_incremental_signals (self.tfault)
+        self.construct_relay_model ()
+
+    def first_pickup_times (self):
+        """Returns a dictionary of (K, M) arrays with the first pickup time of each
+        signal in PICKUPS, relative to the fault, or -1.0 if it never picks up."""
+        tk = self.t[:, np.newaxis, :]
+        times = {}
+        for name, key, rows in self.PICKUPS:
+            sig = getattr (self, key)
+            if rows is not None:
+                sig = np.any (sig[..., rows, :], axis=-2)
+            times[name] = event_timing.first_pickup (sig, tk)
+        return times
+
+    def pickup_table (self, cases=None, settings=None):
+        """Returns a pandas DataFrame with one row per waveform set and setting dictionary.
+
+        Args:
+            cases (list): labels of the K waveform sets, defaults to their index
+            settings (list): labels of the M setting dictionaries, defaults to their index
+        """
+        import pandas as pd
+        ncases = self.t.shape[0]
+        if cases is None:
+            cases = list(range(ncases))
+        if settings is None:
+            settings = list(range(self.nsettings))
+        times = self.first_pickup_times ()
+        df = pd.DataFrame ({'Case': np.repeat (cases, self.nsettings),
+                            'Setting': np.tile (settings, ncases),
+                            'Tfault': np.repeat (self.tfault, self.nsettings)})
+        for name, key, rows in self.PICKUPS:
+            df[name] = times[name].ravel()
+        return df
+
+class T400LStream (T400L):
+    """Evaluates the T400L model online, one block of samples at a time.
+
+    The samples are VA, VB, VC, IA, IB, IC in secondary units, at rs samples
+    per cycle, e.g. a COMTRADE record replayed in blocks or a long capture.
+    Only the filter states, one-cycle delay lines, integrators and the START
+    and FID indices are kept between blocks, so the memory does not grow with
+    the length of the stream. The element outputs are the same as those of
+    construct_relay_model, and their transitions are reported as they happen.
+
+    The batch model places START in the last cycle of a record that never
+    starts, which a stream can only do when it ends; close() applies that rule
+    from the last cycle of samples, so that a complete record matches the batch.
+    """
+    # element outputs whose transitions are reported, per loop, plus PSTART and TRIP
+    ELEMENTS = ['PFS', 'P21', 'P32F', 'P32R', 'POC', 'S21']
+
+    def __init__(self, settings=None, rs=256):
+        T400L.__init__ (self)
+        if settings is not None:
+            T400L.update_settings (self, settings)
+        self.rs = rs
+        self.ncy = rs
+        self.dt = 1.0 / self.rs / 60.0
+        self.start ()
+
+    def update_settings (self, dict):
+        """Changes the settings, and restarts the stream"""
+        T400L.update_settings (self, dict)
+        self.start ()
+
+    def start (self, t0=0.0, tref=0.0):
+        """Clears the stream state; the first sample of the next block is at time t0 - tref"""
+        self.t0 = t0
+        self.tref = tref
+        self.n = 0
+        self.events = []
+        self.ground = np.array ([True, True, True, False, False, False])[:,np.newaxis]
+
+        self.b, self.a = signal.butter (2, 1.0 / 64.0, btype='lowpass', analog=False)
+        self.zi = np.zeros ((6, max (len (self.a), len (self.b)) - 1))
+        self.xhist = np.zeros ((6, self.rs))    # raw samples, one cycle back
+        self.vhist = np.zeros ((6, self.ncy))   # TD21 restraint replica, one cycle back
+        self.dilast = np.zeros (4)              # last DIA, DIB, DIC and DI0, for the derivatives
+
+        self.d10 = math.cos (math.radians (self.Z1ANG))
+        self.d11 = math.sin (math.radians (self.Z1ANG)) / 2.0 / math.pi / self.NFREQ
+        self.d00 = math.cos (math.radians (self.Z0ANG))
+        self.d01 = math.sin (math.radians (self.Z0ANG)) / 2.0 / math.pi / self.NFREQ
+        self.rat = self.Z0MAG / self.Z1MAG
+        self.TD21M = np.where (self.ground, self.TD21MG, self.TD21MP)
+        self.VT = self.spu * np.where (self.ground, self.VNOM * math.sqrt(2.0/3.0), self.VNOM * math.sqrt(2.0))
+
+        # a loop whose first pickup is on the first sample never starts, as in the batch model
+        self.ifirstpst = np.full (6, -1)
+        self.state = self.clear_window_state (None)
+        self.prev = self.clear_outputs ()
+        # the last cycle of inputs to the START window logic, for close()
+        self.tail = {key: np.zeros ((6, 0)) for key in ['DV', 'DIZ', 'VST', 'PST', 'TD21R']}
+        self.ttail = np.zeros (0)
+
+    def clear_window_state (self, idx1):
+        """Integrators and FID latches of a START window beginning at sample idx1, or None"""
+        return {'idx1': idx1, 'ifirst': np.full (6, -1),
+                'I32O': np.zeros ((6, 1)), 'I32RF': np.zeros ((6, 1)), 'I32RR': np.zeros ((6, 1)),
+                'IOC': np.zeros ((6, 1)), 'IOCPUP': np.zeros (1), 'IOCPUG': np.zeros (1)}
+
+    def clear_outputs (self):
+        outputs = {key: np.zeros (6, dtype=bool) for key in self.ELEMENTS}
+        outputs['PSTART'] = np.zeros (1, dtype=bool)
+        outputs['TRIP'] = np.zeros (1, dtype=bool)
+        return outputs
+
+    def _accumulate (self, state, key, x):
+        """Continues the running sum of x along its last axis, in the same order as np.cumsum on the whole record"""
+        acc = np.cumsum (np.concatenate ((state[key], x), axis=-1), axis=-1)
+        state[key] = acc[..., -1:]
+        return self.dt * acc[..., 1:]
+
+    def evaluate_window (self, state, cols, DV, DIZ, VST, PST, TD21R):
+        """Applies the START window to a block of loop quantities, as construct_relay_model does.
+
+        Args:
+            state (dict): START index, FID latches and integrators, updated in place
+            cols (array): sample numbers of the block
+            DV, DIZ, VST, PST, TD21R (array): loop quantities, shape (6, len(cols))
+
+        Returns:
+            dict: element outputs, shape (6, len(cols)), or (1, len(cols)) for PSTART and TRIP
+        """
+        idx1 = state['idx1']
+        if idx1 is None:
+            PSTART = np.zeros (cols.shape)
+            idx2 = -1
+        else:
+            idx2 = idx1 + self.ncy
+            PSTART = np.ones (cols.shape) * ((cols >= idx1) & (cols < idx2))
+            PST = PST * PSTART
+            # FS latches at the first qualifying sample in the FID window
+            vst_thresh = self.VST_THRESH * np.max (VST, axis=-2)
+            idxWindow = idx1 + int (np.round (self.FID_WINDOW / self.dt))
+            idxEnd = max (idx1, min (idxWindow, idx2+1))
+            inwin = (cols >= idx1) & (cols < idxEnd)
+            hits = (PST > 0.0) & (VST >= vst_thresh) & inwin
+            latch = (state['ifirst'] < 0) & np.any (hits, axis=-1)
+            state['ifirst'] = np.where (latch, cols[np.argmax (hits, axis=-1)], state['ifirst'])
+        ifirst = np.where (state['ifirst'] < 0, np.iinfo (int).max, state['ifirst'])[:,np.newaxis]
+        PFS = np.ones (DV.shape) * np.logical_and (cols >= ifirst, cols <= idx2)
+
+        TD32O = -DV*DIZ*PFS
+        TD32RF = (self.rest_offset + DIZ*DIZ*self.TD32ZF)*PSTART
+        TD32RR = (-self.rest_offset - DIZ*DIZ*self.TD32ZR)*PSTART
+        TD21O = (DV-DIZ*self.TD21M*self.Z1MAG)*PFS
+        P21 = self.make_td21_trip (TD21O, TD21R, self.VT)
+
+        I32O = self._accumulate (state, 'I32O', TD32O)
+        I32RF = self._accumulate (state, 'I32RF', TD32RF)
+        I32RR = self._accumulate (state, 'I32RR', TD32RR)
+        P32F = np.ones (DV.shape) * (I32O > I32RF) * PFS
+        P32R = np.ones (DV.shape) * (I32O < I32RR) * PFS
+
+        pup = self.VNOM*self.VMIN/(1-self.TD21MP)/self.Z1MAG
+        pug = self.VNOM*self.VMIN/(1-self.TD21MG)/self.Z1MAG/math.sqrt(3.0)
+        IOC = self._accumulate (state, 'IOC', np.absolute(DIZ)*PSTART)
+        IOCPUP = self._accumulate (state, 'IOCPUP', pup*PSTART) + self.secmarg_oc
+        IOCPUG = self._accumulate (state, 'IOCPUG', pug*PSTART) + self.secmarg_oc
+        POC = np.ones (DV.shape) * (IOC > np.where (self.ground, IOCPUG, IOCPUP)) * PSTART
+
+        S21 = self.supervise_21_trip (P21, P32F, POC)
+        return {'PSTART': PSTART[np.newaxis,:] > 0, 'PFS': PFS > 0, 'P21': P21, 'P32F': P32F > 0,
+                'P32R': P32R > 0, 'POC': POC > 0, 'S21': S21, 'TRIP': np.any (S21, axis=0, keepdims=True)}
+
+    def transitions (self, outputs, prev, cols, t):
+        """Returns the (time, name, state) changes of the element outputs over a block, and updates prev"""
+        found = []
+        for key in ['PSTART'] + self.ELEMENTS + ['TRIP']:
+            sig = outputs[key]
+            edges = np.diff (np.concatenate ((prev[key][:,np.newaxis], sig), axis=-1).astype (np.int8), axis=-1)
+            rows, idx = np.nonzero (edges)
+            for row, i in zip (rows, idx):
+                name = key if sig.shape[0] == 1 else key + self.LOOPS[row]
+                found.append ((cols[i], t[i], name, bool (edges[row, i] > 0)))
+            prev[key] = sig[:, -1].copy ()
+        found.sort (key=lambda x: x[0])
+        return [x[1:] for x in found]
+
+    def process (self, block):
+        """Evaluates the next block of samples.
+
+        Args:
+            block (array): shape (6, n), rows VA, VB, VC, IA, IB, IC in secondary volts and amps
+
+        Returns:
+            list: (time, name, state) of each element output transition in the block, e.g. (0.0042, 'S21AG', True)
+        """
+        block = np.asarray (block, dtype=float)
+        npt = block.shape[-1]
+        if npt < 1:
+            return []
+        cols = self.n + np.arange (npt)
+        t = self.t0 + cols / (self.rs * 60.0) - self.tref
+
+        # one-cycle deltas and filter, continuing from the previous block
+        ext = np.concatenate ((self.xhist, block), axis=-1)
+        d = ext[:, self.rs:] - ext[:, :npt]
+        d[:, cols < self.rs] = 0.0
+        self.xhist = ext[:, -self.rs:]
+        D, self.zi = signal.lfilter (self.b, self.a, d, axis=-1, zi=self.zi)
+        DVA, DVB, DVC, DIA, DIB, DIC = D
+
+        ddtIa = np.diff (DIA, prepend=self.dilast[0]) / self.dt
+        ddtIb = np.diff (DIB, prepend=self.dilast[1]) / self.dt
+        ddtIc = np.diff (DIC, prepend=self.dilast[2]) / self.dt
+        DIZA = self.d10 * DIA + self.d11 * ddtIa
+        DIZB = self.d10 * DIB + self.d11 * ddtIb
+        DIZC = self.d10 * DIC + self.d11 * ddtIc
+        DI0 = (DIA + DIB + DIC) / 3.0
+        ddtI0 = np.diff (DI0, prepend=self.dilast[3]) / self.dt
+        self.dilast = np.array ([DIA[-1], DIB[-1], DIC[-1], DI0[-1]])
+        DIZ0 = (self.d10 - self.rat * self.d00) * DI0 + (self.d11 - self.rat * self.d01) * ddtI0
+
+        VA, VB, VC, IA, IB, IC = block
+        I0 = (IA + IB + IC) / 3.0
+        DV = np.stack ((DVA, DVB, DVC, DVA - DVB, DVB - DVC, DVC - DVA))
+        DIZ = np.stack ((DIZA - DIZ0, DIZB - DIZ0, DIZC - DIZ0, DIZA - DIZB, DIZB - DIZC, DIZC - DIZA))
+        VLOOP = np.stack ((VA, VB, VC, VA - VB, VB - VC, VC - VA))
+        ILOOP = np.stack ((IA - I0, IB - I0, IC - I0, IA - IB, IB - IC, IC - IA))
+
+        # TD21 restraint from the replica voltage one cycle back
+        vdel = VLOOP - self.TD21M * self.Z1MAG * ILOOP
+        ext = np.concatenate ((self.vhist, vdel), axis=-1)
+        TD21R = ext[:, :npt].copy ()
+        TD21R[:, cols < self.ncy] = 0.0
+        self.vhist = ext[:, -self.ncy:]
+
+        VST = np.absolute(DV) + self.VSTARTF * self.Z1MAG * np.absolute(DIZ)
+        PST = np.ones (DV.shape) * (VST > np.where (self.ground, self.VSTARTG, self.VSTARTP))
+
+        # START on the first pickup of any loop after the first sample
+        picked = np.any (PST > 0, axis=-1)
+        new = (self.ifirstpst < 0) & picked
+        self.ifirstpst = np.where (new, cols[np.argmax (PST > 0, axis=-1)], self.ifirstpst)
+        if self.state['idx1'] is None and np.any (new & (self.ifirstpst > 0)):
+            self.state['idx1'] = int (np.min (self.ifirstpst[new & (self.ifirstpst > 0)]))
+
+        outputs = self.evaluate_window (self.state, cols, DV, DIZ, VST, PST, TD21R)
+        found = self.transitions (outputs, self.prev, cols, t)
+        self.events.extend (found)
+
+        # keep the last cycle, and one sample, for the end-of-record START rule
+        for key, val in zip (['DV', 'DIZ', 'VST', 'PST', 'TD21R'], [DV, DIZ, VST, PST, TD21R]):
+            self.tail[key] = np.concatenate ((self.tail[key], val), axis=-1)[:, -(self.ncy+1):]
+        self.ttail = np.concatenate ((self.ttail, t))[-(self.ncy+1):]
+        self.n += npt
+        return found
+
+    def close (self):
+        """Ends the record, applying the batch model's START in its last cycle if
+        the stream never started before then; returns all of the transitions"""
+        idx1 = self.n - self.ncy - 1
+        if idx1 > 0 and (self.state['idx1'] is None or self.state['idx1'] >= idx1):
+            cols = idx1 + np.arange (self.ncy + 1)
+            outputs = self.evaluate_window (self.clear_window_state (idx1), cols,
+                                            self.tail['DV'], self.tail['DIZ'], self.tail['VST'],
+                                            self.tail['PST'], self.tail['TD21R'])
+            tidx1 = self.ttail[0]
+            self.events = [x for x in self.events if x[0] < tidx1]
+            self.events.extend (self.transitions (outputs, self.clear_outputs (), cols, self.ttail))
+        return self.events
+
+    def load_atp (self, t, fs, tfault, va, vb, vc, ia, ib, ic, nblock=64):
+        """Replays an ATP record through the stream, windowed and downsampled as
+        T400L.load_atp does, in blocks of nblock samples; returns the transitions"""
+        dt = t[1] - t[0]
+        nstart = int((tfault - 3.0 / 60) / dt + 0.5)
+        nend = int((tfault + 5.0 / 60) / dt - 0.5)
+        raw = np.array ([va[nstart:nend], vb[nstart:nend], vc[nstart:nend],
+                         ia[nstart:nend], ib[nstart:nend], ic[nstart:nend]])
+        block = decimation.decimate (raw, fs, self.rs * 60.0)
+        block = block / np.array ([self.PTR, self.PTR, self.PTR, self.CTRW, self.CTRW, self.CTRW])[:,np.newaxis]
+        self.start (t[nstart], tfault)
+        for i in range (0, block.shape[-1], nblock):
+            self.process (block[:, i:i+nblock])
+        return self.close ()
@@ -12,6 +12,8 @@ Public Functions:
 import sys
 import matplotlib.pyplot as plt
 from comtrade import Comtrade
+import atp_channels
+import event_timing
 import numpy as np
 import math
 from enum import Enum
@@ -48,23 +50,9 @@ def aryplot(ax, title, t, yvals, lbls, clrs=None, stack_signals=False):
         ax.grid()
 
 def tabulate_relay2 (lbl, PHASE, GROUND, t):
-    tp = -1.0
-    tg = -1.0
-    itp = np.argmax(PHASE > 0)
-    if itp >= 0:
-        tp = t[itp]
-    itg = np.argmax(GROUND > 0)
-    if itg >= 0:
-        tg = t[itg]
+    tp, tg = event_timing.first_pickup (np.vstack ((PHASE, GROUND)), t)
     print ('TD21 {:s} tp={:.4f} tg={:.4f}'.format (lbl, tp, tg))
 
-def first_pickup_time (rly, sig):
-    val = -1.0
-    idx = np.argmax(sig > 0)
-    if idx >= 0:
-        val = rly.t[idx]
-    return val
-
 def summarize_relay (png_base, loc, tfault, rly):
     # refactoring opportunity - the next 5 lines also appear in make_plot
     TD32 = np.logical_or (np.logical_or (rly.P32FA, rly.P32FB), rly.P32FC)
@@ -73,11 +61,7 @@ def summarize_relay (png_base, loc, tfault, rly):
     TD21P = np.logical_or (np.logical_or (rly.S21AB, rly.S21BC), rly.S21CA)
     TD21G = np.logical_or (np.logical_or (rly.S21AG, rly.S21BG), rly.S21CG)
 
-    td32 = first_pickup_time (rly, TD32)
-    oc21p = first_pickup_time (rly, OC21P)
-    oc21g = first_pickup_time (rly, OC21G)
-    td21p = first_pickup_time (rly, TD21P)
-    td21g = first_pickup_time (rly, TD21G)
+    td32, oc21p, oc21g, td21p, td21g = event_timing.first_pickup (np.vstack ((TD32, OC21P, OC21G, TD21P, TD21G)), rly.t)
 
     print ('{:s},{:s},{:.5f},{:.5f},{:.5f},{:.5f},{:.5f},{:.5f}'.format (
         png_base, loc, tfault, td32, oc21p, oc21g, td21p, td21g))
@@ -174,8 +158,6 @@ busnum = ''
 png_base = ''
 case_title = ''
 feeders = json.load(open('RelaySites.json'))['feeders']
-faultChannels = {'Ia':-1,'Ib':-1,'Ic':-1}
-feederChannels = {'Va':-1,'Vb':-1,'Vc':-1,'Ia':-1,'Ib':-1,'Ic':-1}
 pvChannels = {}
 pvnames = []
 fdrSettings = {}
@@ -201,14 +183,10 @@ for row in feeders:
                 atp_base = fdr['directory'] + '/I1_' + busnum
 
 npv = len(fdr['PV'])
-suffix = 0
 for i in range(npv):
     xf = fdr['XFM'][i]
     pvnames.append(xf)
     siteSettings[xf] = json.load (open(fdr['PVSettings'][i]))
-    if npv > 1:
-        suffix = i + 1
-    pvChannels[xf] = {'XfVa':-1,'XfVb':-1,'XfVc':-1,'XfIa':-1,'XfIb':-1,'XfIc':-1,'ModelSuffix':suffix}
 
 rec = Comtrade()
 rec.load(atp_base + '.cfg', atp_base + '.dat')
@@ -216,66 +194,16 @@ t = np.array(rec.time)
 n = rec.total_samples
 fs = int (rec.cfg.sample_rates[0][0])  # there will be only one from ATP
 
-for i in range(rec.analog_count):
-    lbl = rec.analog_channel_ids[i]
-    #    print (i, lbl)
-    if 'V-node' in lbl:
-        if 'FDR  A' in lbl:
-            feederChannels['Va'] = np.array (rec.analog[i])
-        elif 'FDR  B' in lbl:
-            feederChannels['Vb'] = np.array (rec.analog[i])
-        elif 'FDR  C' in lbl:
-            feederChannels['Vc'] = np.array (rec.analog[i])
-        else:
-            for pv in pvnames:
-                if pv+'A' in lbl:
-                    pvChannels[pv]['XfVa'] = np.array (rec.analog[i])
-                elif pv+'B' in lbl:
-                    pvChannels[pv]['XfVb'] = np.array (rec.analog[i])
-                elif pv+'C' in lbl:
-                    pvChannels[pv]['XfVc'] = np.array (rec.analog[i])
-
-    elif 'I-branch' in lbl:
-        for pv in pvnames:
-            if pv+'A' in lbl:
-                pvChannels[pv]['XfIa'] = np.array (rec.analog[i])
-            elif pv+'B' in lbl:
-                pvChannels[pv]['XfIb'] = np.array (rec.analog[i])
-            elif pv+'C' in lbl:
-                pvChannels[pv]['XfIc'] = np.array (rec.analog[i])
-        if 'FDR  A' in lbl:
-            feederChannels['Ia'] = np.array (rec.analog[i])
-        elif 'FDR  B' in lbl:
-            feederChannels['Ib'] = np.array (rec.analog[i])
-        elif 'FDR  C' in lbl:
-            feederChannels['Ic'] = np.array (rec.analog[i])
-        if 'FAULTA' in lbl:
-            faultChannels['Ia'] = np.array (rec.analog[i])
-        elif 'FAULTB' in lbl:
-            faultChannels['Ib'] = np.array (rec.analog[i])
-        elif 'FAULTC' in lbl:
-            faultChannels['Ic'] = np.array (rec.analog[i])
-
-tfault = 0.0
+chmap = atp_channels.parse_channel_ids (rec.analog_channel_ids)
+feederChannels = atp_channels.resolve_channels (rec, {'V': ('V-node', 'FDR'), 'I': ('I-branch', 'FDR')}, chmap=chmap)
+for pv in pvnames:
+    pvChannels[pv] = atp_channels.resolve_channels (rec, {'XfV': ('V-node', pv), 'XfI': ('I-branch', pv)}, chmap=chmap)
+
 if phases == 'CAPS':
-    v0 = np.absolute (feederChannels['Va'] + feederChannels['Vb'] + feederChannels['Vc'])
-    n4 = int (n/4)
-    vthresh = 1.1 * np.max (v0[0:n4])
-    i = np.argmax(v0 > vthresh)
-#    print ('Determine capacitor switching time from Feeder V0 n4={:d}, vthresh={:.4f}, i={:d}'.format (n4, vthresh, i))
-    tfault = t[i]
+    tfault = atp_channels.switching_inception (t, feederChannels['V'])
 else:
-    ithresh = 10.0
-    for i in range(n):
-        if abs(faultChannels['Ia'][i]) > ithresh:
-            tfault = t[i]
-            break
-        if abs(faultChannels['Ib'][i]) > ithresh:
-            tfault = t[i]
-            break
-        if abs(faultChannels['Ic'][i]) > ithresh:
-            tfault = t[i]
-            break
+    ifault = atp_channels.resolve_channels (rec, {'I': ('I-branch', 'FAULT')}, chmap=chmap)['I']
+    tfault = atp_channels.fault_inception (t, ifault)
 
 if len(png_base) < 1:
     print (atp_base, pvnames, n, fs, '{:.6f}'.format(tfault))
@@ -287,9 +215,7 @@ if len(png_base) > 0:
     png_file = '{:s}_{:s}.png'.format (png_base, 'Feeder')
 rly = T400L.T400L()
 rly.update_settings (fdrSettings)
-rly.load_atp (t, fs, tfault,
-              feederChannels['Va'], feederChannels['Vb'], feederChannels['Vc'],
-              feederChannels['Ia'], feederChannels['Ib'], feederChannels['Ic'])
+rly.load_atp (t, fs, tfault, *feederChannels['V'], *feederChannels['I'])
 if len(png_base) > 0:
     summarize_relay (png_base, 'Feeder', tfault, rly)
 else:
@@ -307,9 +233,7 @@ for pv in pvnames:
         png_file = '{:s}_{:s}.png'.format (png_base, pv)
     rly = T400L.T400L()
     rly.update_settings (siteSettings[pv])
-    rly.load_atp (t, fs, tfault,
-                  pvChannels[pv]['XfVa'], pvChannels[pv]['XfVb'], pvChannels[pv]['XfVc'],
-                  pvChannels[pv]['XfIa'], pvChannels[pv]['XfIb'], pvChannels[pv]['XfIc'])
+    rly.load_atp (t, fs, tfault, *pvChannels[pv]['XfV'], *pvChannels[pv]['XfI'])
     if len(png_base) > 0:
         summarize_relay (png_base, pv, tfault, rly)
     else:
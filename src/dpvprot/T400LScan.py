@@ -10,6 +10,7 @@ Public Functions:
 
 import sys
 from comtrade import Comtrade
+import event_timing
 import numpy as np
 import math
 import operator
@@ -65,14 +66,6 @@ def check_status (sig):
 #        print ('  {:8s}  changed'.format (key))
     return False
 
-def sig_time (sig, t):
-    tp = -1.0
-    itp = np.argmax(sig > 0)
-    if itp >= 0:
-        if sig[itp] > 0:
-            tp = t[itp]
-    return tp
-
 def scan_t400L (cfg_fname, dat_fname, site, eventnum, PTR, CTRW):
     rpt = ''
 
@@ -113,8 +106,7 @@ def scan_t400L (cfg_fname, dat_fname, site, eventnum, PTR, CTRW):
         if check_status (sigs[key]):
             bOC21 = True
 
-    for key in scan_sigs:
-        tsig = sig_time (sigs[key], t)
+    for tsig in event_timing.first_pickup (np.vstack ([sigs[key] for key in scan_sigs]), t):
         if tsig >= 0.0:
             vals.append ('{:.5f}'.format(tsig))
         else:
@@ -13,24 +13,16 @@ Public Functions:
 import sys
 import matplotlib.pyplot as plt
 from comtrade import Comtrade
+from phasors import get_phasors
+import decimation
 import numpy as np
 import math
 import json
-from scipy import signal
 
 #warm_cycles = 5
 iminseq = 0.05
 vminseq = 0.05
 
-def my_decimate(x, q):
-    # signal.decimate (np.array (rec.analog[i]), intq, ftype=dec_ftype, n=dec_n)
-    if q == 65:  # downsampling 1 MHz signals to 256 samples per 60-Hz cycle
-        return signal.decimate (signal.decimate(x, 5), 13)
-    elif q <= 13:
-        return signal.decimate (x, q)
-    else:
-        return signal.decimate (x, q, ftype='fir', n=None)
-
 def my_angle(z, t, thresh=None):
     raw = np.angle (z, deg=True)
     raw[0:256] = 0.0
@@ -53,34 +45,6 @@ def get_symmetrical_components_rms(xarms, xarad, xbrms, xbrad, xcrms, xcrad):
     x2 = np.add (s, a*xc) / 3.0
     return x0, x1, x2
 
-def get_phasors(v, ccos, csin):
-    ndec = v.shape[0]
-    rs = ccos.shape[0] - 1
-    re = np.zeros (ndec)
-    im = np.zeros (ndec)
-    rms = np.zeros(ndec)
-    ang = np.zeros(ndec)
-    cpx = np.zeros(ndec, dtype=complex)
-    scale = 2 / float(rs)
-    dang = 2 * math.pi / float(rs)
-    refang = 0
-    for i in range(ndec):
-        i1 = max (0, i-rs)
-        wlen = min (i, rs)
-        re[i] = scale * np.dot (v[i1:i], ccos[0:wlen])
-        im[i] = -scale * np.dot (v[i1:i], csin[0:wlen])
-        cpx.real[i] = re[i]
-        cpx.imag[i] = im[i]
-        rms[i] = math.sqrt(0.5 * (re[i]*re[i] + im[i]*im[i]))
-        raw = math.atan2(im[i],re[i]) + math.pi
-        ref = np.fmod (refang, 2 * math.pi)
-        raw = raw - ref
-        if raw < 0:
-            raw += 2 * math.pi
-        ang[i] = raw - math.pi
-        refang += dang
-    return cpx, rms, ang
-
 def start_plot (nrows, ncols, sTitle, bPDF = True):
     if bPDF:
         # pdf setup
@@ -208,31 +172,21 @@ ic = chan['ICW']
 # prepare for phasor analysis
 fs = rec.cfg.sample_rates[0][0]
 rs = 256
-q = fs / rs / 60
-intq = int(q+0.5)
-print ('fsample = {:.2f}, for {:d} samples per cycle, the decimation factor is {:.4f} rounded to {:d}'.format (fs, rs, q, intq))
-tdec = t[::intq]
-ndec = tdec.shape[0]
-ccos = np.ones(rs+1)
-csin = np.ones(rs+1)
-for i in range(rs+1):
-    arg = 2.0 * math.pi * float(i) / float(rs)
-    ccos[i] = math.cos(arg)
-    csin[i] = math.sin(arg)
-
-va_dec = my_decimate (va, intq)
-vb_dec = my_decimate (vb, intq)
-vc_dec = my_decimate (vc, intq)
-ia_dec = my_decimate (ia, intq)
-ib_dec = my_decimate (ib, intq)
-ic_dec = my_decimate (ic, intq)
-va_cpx, va_rms, va_ang = get_phasors (va_dec, ccos, csin)
-vb_cpx, vb_rms, vb_ang = get_phasors (vb_dec, ccos, csin)
-vc_cpx, vc_rms, vc_ang = get_phasors (vc_dec, ccos, csin)
+up, down = decimation.rate_factors (fs, rs * 60)
+print ('fsample = {:.2f}, for {:d} samples per cycle, the rate changes by {:d}/{:d}'.format (fs, rs, up, down))
+
+# the 1-MHz record is filtered in single precision
+v_dec = decimation.decimate (np.array ([va, vb, vc], dtype=np.float32), fs, rs * 60)
+i_dec = decimation.decimate (np.array ([ia, ib, ic], dtype=np.float32), fs, rs * 60)
+ndec = v_dec.shape[-1]
+tdec = decimation.decimated_times (t[0], ndec, rs * 60)
+v_cpx, v_rms, v_ang = get_phasors (v_dec, rs)
+va_rms, vb_rms, vc_rms = v_rms
+va_ang, vb_ang, vc_ang = v_ang
 v0, v1, v2 = get_symmetrical_components_rms (va_rms, va_ang, vb_rms, vb_ang, vc_rms, vc_ang)
-ia_cpx, ia_rms, ia_ang = get_phasors (ia_dec, ccos, csin)
-ib_cpx, ib_rms, ib_ang = get_phasors (ib_dec, ccos, csin)
-ic_cpx, ic_rms, ic_ang = get_phasors (ic_dec, ccos, csin)
+i_cpx, i_rms, i_ang = get_phasors (i_dec, rs)
+ia_rms, ib_rms, ic_rms = i_rms
+ia_ang, ib_ang, ic_ang = i_ang
 i0, i1, i2 = get_symmetrical_components_rms (ia_rms, ia_ang, ib_rms, ib_ang, ic_rms, ic_ang)
 
 ax = start_plot (2, 2, 'Sequence Quantities from Louisa PV Site Record', True)
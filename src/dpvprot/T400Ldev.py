@@ -12,6 +12,7 @@ Public Functions:
 import sys
 import matplotlib.pyplot as plt
 from comtrade import Comtrade
+import event_timing
 import numpy as np
 import math
 from enum import Enum
@@ -224,39 +225,18 @@ def sigplot(ax, title, t, sigs, lbls, sums=None):
 #    print ('{:s} starting time {:.4f}s at {:.4f} V; {:.4f}s at {:.4f}'.format (lbl, tf, v, tj, VSTART))
 
 def tabulate_relay (lbl, OPP, OPG, RPP, RPG, OCP, OCG, IOP, IOG, t):
-    tp = -1.0
-    tg = -1.0
-    tsp = -1.0
-    tsg = -1.0
     ypp = np.absolute (OPP * OCP)
     ypg = np.absolute (OPG * OCG)
     thpp = np.max(np.absolute(RPP))
     thpg = np.max(np.absolute(RPG))
     mp = np.max(ypp) / thpp
     mg = np.max(ypg) / thpg
-    itp = np.argmax(ypp > thpp)
-    if itp >= 0:
-        tp = t[itp]
-    itg = np.argmax(ypg > thpg)
-    if itg >= 0:
-        tg = t[itg]
-    itp = np.argmax(IOP > start_thresh)
-    if itp >= 0:
-        tsp = t[itp]
-    itg = np.argmax(IOG > start_thresh)
-    if itg >= 0:
-        tsg = t[itg]
+    tp, tg, tsp, tsg = event_timing.first_pickup (np.vstack ((ypp > thpp, ypg > thpg,
+                                                             IOP > start_thresh, IOG > start_thresh)), t)
     print ('TD21 {:s} mp={:.4f} tp={:.4f} mg={:.4f} tg={:.4f} tsp={:.4f} tsg={:.4f}'.format (lbl, mp, tp, mg, tg, tsp, tsg))
 
 def tabulate_relay2 (lbl, PHASE, GROUND, t):
-    tp = -1.0
-    tg = -1.0
-    itp = np.argmax(PHASE > 0)
-    if itp >= 0:
-        tp = t[itp]
-    itg = np.argmax(GROUND > 0)
-    if itg >= 0:
-        tg = t[itg]
+    tp, tg = event_timing.first_pickup (np.vstack ((PHASE, GROUND)), t)
     print ('TD21 {:s} tp={:.4f} tg={:.4f}'.format (lbl, tp, tg))
 
 def supervise_21_trip (P21, P32, POC):
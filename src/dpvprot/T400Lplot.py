@@ -22,6 +22,7 @@ Public Functions:
 import sys
 import matplotlib.pyplot as plt
 from comtrade import Comtrade
+import event_timing
 import numpy as np
 import math
 from enum import Enum
@@ -65,14 +66,6 @@ scan_sigs = [
   'FSBC',
   'FSCA']
 
-def sig_time (sig, t):
-    tp = -1.0
-    itp = np.argmax(sig > 0)
-    if itp >= 0:
-        if sig[itp] > 0:
-            tp = t[itp]
-    return tp
-
 class PlotType(Enum):
     ALL = 0
     START = 1
@@ -177,14 +170,7 @@ def arysigplot(ax, title, t, yvals, lbls, clrs=None):
     ax.legend(loc='upper right')
 
 def tabulate_relay2 (lbl, PHASE, GROUND, t):
-    tp = -1.0
-    tg = -1.0
-    itp = np.argmax(PHASE > 0)
-    if itp >= 0:
-        tp = t[itp]
-    itg = np.argmax(GROUND > 0)
-    if itg >= 0:
-        tg = t[itg]
+    tp, tg = event_timing.first_pickup (np.vstack ((PHASE, GROUND)), t)
     print ('  TD21 {:s} tp={:.4f} tg={:.4f}'.format (lbl, tp, tg))
 
 def start_png (nrows, base_title, ncols=3):
@@ -578,8 +564,7 @@ rly.load_comtrade (rec)
 
 vals = [site_name, trigger[0], trigger[1], event_num]
 print (','.join(['Site', 'Date', 'Time', 'Event'] + scan_sigs))
-for key in scan_sigs:
-    tsig = sig_time (rly.sigs[key], rly.t)
+for tsig in event_timing.first_pickup (np.vstack ([rly.sigs[key] for key in scan_sigs]), rly.t):
     if tsig >= 0.0:
         vals.append ('{:.5f}'.format(tsig))
     else:
@@ -0,0 +1,171 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: atp_channels.py
+""" Channel map of ATP-generated COMTRADE records.
+
+The channel IDs written by ATP begin with the kind of signal, V-node,
+I-branch or V-branch, followed by the six-character ATP node names, i.e.,
+a bus name of up to five characters padded with blanks, and a phase letter,
+e.g. 'FDR  A' or 'PVONEA'. MODELS outputs appear as MODELS and the variable
+name, e.g. 'MODELS WP1'.
+
+Each channel ID is parsed once, into (kind, bus, phase) keys for every
+node name it contains, and MODELS names. Locations are then looked up by
+key, instead of testing every channel ID against every bus name. As in the
+substring tests used before, a channel is found under each node name it
+contains, and the last channel in the record wins if several match. A
+location may name buses that take precedence, e.g. the PV node for the
+branch between a PV and its transformer, so that the transformer current
+is not read from that branch.
+
+Public Functions:
+    :parse_channel_ids: indexes the channel IDs of a record
+    :find_phases: channel numbers of the A, B and C phases at a location
+    :find_model: channel number of a MODELS output
+    :resolve_channels: (3, N) phase arrays of requested locations, and MODELS outputs
+    :fault_inception: time that the fault current first exceeds a threshold
+    :switching_inception: time of the zero-sequence voltage step from capacitor switching
+"""
+
+import numpy as np
+
+KINDS = ['V-node', 'I-branch', 'V-branch']
+PHASES = 'ABC'
+
+def _atp_bus (bus):
+    """Pads a bus name to the five characters that precede the phase in an ATP node name"""
+    return '{:5s}'.format (bus)
+
+def parse_channel_ids (ids):
+    """Indexes ATP channel IDs by kind, bus and phase.
+
+    Args:
+        ids (list): the analog channel IDs, e.g. rec.analog_channel_ids
+
+    Returns:
+        dict: with keys nodes, mapping (kind, padded bus, phase) to a list of
+        channel numbers in record order, buses, mapping each channel number to
+        the set of padded bus names in it, and models, mapping MODELS variable
+        names to a channel number
+    """
+    nodes = {}
+    buses = {}
+    models = {}
+    for i, lbl in enumerate (ids):
+        kind = None
+        for k in KINDS:
+            if k in lbl:
+                kind = k
+                break
+        if kind is None:
+            continue
+        rest = lbl[lbl.index (kind) + len(kind):]
+        idx = rest.find ('MODELS ')
+        if idx >= 0:
+            toks = rest[idx+7:].split()
+            if len(toks) > 0:
+                models[toks[0]] = i
+            continue
+        buses[i] = set()
+        for j in range(len(rest) - 5):
+            phs = rest[j+5]
+            if phs in PHASES:
+                nodes.setdefault ((kind, rest[j:j+5], phs), []).append (i)
+                buses[i].add (rest[j:j+5])
+    return {'nodes': nodes, 'buses': buses, 'models': models}
+
+def find_phases (chmap, kind, bus, exclude=None):
+    """Returns the channel numbers of phases A, B and C of kind at bus, with None for any not found.
+
+    Args:
+        chmap (dict): from parse_channel_ids
+        kind (str): one of KINDS
+        bus (str): the bus name
+        exclude (list): optional bus names that take precedence, i.e., channels
+          that also contain any of these buses are not found under bus
+    """
+    key = _atp_bus (bus)
+    skip = set ([_atp_bus (x) for x in exclude]) if exclude is not None else set()
+    found = []
+    for phs in PHASES:
+        chans = [i for i in chmap['nodes'].get ((kind, key, phs), []) if not (chmap['buses'][i] & skip)]
+        found.append (chans[-1] if len(chans) > 0 else None)
+    return found
+
+def find_model (chmap, name):
+    """Returns the channel number of a MODELS output, or None.
+
+    The name matches exactly if possible, otherwise as the start of an output
+    name, so that 'WP' finds 'WP1' when there is only one PV model.
+    """
+    if name in chmap['models']:
+        return chmap['models'][name]
+    found = None
+    for key, i in chmap['models'].items():
+        if key.startswith (name):
+            if found is None or i > found:
+                found = i
+    return found
+
+def resolve_channels (rec, locations, models=None, process=None, chmap=None):
+    """Reads only the requested channels of a COMTRADE record.
+
+    Args:
+        rec (Comtrade): the loaded record
+        locations (dict): (kind, bus) to read for each location name, e.g.
+          {'FdrV': ('V-node', 'FDR'), 'FltI': ('I-branch', 'FAULT')}, or
+          (kind, bus, exclude) with bus names that take precedence, see find_phases
+        models (dict): optional MODELS output name for each output name, e.g. {'wp': 'WP1'}
+        process (function): optional, applied to each (3, N) or (N,) array, e.g. decimation
+        chmap (dict): from parse_channel_ids, parsed from rec if not provided
+
+    Returns:
+        dict: a (3, N) array for each location name, with rows for phases A, B and C,
+        and an (N,) array for each MODELS output. Phases not found are zero, and
+        MODELS outputs not found are left out.
+    """
+    if chmap is None:
+        chmap = parse_channel_ids (rec.analog_channel_ids)
+    n = int (rec.total_samples)
+    vals = {}
+    for name, loc in locations.items():
+        block = np.zeros ((3, n))
+        for row, i in enumerate (find_phases (chmap, *loc)):
+            if i is not None:
+                block[row] = rec.analog[i]
+        vals[name] = block if process is None else process (block)
+    if models is not None:
+        for name, var in models.items():
+            i = find_model (chmap, var)
+            if i is not None:
+                x = np.array (rec.analog[i], dtype=float)
+                vals[name] = x if process is None else process (x)
+    return vals
+
+def fault_inception (t, ifault, ithresh=10.0):
+    """Returns the first time that any phase of the fault current exceeds ithresh, or 0.0.
+
+    Args:
+        t (array): time points of the samples
+        ifault (array): shape (3, N), the FAULT branch currents
+        ithresh (float): current magnitude threshold
+    """
+    above = np.any (np.absolute (ifault) > ithresh, axis=0)
+    if not np.any (above):
+        return 0.0
+    return t[np.argmax (above)]
+
+def switching_inception (t, vfdr, factor=1.1):
+    """Returns the first time that the zero-sequence voltage steps above its initial level.
+
+    The initial level is the largest magnitude of va + vb + vc in the first
+    quarter of the record, and the step is factor times that level.
+
+    Args:
+        t (array): time points of the samples
+        vfdr (array): shape (3, N), the feeder voltages
+        factor (float): multiplier on the initial level
+    """
+    v0 = np.absolute (np.sum (vfdr, axis=0))
+    n4 = int (v0.size / 4)
+    vthresh = factor * np.max (v0[0:n4])
+    return t[np.argmax (v0 > vthresh)]
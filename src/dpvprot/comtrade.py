@@ -14,13 +14,18 @@ Public Functions:
 import datetime as dt
 import errno
 import io
+import itertools
 import math
+import operator
 import os
 import re
 import struct
 import sys
+import tempfile
 import warnings
+import zipfile
 import ctypes
+import numpy as np
 
 # COMTRADE standard revisions
 REV_1991 = "1991"
@@ -37,7 +42,7 @@ TYPE_FLOAT32 = "FLOAT32"
 TIMESTAMP_MISSING = 0xFFFFFFFF
 
 # CFF headers
-CFF_HEADER_REXP = "(?i)--- file type: ([a-z]+)(?:\\s([a-z]+))? ---$"
+CFF_HEADER_REXP = "(?i)--- file type: ([a-z]+)(?:\\s([a-z0-9]+))?(?:\\s*:\\s*([0-9]+))? ---$"
 
 # common separator character of data fields of CFG and ASCII DAT files
 SEPARATOR = ","
@@ -90,6 +95,49 @@ def _read_timestamp(tstamp, ignore_warnings=False):
                        microsecond, tzinfo)
 
 
+def _read_cff_cfg(file):
+    """
+    Return the CFG section of a CFF file opened in binary mode, leaving the
+    file positioned at the start of its DAT section.
+    """
+    header_re = re.compile(CFF_HEADER_REXP)
+    cfg_lines = []
+    ftype = None
+    line = file.readline()
+    while line:
+        text = line.decode("latin-1").strip()
+        mobj = header_re.match(text.upper())
+        if mobj is not None:
+            ftype = mobj.groups()[0]
+            if ftype == "DAT":
+                return "\n".join(cfg_lines)
+        elif ftype == "CFG":
+            cfg_lines.append(text)
+        line = file.readline()
+    raise Exception("No DAT section in CFF file {}".format(file.name))
+
+
+def _windows(blocks, n_samples, overlap):
+    """Regroup (time, analog, status) blocks into overlapping windows."""
+    step = n_samples - overlap
+    time = None
+    fresh = 0
+    for btime, banalog, bstatus in blocks:
+        if time is None:
+            time, analog, status = btime, banalog, bstatus
+        else:
+            time = np.concatenate((time, btime))
+            analog = np.concatenate((analog, banalog), axis=1)
+            status = np.concatenate((status, bstatus), axis=1)
+        fresh += btime.shape[0]
+        while time.shape[0] >= n_samples:
+            yield time[:n_samples], analog[:, :n_samples], status[:, :n_samples]
+            time, analog, status = time[step:], analog[:, step:], status[:, step:]
+            fresh = time.shape[0] - overlap
+    if fresh > 0:
+        yield time, analog, status
+
+
 class Cfg:
     """Parses and stores Comtrade's CFG data."""
     # time base units
@@ -406,6 +454,9 @@ class Comtrade:
     EXT_DAT = "dat"
     EXT_INF = "inf"
     EXT_HDR = "hdr"
+    EXT_CACHE = "npz"
+    # sidecar cache layout, bump when the stored arrays change
+    CACHE_VERSION = 2
     # format specific
     ASCII_SEPARATOR = ","
     
@@ -416,6 +467,8 @@ class Comtrade:
         Keyword arguments:
         ignore_warnings -- whether warnings are displayed in stdout 
             (default: False).
+        use_cache -- whether load() keeps the decoded DAT data in a sidecar
+            .npz file, reused while the DAT file is unchanged (default: True).
         """
         self.filename = ""
 
@@ -431,6 +484,12 @@ class Comtrade:
         self._analog_values = []
         self._status_values = []
 
+        # memory-mapped DAT reader, see open()
+        self._dat = None
+        # last loaded files, see iter_windows()
+        self._cfg_filepath = None
+        self._dat_filepath = None
+
         # Additional CFF data (or additional comtrade files)
         self._hdr = None
         self._inf = None
@@ -440,6 +499,11 @@ class Comtrade:
         else:
             self.ignore_warnings = False
 
+        if "use_cache" in kwargs:
+            self.use_cache = kwargs["use_cache"]
+        else:
+            self.use_cache = True
+
     @property
     def station_name(self):
         """Return the recording device's station name."""
@@ -482,17 +546,20 @@ class Comtrade:
 
     @property
     def time(self):
-        """Return the time values list."""
+        """Return the time values array."""
+        if self._time_values is None:
+            # memory-mapped records decode the time column on first use
+            self._time_values = self._dat.decode_time()
         return self._time_values
 
     @property
     def analog(self):
-        """Return the analog channel values bidimensional list."""
+        """Return the analog channel values bidimensional array."""
         return self._analog_values
     
     @property
     def status(self):
-        """Return the status channel values bidimensional list."""
+        """Return the status channel values bidimensional array."""
         return self._status_values
 
     @property
@@ -650,6 +717,9 @@ class Comtrade:
             if hdr_file is None:
                 hdr_file = basename + self.EXT_HDR
 
+            self._cfg_filepath = cfg_file
+            self._dat_filepath = dat_file
+
             # load both cfg and dat
             self._load_cfg_dat(cfg_file, dat_file)
 
@@ -658,12 +728,125 @@ class Comtrade:
             self._load_hdr(hdr_file)
 
         elif file_ext == "CFF":
+            self._cfg_filepath = cfg_file
+            self._dat_filepath = None
             # check if the CFF file exists
             self._load_cff(cfg_file)
         else:
             raise Exception(r"Expected CFG file path, got intead \"{}\".".format(cfg_file))
 
+    def open(self, cfg_file, dat_file = None, mmap = True, **kwargs):
+        """
+        Open CFG, DAT, INF, and HDR files, decoding channels only on demand.
+
+        With mmap=True and a BINARY, BINARY32 or FLOAT32 DAT file, the records
+        are mapped with np.memmap instead of being read into memory. Each
+        entry of analog, status and time is then decoded and scaled the first
+        time it is accessed, see analog_channel() and status_channel(). ASCII
+        DAT files, CFF files, and mmap=False fall back to load().
+
+        Keyword arguments are the same as for load(). Returns self.
+        """
+        if not mmap or cfg_file[-3:].upper() != "CFG":
+            self.load(cfg_file, dat_file, **kwargs)
+            return self
+
+        basename = cfg_file[:-3]
+        if dat_file is None:
+            dat_file = basename + self.EXT_DAT
+        inf_file = kwargs.get("inf_file", basename + self.EXT_INF)
+        hdr_file = kwargs.get("hdr_file", basename + self.EXT_HDR)
+        self._cfg_filepath = cfg_file
+        self._dat_filepath = dat_file
+
+        self._cfg.load(cfg_file)
+        self._cfg_extract_channels_ids(self._cfg)
+
+        dat = self._get_dat_reader()
+        if not isinstance(dat, BinaryDatReader):
+            dat.load(dat_file, self._cfg)
+            self._dat_extract_data(dat)
+        else:
+            dat.open(dat_file, self._cfg)
+            self._dat = dat
+            self._time_values = None
+            self._analog_values = _LazyChannels(dat.decode_analog, self.analog_count)
+            self._status_values = _LazyChannels(dat.decode_status, self.status_count)
+            self._total_samples = dat.total_samples
+
+        self._load_inf(inf_file)
+        self._load_hdr(hdr_file)
+        return self
+
+    def iter_windows(self, n_samples, overlap = 0, cfg_file = None, dat_file = None):
+        """
+        Iterate over a record in windows of n_samples, reading the DAT data 
+        from disk one block at a time, so that memory stays bounded.
+
+        Yields (time, analog, status) tuples of arrays shaped (n,), 
+        (analog_count, n) and (status_count, n). Consecutive windows share 
+        overlap samples, and the last window may be shorter than n_samples.
+
+        cfg_file is a CFG or CFF file path, and only its CFG data is kept in 
+        this object. If None, the files of the last load() or open() are used.
+        dat_file is optional, as in load().
+        """
+        if n_samples < 1 or overlap < 0 or overlap >= n_samples:
+            raise ValueError("Expected 0 <= overlap < n_samples, got {} and {}".format(overlap, n_samples))
+        if cfg_file is None:
+            if self._cfg_filepath is None:
+                raise Exception("No COMTRADE file was loaded or given.")
+            cfg_file = self._cfg_filepath
+            dat_file = self._dat_filepath
+
+        step = n_samples - overlap
+        file_ext = cfg_file[-3:].upper()
+        if file_ext == "CFG":
+            if dat_file is None:
+                dat_file = cfg_file[:-3] + self.EXT_DAT
+            self._cfg.load(cfg_file)
+            self._cfg_extract_channels_ids(self._cfg)
+            dat = self._get_dat_reader()
+            with open(dat_file, dat.read_mode) as contents:
+                blocks = dat.iter_blocks(contents, self._cfg, step)
+                yield from _windows(blocks, n_samples, overlap)
+        elif file_ext == "CFF":
+            with open(cfg_file, "rb") as file:
+                self._cfg.read(_read_cff_cfg(file))
+                self._cfg_extract_channels_ids(self._cfg)
+                dat = self._get_dat_reader()
+                if isinstance(dat, BinaryDatReader):
+                    contents = file
+                else:
+                    # ASCII DAT lines run up to the next CFF header
+                    text = io.TextIOWrapper(file)
+                    contents = itertools.takewhile(
+                        lambda line: not line.startswith("---"), text)
+                blocks = dat.iter_blocks(contents, self._cfg, step)
+                yield from _windows(blocks, n_samples, overlap)
+        else:
+            raise Exception(r"Expected CFG file path, got intead \"{}\".".format(cfg_file))
+
+    def analog_channel(self, key):
+        """Return one analog channel's values, by index or channel id."""
+        try:
+            key = operator.index(key)
+        except TypeError:
+            key = self._analog_channel_ids.index(key)
+        return self.analog[key]
+
+    def status_channel(self, key):
+        """Return one status channel's values, by index or channel id."""
+        try:
+            key = operator.index(key)
+        except TypeError:
+            key = self._status_channel_ids.index(key)
+        return self.status[key]
+
     def _load_cfg_dat(self, cfg_filepath, dat_filepath):
+        if self.use_cache and self._load_cache(cfg_filepath, dat_filepath):
+            return
+
         self._cfg.load(cfg_filepath)
 
         # channel ids
@@ -675,6 +858,72 @@ class Comtrade:
         # copy dat object information
         self._dat_extract_data(dat)
 
+        if self.use_cache:
+            self._save_cache(cfg_filepath, dat_filepath)
+
+    def _cache_filepath(self, dat_filepath):
+        return os.path.splitext(dat_filepath)[0] + "." + self.EXT_CACHE
+
+    def _load_cache(self, cfg_filepath, dat_filepath):
+        """
+        Restore CFG and DAT data from the sidecar cache, if it matches the 
+        CFG and DAT files' modification times and sizes. Returns True on success.
+        """
+        cache_filepath = self._cache_filepath(dat_filepath)
+        if not os.path.isfile(cache_filepath) or not os.path.isfile(dat_filepath):
+            return False
+        try:
+            stat = os.stat(dat_filepath)
+            cfg_stat = os.stat(cfg_filepath)
+            with np.load(cache_filepath) as cache:
+                if int(cache["version"]) != self.CACHE_VERSION or \
+                    int(cache["dat_mtime"]) != stat.st_mtime_ns or \
+                    int(cache["dat_size"]) != stat.st_size or \
+                    int(cache["cfg_mtime"]) != cfg_stat.st_mtime_ns or \
+                    int(cache["cfg_size"]) != cfg_stat.st_size:
+                    return False
+                self._cfg.read(str(cache["cfg"]))
+                self._cfg.filepath = cfg_filepath
+                self._cfg_extract_channels_ids(self._cfg)
+                self._time_values = cache["time"]
+                self._analog_values = cache["analog"]
+                self._status_values = cache["status"]
+                self._total_samples = int(cache["total_samples"])
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # unreadable, truncated or stale layout, parse the files again
+            return False
+        return True
+
+    def _save_cache(self, cfg_filepath, dat_filepath):
+        """Write the decoded CFG and DAT data to the sidecar cache."""
+        cache_filepath = self._cache_filepath(dat_filepath)
+        stat = os.stat(dat_filepath)
+        cfg_stat = os.stat(cfg_filepath)
+        with open(cfg_filepath, "r") as cfg:
+            cfg_text = cfg.read()
+        tmp_filepath = None
+        try:
+            # write to a unique temporary file then rename, so readers never 
+            # see a partial file and parallel writers don't share one
+            fd, tmp_filepath = tempfile.mkstemp(suffix=".tmp", 
+                dir=os.path.dirname(os.path.abspath(cache_filepath)))
+            with os.fdopen(fd, "wb") as cache:
+                np.savez_compressed(cache, version=self.CACHE_VERSION, 
+                    dat_mtime=stat.st_mtime_ns, dat_size=stat.st_size, 
+                    cfg_mtime=cfg_stat.st_mtime_ns, cfg_size=cfg_stat.st_size, 
+                    cfg=cfg_text, sample_rates=np.array(self._cfg.sample_rates), 
+                    total_samples=self._total_samples, time=self._time_values, 
+                    analog=self._analog_values, status=self._status_values)
+            os.replace(tmp_filepath, cache_filepath)
+            tmp_filepath = None
+        except OSError:
+            # e.g. a read-only directory, the cache is only an optimization
+            if not self.ignore_warnings:
+                warnings.warn(Warning("Could not write COMTRADE cache {}".format(cache_filepath)))
+        finally:
+            if tmp_filepath is not None and os.path.exists(tmp_filepath):
+                os.remove(tmp_filepath)
+
     def _load_inf(self, inf_file):
         if os.path.exists(inf_file):
             with open(inf_file, 'r') as file:
@@ -806,6 +1055,29 @@ class AnalogChannel(Channel):
         return ','.join(fields)
 
 
+class _LazyChannels:
+    """Sequence of channel arrays decoded and cached on first access."""
+    def __init__(self, decode, count):
+        self._decode = decode
+        self._values = [None] * count
+
+    def __len__(self):
+        return len(self._values)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[k] for k in range(len(self._values))[i]]
+        # normalise negative and numpy integer indices to one cache slot
+        i = range(len(self._values))[operator.index(i)]
+        if self._values[i] is None:
+            self._values[i] = self._decode(i)
+        return self._values[i]
+
+    def __iter__(self):
+        for i in range(len(self._values)):
+            yield self[i]
+
+
 class DatReader:
     """Abstract DatReader class. Used to parse DAT file contents."""
     read_mode = "r"
@@ -858,39 +1130,63 @@ class DatReader:
         analog_count = self._cfg.analog_count
         status_count = self._cfg.status_count
 
-        # preallocate analog and status values
-        self.time = [0.0] * steps
-        self.analog  = [None] * analog_count
-        self.status = [None] * status_count
-        # preallocate each channel values with zeros
-        for i in range(analog_count):
-            self.analog[i]  = [0.0] * steps
-        for i in range(status_count):
-            self.status[i] = [0]   * steps
+        # preallocate analog and status values, one contiguous row per channel
+        self.time = np.zeros(steps, dtype=np.float64)
+        self.analog = np.zeros((analog_count, steps), dtype=np.float64)
+        self.status = np.zeros((status_count, steps), dtype=np.int8)
 
-    def _get_samp(self, n):
-        """Get the sampling rate for a sample n (1-based index)."""
-        # TODO: make tests.
-        last_sample_rate = None
-        for samp, endsamp in self._cfg.sample_rates:
-            if endsamp < n:
-                last_sample_rate = nrates
-            else:
+    def _store(self, time, analog, status):
+        """Store decoded values into the preallocated arrays."""
+        nrows = time.shape[0]
+        if nrows == self._total_samples:
+            self.time, self.analog, self.status = time, analog, status
+        else:
+            self.time[:nrows] = time
+            self.analog[:, :nrows] = analog
+            self.status[:, :nrows] = status
+
+    def iter_blocks(self, contents, cfg, block_size):
+        """
+        Yield (time, analog, status) tuples of at most block_size samples, 
+        reading contents one block at a time.
+        """
+        self._cfg = cfg
+        self._total_samples = cfg.sample_rates[-1][1]
+        remaining = self._total_samples
+        while remaining > 0:
+            block = self._read_block(contents, min(block_size, remaining))
+            nrows = block[0].shape[0]
+            if nrows == 0:
                 break
-        return last_sample_rate
+            remaining -= nrows
+            yield block
+
+    def _read_block(self, contents, count):
+        """Virtual method, read and decode up to count samples."""
+        pass
+
+    def _get_samp(self, n):
+        """Get the sampling rate for sample(s) n (1-based index)."""
+        rates = np.array([samp for samp, endsamp in self._cfg.sample_rates])
+        endsamps = np.array([endsamp for samp, endsamp in self._cfg.sample_rates])
+        idx = np.minimum(np.searchsorted(endsamps, n), len(rates) - 1)
+        return rates[idx]
 
     def _get_time(self, n, ts_value, time_base, time_mult):
+        """
+        Return the time in seconds of sample(s) n, given the DAT timestamp(s).
+
+        n and ts_value may be scalars or arrays of the same length.
+        """
         # TODO: add option to enforce dat file timestamp, when available.
-        # TODO: make tests.
-        ts = 0
-        if ts_value != TIMESTAMP_MISSING:
-            # Use provided timestamp if its not missing
-            ts = ts_value * time_base * time_mult
-        else:
+        ts_value = np.asarray(ts_value, dtype=np.float64)
+        ts = ts_value * time_base * time_mult
+        missing = ts_value == TIMESTAMP_MISSING
+        if np.any(missing):
             if not self._cfg._timestamp_critical:
                 # if the timestamp is missing, use calculated.
-                sample_rate = self._get_samp(n)
-                ts = (n - 1) / sample_rate
+                n = np.asarray(n, dtype=np.float64)
+                ts = np.where(missing, (n - 1) / self._get_samp(n), ts)
             else:
                 raise Exception("Missing timestamp and no sample rate provided.")
         return ts
@@ -908,41 +1204,55 @@ class AsciiDatReader(DatReader):
 
     def parse(self, contents):
         """Parse a ASCII file contents."""
-        analog_count  = self._cfg.analog_count
-        status_count = self._cfg.status_count
-        time_mult = self._cfg.timemult
-        time_base = self._cfg.time_base
-
-        # auxillary vectors (channels gains and offsets)
-        a = [x.a for x in self._cfg.analog_channels]
-        b = [x.b for x in self._cfg.analog_channels]
-
         # extract lines
         if type(contents) is str:
             lines = contents.splitlines()
+        elif hasattr(contents, 'read'):
+            lines = contents.read().splitlines()
         else:
-            lines = contents
+            lines = list(contents)
 
-        line_number = 0
-        for line in lines:
-            line_number = line_number + 1
-            if line_number <= self._total_samples:
-                values = line.strip().split(self.ASCII_SEPARATOR)
+        self._store(*self._decode_lines(lines, self._total_samples))
 
-                n = values[0]
-                # Read time
-                ts_val = float(values[1])
-                ts = self._get_time(n, ts_val, time_base, time_mult)
+    def _read_block(self, contents, count):
+        return self._decode_lines(list(itertools.islice(contents, count)), count)
 
-                avalues = [float(x)*a[i] + b[i] for i, x in enumerate(values[2:analog_count+2])]
-                svalues = [int(x) for x in values[status_count+2:]]
+    def _decode_lines(self, lines, max_rows):
+        """Return (time, analog, status) arrays of ASCII DAT lines."""
+        analog_count  = self._cfg.analog_count
+        status_count = self._cfg.status_count
+        time_mult = self._cfg.timemult
+        time_base = self._cfg.time_base
 
-                # store
-                self.time[line_number-1] = ts
-                for i in range(analog_count):
-                    self.analog[i][line_number - 1]  = avalues[i]
-                for i in range(status_count):
-                    self.status[i][line_number - 1] = svalues[i]
+        # auxillary vectors (channels gains and offsets)
+        a = np.array([x.a for x in self._cfg.analog_channels], dtype=np.float64)
+        b = np.array([x.b for x in self._cfg.analog_channels], dtype=np.float64)
+
+        # tokenize every row in one pass
+        ncols = 2 + analog_count + status_count
+        if len(lines) == 0:
+            values = np.zeros((0, ncols))
+        else:
+            try:
+                values = np.loadtxt(lines, dtype=np.float64, 
+                    delimiter=self.ASCII_SEPARATOR, usecols=range(ncols), 
+                    max_rows=max_rows, ndmin=2)
+            except ValueError:
+                # empty timestamp fields are missing, see _get_time
+                missing = lambda x: float(x) if len(x.strip()) > 0 else TIMESTAMP_MISSING
+                values = np.loadtxt(lines, dtype=np.float64, 
+                    delimiter=self.ASCII_SEPARATOR, usecols=range(ncols), 
+                    max_rows=max_rows, ndmin=2, converters={1: missing})
+
+        time = self._get_time(values[:, 0], values[:, 1], time_base, time_mult)
+
+        # y = a * x + b
+        analog = np.ascontiguousarray(values[:, 2:analog_count+2].T)
+        analog *= a[:, np.newaxis]
+        analog += b[:, np.newaxis]
+        status = np.ascontiguousarray(values[:, analog_count+2:ncols].T, 
+            dtype=np.int8)
+        return time, analog, status
 
 
 class BinaryDatReader(DatReader):
@@ -957,6 +1267,8 @@ class BinaryDatReader(DatReader):
 
     read_mode = "rb"
 
+    ANALOG_DTYPE = '<i2'
+
     STRUCT_FORMAT = "LL {acount:d}h {dcount:d}H"
     STRUCT_FORMAT_ANALOG_ONLY = "LL {acount:d}h"
     STRUCT_FORMAT_STATUS_ONLY = "LL {dcount:d}H"
@@ -977,92 +1289,111 @@ class BinaryDatReader(DatReader):
             # Status channels only.
             return self.STRUCT_FORMAT_STATUS_ONLY.format(acount=dcount)
 
+    def open(self, dat_filepath, cfg):
+        """Memory-map a DAT file, leaving its channels to be decoded on demand."""
+        self.filepath = dat_filepath
+        self._content = None
+        if not os.path.isfile(self.filepath):
+            raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), 
+                self.filepath)
+        self._cfg = cfg
+        rowtype = self.get_record_dtype(cfg.analog_count, cfg.status_count)
+        nrows = min(os.path.getsize(self.filepath) // rowtype.itemsize, 
+            cfg.sample_rates[-1][1])
+        self._total_samples = nrows
+        if nrows > 0:
+            self._records = np.memmap(self.filepath, dtype=rowtype, mode='r', 
+                shape=(nrows,))
+        else:
+            self._records = np.zeros(0, dtype=rowtype)
+
+    def decode_time(self):
+        """Return the time values of memory-mapped records."""
+        return self._get_time(self._records['n'], self._records['ts'], 
+            self._cfg.time_base, self._cfg.timemult)
+
+    def decode_analog(self, i):
+        """Return the scaled values of analog channel i of memory-mapped records."""
+        channel = self._cfg.analog_channels[i]
+        values = self._records['analog'][:, i].astype(np.float64)
+        values *= channel.a
+        values += channel.b
+        return values
+
+    def decode_status(self, i):
+        """Return the values of status channel i of memory-mapped records."""
+        words = self._records['status'][:, i // 16]
+        return ((words >> (i % 16)) & 1).astype(np.int8)
+
+    def get_record_dtype(self, analog_channels, status_channels):
+        """Return the structured NumPy dtype of one DAT file record."""
+        groups_of_16bits = math.ceil(status_channels / 16.0)
+        fields = [('n', '<u4'), ('ts', '<u4')]
+        if int(analog_channels) > 0:
+            fields.append(('analog', self.ANALOG_DTYPE, (int(analog_channels),)))
+        if groups_of_16bits > 0:
+            fields.append(('status', '<u2', (groups_of_16bits,)))
+        return np.dtype(fields)
+
     def parse(self, contents):
         """Parse DAT binary file contents."""
+        rowtype = self.get_record_dtype(self._cfg.analog_count, 
+            self._cfg.status_count)
+        if hasattr(contents, 'read'):
+            # It's an IO buffer.
+            buf = contents.read()
+        else:
+            # It's an array.
+            buf = contents
+        nrows = min(len(buf) // rowtype.itemsize, self._total_samples)
+        records = np.frombuffer(buf, dtype=rowtype, count=nrows)
+
+        self._store(*self._decode_records(records))
+
+    def _read_block(self, contents, count):
+        rowtype = self.get_record_dtype(self._cfg.analog_count, 
+            self._cfg.status_count)
+        buf = contents.read(count * rowtype.itemsize)
+        records = np.frombuffer(buf, dtype=rowtype, 
+            count=len(buf) // rowtype.itemsize)
+        return self._decode_records(records)
+
+    def _decode_records(self, records):
+        """Return (time, analog, status) arrays of structured DAT records."""
         time_mult = self._cfg.timemult
         time_base = self._cfg.time_base
         achannels = self._cfg.analog_count
         schannel = self._cfg.status_count
+        nrows = records.shape[0]
 
         # auxillary vectors (channels gains and offsets)
-        a = [x.a for x in self._cfg.analog_channels]
-        b = [x.b for x in self._cfg.analog_channels]
-
-        sample_id_bytes = self.SAMPLE_NUMBER_BYTES + self.TIME_BYTES
-        abytes = achannels*self.ANALOG_BYTES
-        dbytes = self.STATUS_BYTES * math.ceil(schannel / 16.0)
-        bytes_per_row = sample_id_bytes + abytes + dbytes
-        groups_of_16bits = math.floor(dbytes / self.STATUS_BYTES)
-
-        # Struct format.
-        rowreader = struct.Struct(self.get_reader_format(achannels, dbytes))
-        bufsiz = struct.calcsize(self.get_reader_format(achannels, dbytes))
-#       print ('achannels', achannels)
-#       print ('schannels', schannel)
-#       print ('sample_id_bytes', sample_id_bytes)
-#       print ('abytes', abytes)
-#       print ('dbytes', dbytes)
-#       print ('bytes_per_row', bytes_per_row)
-#       print ('groups_of_16bits', groups_of_16bits)
-#       print ('buffer', self.get_reader_format(achannels, dbytes))
-#       print ('calcsize', bufsiz)
-#       print ('struct.size', rowreader.size)
-#       print ('II', struct.calcsize('II'))
-#       print ('26i', struct.calcsize('26i'))
-#       print ('20H', struct.calcsize('20H'))
-
-        # Row reading function.
-        nextrow = None
-        if hasattr(contents, 'read'):
-            # It's an IO buffer.
-            nextrow = lambda offset: contents.read(bytes_per_row)
-        else:
-            # It's an array.
-            nextrow = lambda offset: contents[offset:offset + bytes_per_row]
-
-        # Get next row.
-        buffer_offset = 0
-        row = nextrow(buffer_offset)
-
-        irow = 0
-        while row != b'':
-            values = rowreader.unpack(row)
-            # Sample number
-            n = values[0]
-            # Time stamp
-            ts_val = values[1]
-            ts = self._get_time(n, ts_val, time_base, time_mult)
+        a = np.array([x.a for x in self._cfg.analog_channels], dtype=np.float64)
+        b = np.array([x.b for x in self._cfg.analog_channels], dtype=np.float64)
 
-            self.time[irow] = ts
+        time = self._get_time(records['n'], records['ts'], time_base, time_mult)
 
-            # Extract analog channel values.
-            for ichannel in range(achannels):
-                yint = values[ichannel + 2]
-                y = a[ichannel] * yint + b[ichannel]
-                self.analog[ichannel][irow] = y
-
-            # Extract status channel values.
-            for igroup in range(groups_of_16bits):
-                group = values[achannels + 2 + igroup]
-
-                # for each group of 16 bits, extract the status channels
-                maxchn = min([ (igroup+1) * 16, schannel])
-                for ichannel in range(igroup * 16, maxchn):
-                    chnindex = ichannel - igroup*16
-                    mask = int('0b01', 2) << chnindex
-                    extract = (group & mask) >> chnindex
-
-                    self.status[ichannel][irow] = extract
+        # Extract analog channel values, y = a * yint + b
+        if achannels > 0:
+            analog = np.ascontiguousarray(records['analog'].T, dtype=np.float64)
+            analog *= a[:, np.newaxis]
+            analog += b[:, np.newaxis]
+        else:
+            analog = np.zeros((0, nrows))
 
-            # Get the next row
-            irow += 1
-            buffer_offset += bytes_per_row
-            row = nextrow(buffer_offset)
+        # Extract status channel values, bit k of group g is channel 16*g + k
+        if schannel > 0:
+            words = np.ascontiguousarray(records['status'])
+            bits = np.unpackbits(words.view(np.uint8), axis=1, bitorder='little')
+            status = np.ascontiguousarray(bits[:, :schannel].T, dtype=np.int8)
+        else:
+            status = np.zeros((0, nrows), dtype=np.int8)
+        return time, analog, status
 
 
 class Binary32DatReader(BinaryDatReader):
     """32-bit binary format DatReader subclass."""
     ANALOG_BYTES = 4
+    ANALOG_DTYPE = '<i4'
 
 #    STRUCT_FORMAT = "LL {acount:d}l {dcount:d}H"
 #    STRUCT_FORMAT_ANALOG_ONLY = "LL {acount:d}l"
@@ -1077,6 +1408,7 @@ class Binary32DatReader(BinaryDatReader):
 class Float32DatReader(BinaryDatReader):
     """Single precision (float) binary format DatReader subclass."""
     ANALOG_BYTES = 4
+    ANALOG_DTYPE = '<f4'
 
     STRUCT_FORMAT = "LL {acount:d}f {dcount:d}H"
     STRUCT_FORMAT_ANALOG_ONLY = "LL {acount:d}f"
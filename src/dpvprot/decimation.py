@@ -0,0 +1,123 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: decimation.py
+""" Rate changes of recorded or simulated waveforms, for phasor and relay analysis.
+
+The sampling rate fs is changed to the target rate by the exact rational
+factor up / down, e.g. 48 / 3125 from 1 MHz to 15.36 kHz, i.e., 256 samples
+per 60-Hz cycle, with a polyphase FIR filter. A block of channels, e.g.
+shape (channels, N), is filtered along one axis in a single call.
+
+The linear-phase FIR filter is designed once for each pair of rates and
+cached, so that repeated calls on the channels or cases of a study do not
+redesign it. Optionally, the filtering is done in float32, which halves the
+memory needed for long 1-MHz records.
+
+Simulation time steps that are rounded decimals have no exact factor, so a
+nearby simple factor is used, with a small error in the new rate, and rates
+within that tolerance of the target are not changed at all.
+
+Public Functions:
+    :rate_factors: the up and down factors from fs to the target rate
+    :design_filter: the cached FIR filter for a rate change
+    :decimate: changes the sampling rate of a block of channels
+    :decimated_times: time points of the decimated samples
+"""
+
+from fractions import Fraction
+import numpy as np
+from scipy import signal
+
+_filters = {}
+
+def _simplest (ratio, rtol, max_denominator):
+    """Returns the fraction with the smallest down factor, in steps of 10 up to max_denominator, within rtol of ratio, or None"""
+    limit = 1
+    while True:
+        frac = ratio.limit_denominator (limit)
+        if abs (frac - ratio) <= rtol * ratio:
+            return frac
+        if limit >= max_denominator:
+            return None
+        limit = min (10 * limit, max_denominator)
+
+def rate_factors (fs, target, rtol=1.0e-9, max_denominator=10000, tol=1.0e-4, max_fallback=1000):
+    """Finds the smallest integers up and down with target / fs = up / down.
+
+    Sampling rates read from COMTRADE files may carry rounding errors, so the
+    simplest fraction within rtol of the rate ratio is taken. Simulation time
+    steps are often rounded decimals, e.g. 6.5104e-5 s for 256 samples per
+    cycle, with no exact fraction of reasonable size. Then the simplest fraction
+    within tol is taken, or else the nearest one with down <= max_fallback,
+    accepting a small error in the new rate. Ratios within tol of 1 need no
+    rate change at all.
+
+    Args:
+        fs (float): original sampling rate
+        target (float): new sampling rate
+        rtol (float): relative tolerance on the rate ratio for an exact rate change
+        max_denominator (int): largest down factor of an exact rate change
+        tol (float): relative rate error accepted when there is no exact rate change
+        max_fallback (int): largest down factor of an approximate rate change
+
+    Returns:
+        tuple: (up, down), (1, 1) if no rate change is needed
+    """
+    ratio = Fraction (target) / Fraction (fs)
+    if abs (ratio - 1) <= tol:
+        return 1, 1
+    frac = _simplest (ratio, rtol, max_denominator)
+    if frac is None:
+        frac = _simplest (ratio, tol, max_fallback)
+    if frac is None:
+        frac = ratio.limit_denominator (max_fallback)
+    return frac.numerator, frac.denominator
+
+def design_filter (fs, target):
+    """Returns the up and down factors, and the low-pass FIR filter, for a rate change.
+
+    The filter is that of scipy.signal.resample_poly, a Kaiser-windowed sinc
+    with 10 zero crossings on each side, designed on the first call for each
+    (fs, target) pair. Without a rate change, the filter is a single unit tap.
+
+    Returns:
+        tuple: (up, down, h)
+    """
+    key = (float (fs), float (target))
+    if key not in _filters:
+        up, down = rate_factors (fs, target)
+        max_rate = max (up, down)
+        if max_rate == 1:
+            h = np.ones (1)
+        else:
+            h = signal.firwin (20 * max_rate + 1, 1.0 / max_rate, window=('kaiser', 5.0))
+        _filters[key] = (up, down, h)
+    return _filters[key]
+
+def decimate (x, fs, target, axis=-1, dtype=None):
+    """Changes the sampling rate of a block of channels.
+
+    Args:
+        x (array): samples, with time along axis, e.g. shape (channels, N)
+        fs (float): sampling rate of x
+        target (float): new sampling rate, usually lower than fs
+        axis (int): the time axis of x
+        dtype (type): np.float32 to filter in single precision, defaults to the type of x or float64
+
+    Returns:
+        array: with ceil(N * up / down) samples along axis
+    """
+    if dtype is None:
+        x = np.asarray (x)
+        if x.dtype != np.float32:
+            x = x.astype (np.float64, copy=False)
+    else:
+        x = np.asarray (x, dtype=dtype)
+    up, down = rate_factors (fs, target)
+    if up == down:
+        return x.copy ()
+    up, down, h = design_filter (fs, target)
+    return signal.resample_poly (x, up, down, axis=axis, window=h.astype (x.dtype))
+
+def decimated_times (t0, n, target):
+    """Returns the n time points of decimated samples at the target rate, starting at t0"""
+    return t0 + np.arange (n) / target
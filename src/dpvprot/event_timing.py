@@ -0,0 +1,142 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: event_timing.py
+""" Pickup and dropout times of relay elements from sampled signals.
+
+The element outputs are boolean masks with time along the last axis, e.g.
+shape (channels, N) or (thresholds, channels, N), so that many channels,
+loops, settings or threshold bands are timed in one call. Runs of picked-up
+samples are found by run-length encoding, from the rising and falling edges
+of each mask, without a Python loop over the samples.
+
+Times are returned relative to a reference time, usually the fault time,
+and are -1.0 for elements that never pick up. Durations are the number of
+picked-up samples times the sample interval.
+
+Public Functions:
+    :threshold_masks: masks of signals above, or below, each of several thresholds
+    :first_pickup: time of the first picked-up sample
+    :pickup_times: first pickup, dropout, last and final-run times, and durations
+    :earliest: earliest of several pickup times
+"""
+
+import numpy as np
+
+NONE = -1.0
+
+def threshold_masks (x, thresholds, below=False):
+    """Compares signals to several thresholds at once.
+
+    Args:
+        x (array): signals with time along the last axis, e.g. shape (3, N)
+        thresholds (list): K threshold values
+        below (bool): True to pick up below the threshold, e.g. for undervoltage
+
+    Returns:
+        array: boolean, shape (K,) + x.shape
+    """
+    x = np.asarray (x)
+    thr = np.reshape (np.asarray (thresholds, dtype=float), (-1,) + (1,) * x.ndim)
+    if below:
+        return x < thr
+    return x > thr
+
+def _times_at (t, idx, shape):
+    """Looks up times at sample indices idx, for a common t of shape (N,) or t broadcast to shape"""
+    t = np.asarray (t)
+    if t.ndim == 1:
+        return t[idx]
+    t = np.broadcast_to (t, shape)
+    return np.take_along_axis (t, idx[..., np.newaxis], axis=-1)[..., 0]
+
+def first_pickup (mask, t, tref=0.0, tmin=None):
+    """Returns the time of the first picked-up sample along the last axis.
+
+    Args:
+        mask (array): element outputs, e.g. shape (channels, N); nonzero is picked up
+        t (array): time points, shape (N,) or broadcastable to mask
+        tref (float): reference time subtracted from the result
+        tmin (float): optional, samples before tmin are ignored
+
+    Returns:
+        array: shape mask.shape[:-1], or a float for a single signal; NONE where never picked up
+    """
+    mask = np.asarray (mask) > 0
+    if tmin is not None:
+        mask = mask & (np.asarray (t) >= tmin)
+    idx = np.argmax (mask, axis=-1)
+    vals = np.where (np.any (mask, axis=-1), _times_at (t, idx, mask.shape) - tref, NONE)
+    if np.ndim (vals) == 0:
+        return float (vals)
+    return vals
+
+def pickup_times (mask, t, tref=0.0, tmin=None):
+    """Times the runs of picked-up samples along the last axis.
+
+    Args:
+        mask (array): element outputs, e.g. shape (channels, N); nonzero is picked up
+        t (array): time points, shape (N,), evenly spaced
+        tref (float): reference time subtracted from the pickup and dropout times
+        tmin (float): optional, samples before tmin are ignored
+
+    Returns:
+        dict: of arrays with shape mask.shape[:-1], with keys
+          first (time of the first picked-up sample),
+          dropout (time of the first sample after the first run, NONE if it never drops out),
+          last (time of the last picked-up sample),
+          span (last minus first, 0.0 if never picked up),
+          final (start time of the run still picked up at the end, NONE if none),
+          longest (duration of the longest run),
+          total (duration of all runs),
+          runs (number of runs)
+    """
+    t = np.asarray (t)
+    mask = np.asarray (mask) > 0
+    if tmin is not None:
+        mask = mask & (t >= tmin)
+    shape = mask.shape[:-1]
+    npt = mask.shape[-1]
+    rows = mask.reshape (-1, npt)
+    nrows = rows.shape[0]
+    dt = t[1] - t[0] if npt > 1 else 0.0
+
+    # rising edges start runs, falling edges end them (exclusive), in row-major order
+    edges = np.diff (rows.astype (np.int8), axis=-1, prepend=0, append=0)
+    rstart, istart = np.nonzero (edges > 0)
+    rend, iend = np.nonzero (edges < 0)
+    lengths = iend - istart
+
+    runs = np.bincount (rstart, minlength=nrows)
+    bHas = runs > 0
+    first = np.full (nrows, npt)
+    np.minimum.at (first, rstart, istart)
+    firstend = np.full (nrows, npt + 1)
+    np.minimum.at (firstend, rend, iend)
+    laststart = np.full (nrows, -1)
+    np.maximum.at (laststart, rstart, istart)
+    lastend = np.zeros (nrows, dtype=int)
+    np.maximum.at (lastend, rend, iend)
+    longest = np.zeros (nrows, dtype=int)
+    np.maximum.at (longest, rstart, lengths)
+    total = np.bincount (rstart, weights=lengths, minlength=nrows)
+
+    first = np.minimum (first, npt - 1)
+    tfirst = np.where (bHas, t[first] - tref, NONE)
+    tlast = np.where (bHas, t[np.maximum (lastend - 1, 0)] - tref, NONE)
+    bDrop = bHas & (firstend < npt)
+    tdrop = np.where (bDrop, t[np.minimum (firstend, npt - 1)] - tref, NONE)
+    bFinal = rows[:, -1] if npt > 0 else np.zeros (nrows, dtype=bool)
+    tfinal = np.where (bFinal, t[np.maximum (laststart, 0)] - tref, NONE)
+
+    vals = {'first': tfirst, 'dropout': tdrop, 'last': tlast,
+            'span': np.where (bHas, tlast - tfirst, 0.0), 'final': tfinal,
+            'longest': longest * dt, 'total': total * dt, 'runs': runs}
+    return {key: val.reshape (shape) for key, val in vals.items()}
+
+def earliest (times, axis=-1):
+    """Returns the earliest of several pickup times along axis, e.g. over phases, or NONE if none picked up"""
+    times = np.asarray (times, dtype=float)
+    vals = np.min (np.where (times >= 0.0, times, np.inf), axis=axis)
+    vals = np.where (np.isinf (vals), NONE, vals)
+    if np.ndim (vals) == 0:
+        return float (vals)
+    return vals
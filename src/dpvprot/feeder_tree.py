@@ -0,0 +1,150 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: feeder_tree.py
+""" Rooted-tree indexing of a radial feeder graph.
+
+The feeder graph is traversed once, breadth-first from the source bus,
+so that the path from any bus back to the source is a chain of parent
+pointers instead of a graph search. On a radial feeder, that chain is
+the same as the route from nx.shortest_path. Buses not connected to the
+source are left out of the index.
+
+Public Functions:
+    :tree_index: parent, depth and nearest upstream device of every bus
+    :upstream_devices: the protective devices between a bus and the source
+    :next_hop: the first bus on the tree path from one bus toward another
+    :protection_zones: the device zone of every bus, as a dictionary and as arrays
+"""
+
+from bisect import bisect_right
+from collections import deque
+import numpy as np
+
+def tree_index (G, source_bus, devices=()):
+    """Indexes the tree of G rooted at source_bus, in one traversal.
+
+    Args:
+        G (nx.Graph): the feeder topology, with bus names as nodes
+        source_bus (str): the root of the tree
+        devices (container): buses with protective devices, e.g. the recloser dictionary
+
+    Returns:
+        dict: with keys source, order (buses in traversal order, parents first),
+        parent (None at the source), depth (branches from the source),
+        upstream (the nearest device bus at or above each bus, or None),
+        children (in preorder), pre and size, the preorder number and
+        subtree size of each bus, so that the subtree of a bus holds the
+        preorder numbers from pre to pre+size-1, and child_pre, the preorder
+        numbers of the children of each bus
+    """
+    parent = {source_bus: None}
+    depth = {source_bus: 0}
+    upstream = {source_bus: source_bus if source_bus in devices else None}
+    order = [source_bus]
+    queue = deque ([source_bus])
+    while len(queue) > 0:
+        bus = queue.popleft()
+        for nbr in G.adj[bus]:
+            if nbr not in parent:
+                parent[nbr] = bus
+                depth[nbr] = depth[bus] + 1
+                upstream[nbr] = nbr if nbr in devices else upstream[bus]
+                order.append (nbr)
+                queue.append (nbr)
+
+    # subtree sizes from the leaves up, then preorder numbers from the source down
+    size = dict.fromkeys (order, 1)
+    for bus in reversed (order[1:]):
+        size[parent[bus]] += size[bus]
+    children = {bus: [] for bus in order}
+    for bus in order[1:]:
+        children[parent[bus]].append (bus)
+    pre = {source_bus: 0}
+    child_pre = {}
+    for bus in order:
+        nxt = pre[bus] + 1
+        child_pre[bus] = []
+        for child in children[bus]:
+            pre[child] = nxt
+            child_pre[bus].append (nxt)
+            nxt += size[child]
+    return {'source': source_bus, 'order': order, 'parent': parent, 'depth': depth, 'upstream': upstream,
+            'children': children, 'pre': pre, 'size': size, 'child_pre': child_pre}
+
+def upstream_devices (tree, bus, include_self=True):
+    """Generates the device buses from bus toward the source, nearest first.
+
+    Each step follows the upstream pointer of the parent, so the cost depends
+    on the number of devices passed, not on the number of buses.
+
+    Args:
+        tree (dict): from tree_index
+        bus (str): where to start
+        include_self (bool): whether a device at bus itself is included
+    """
+    if include_self:
+        dev = tree['upstream'][bus]
+    else:
+        dev = bus
+        up = tree['parent'][dev]
+        dev = tree['upstream'][up] if up is not None else None
+    while dev is not None:
+        yield dev
+        up = tree['parent'][dev]
+        dev = tree['upstream'][up] if up is not None else None
+
+def next_hop (tree, bus, target):
+    """Returns the neighbor of bus on the tree path to target.
+
+    If target lies below bus, this is the child whose subtree holds target,
+    found by bisection on the preorder numbers. Otherwise it is the parent.
+    """
+    pre = tree['pre']
+    p = pre[target]
+    if pre[bus] < p < pre[bus] + tree['size'][bus]:
+        return tree['children'][bus][bisect_right (tree['child_pre'][bus], p) - 1]
+    return tree['parent'][bus]
+
+def protection_zones (tree, level=None, tolerance=0.1):
+    """Assigns each bus to the zone of the nearest device at or above it, in one traversal.
+
+    Zone labels are passed from parent to child in traversal order. With level,
+    a bus joins only the zone of a device within tolerance of its own level, so
+    zones stop at transformers. The label is still inherited from the parent at
+    the same level, and only a bus whose level differs from its parent searches
+    the devices above it.
+
+    Args:
+        tree (dict): from tree_index, with the devices that start zones
+        level (dict): optional nominal kV of each bus; a bus without one joins no zone
+        tolerance (float): largest kV difference between a bus and its zone device
+
+    Returns:
+        dict: with keys zone (the device bus of each bus, or None), devices
+        (the device buses in traversal order), buses (array of bus names in
+        traversal order), label (array of indices into devices for each of
+        those buses, -1 outside all zones) and size (array of the number of
+        buses in each zone)
+    """
+    parent = tree['parent']
+    upstream = tree['upstream']
+    zone = {}
+    for bus in tree['order']:
+        up = parent[bus]
+        if level is None or upstream[bus] == bus:
+            zone[bus] = upstream[bus]
+        elif up is not None and level.get (bus) == level.get (up):
+            zone[bus] = zone[up]
+        else:
+            zone[bus] = None
+            kv = level.get (bus)
+            if kv is not None:
+                for dev in upstream_devices (tree, bus):
+                    if level.get (dev) is not None and abs (level[dev] - kv) < tolerance:
+                        zone[bus] = dev
+                        break
+    devices = [bus for bus in tree['order'] if upstream[bus] == bus]
+    index = {dev: i for i, dev in enumerate (devices)}
+    label = np.array ([index.get (zone[bus], -1) for bus in tree['order']], dtype=int)
+    size = np.bincount (label[label >= 0], minlength=len(devices))
+    return {'zone': zone, 'devices': devices, 'buses': np.array (tree['order'], dtype=str),
+            'label': label, 'size': size}
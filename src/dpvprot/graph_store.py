@@ -0,0 +1,214 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: graph_store.py
+""" Compact binary storage of the feeder graph written by opendss_graph.py.
+
+The graph is saved as a compressed NumPy .npz file with no pickled objects. Nodes
+are numbered in the order of the NetworkX graph, so each node has an
+integer ID and the names are held in one string array. Edges are two
+arrays of node IDs, and the adjacency is in compressed sparse row (CSR)
+form: the neighbors of node i are indices[indptr[i]:indptr[i+1]], and the
+edges to them are edge[indptr[i]:indptr[i+1]].
+
+Attributes are stored by column, one array per attribute across all nodes
+or all edges, so that bus coordinates, loads or edge classes can be used
+as arrays directly. Attributes held in a dictionary, such as ndata and
+edata, are stored as one column per key, e.g. ndata.kw. A column that is
+missing on some nodes or edges has a boolean mask, col#has. A column of
+string lists, such as ndata.shunts, is stored flat with offsets, col#ptr.
+Values of any other type are stored as JSON strings.
+
+The NetworkX graph, with the same attributes as the node-link JSON file,
+is built only when to_networkx is called.
+
+Public Functions:
+    :from_networkx: packs a NetworkX graph into the array form
+    :save_graph: writes a NetworkX graph to the binary file
+    :load_graph: reads the binary file into the array form
+    :read_feeder_graph: reads root.npz if present, otherwise root.json
+    :to_networkx: builds the NetworkX graph from the array form
+"""
+
+import json
+import os
+import numpy as np
+import networkx as nx
+
+STORE_VERSION = 1
+_MISSING = object ()
+
+def _kind (values):
+    """Chooses the storage kind of a column from its present values"""
+    types = set ([type(val) for val in values])
+    if len(types) < 1:
+        return 'float'
+    if types == {bool}:
+        return 'bool'
+    if types == {int}:
+        return 'int'
+    if types == {float}:
+        return 'float'
+    if types == {str}:
+        return 'str'
+    if types == {dict}:
+        return 'dict'
+    if types == {list} and all ([isinstance (item, str) for val in values for item in val]):
+        return 'strlist'
+    return 'json'
+
+def _encode_column (prefix, name, values, arrays, columns, parent=None, field=None):
+    """Adds the arrays of one column, recursing into dictionaries"""
+    present = [val for val in values if val is not _MISSING]
+    kind = _kind (present)
+    key = prefix + name
+    bHas = len(present) < len(values)
+    if bHas:
+        arrays[key + '#has'] = np.array ([val is not _MISSING for val in values], dtype=bool)
+    columns.append ([name, kind, bHas, parent, name if field is None else field])
+    if kind == 'dict':
+        subkeys = []
+        for val in present:
+            for subkey in val:
+                if subkey not in subkeys:
+                    subkeys.append (subkey)
+        for subkey in subkeys:
+            subvals = [val.get (subkey, _MISSING) if val is not _MISSING else _MISSING for val in values]
+            _encode_column (prefix, name + '.' + subkey, subvals, arrays, columns, name, subkey)
+    elif kind == 'strlist':
+        lists = [val if val is not _MISSING else [] for val in values]
+        arrays[key + '#ptr'] = np.cumsum ([0] + [len(val) for val in lists], dtype=np.int64)
+        arrays[key] = np.array ([item for val in lists for item in val], dtype=str)
+    elif kind == 'json':
+        arrays[key] = np.array ([json.dumps (val) if val is not _MISSING else '' for val in values], dtype=str)
+    else:
+        fill = {'bool': False, 'int': 0, 'float': 0.0, 'str': ''}[kind]
+        dtype = {'bool': bool, 'int': np.int64, 'float': np.float64, 'str': str}[kind]
+        arrays[key] = np.array ([val if val is not _MISSING else fill for val in values], dtype=dtype)
+
+def _encode (G):
+    names = list (G.nodes())
+    if not all ([isinstance (n, str) for n in names]):
+        raise ValueError ('graph_store needs string node names')
+    ids = {n: i for i, n in enumerate (names)}
+    edges = list (G.edges(data=True))
+    src = np.array ([ids[n1] for n1, n2, data in edges], dtype=np.int64)
+    dst = np.array ([ids[n2] for n1, n2, data in edges], dtype=np.int64)
+
+    # CSR adjacency, each edge listed from both ends
+    ends = np.concatenate ((src, dst))
+    other = np.concatenate ((dst, src))
+    eid = np.concatenate ((np.arange (len(edges)), np.arange (len(edges))))
+    order = np.argsort (ends, kind='stable')
+    indptr = np.zeros (len(names) + 1, dtype=np.int64)
+    np.cumsum (np.bincount (ends, minlength=len(names)), out=indptr[1:])
+
+    arrays = {'names': np.array (names, dtype=str), 'src': src, 'dst': dst,
+              'indptr': indptr, 'indices': other[order], 'edge': eid[order]}
+    node_columns = []
+    node_attrs = [data for n, data in G.nodes(data=True)]
+    for key in _attr_keys (node_attrs):
+        _encode_column ('n:', key, [data.get (key, _MISSING) for data in node_attrs], arrays, node_columns)
+    edge_columns = []
+    edge_attrs = [data for n1, n2, data in edges]
+    for key in _attr_keys (edge_attrs):
+        _encode_column ('e:', key, [data.get (key, _MISSING) for data in edge_attrs], arrays, edge_columns)
+    manifest = {'version': STORE_VERSION, 'node_columns': node_columns, 'edge_columns': edge_columns}
+    arrays['manifest'] = np.array (json.dumps (manifest))
+    return arrays
+
+def _attr_keys (attrs):
+    keys = []
+    for data in attrs:
+        for key in data:
+            if key not in keys:
+                keys.append (key)
+    return keys
+
+def _decode (arrays):
+    manifest = json.loads (str (arrays['manifest']))
+    if manifest['version'] != STORE_VERSION:
+        raise ValueError ('unsupported graph_store version {:d}'.format (manifest['version']))
+    names = arrays['names']
+    store = {'names': names, 'ids': {n: i for i, n in enumerate (names.tolist())},
+             'src': arrays['src'], 'dst': arrays['dst'], 'indptr': arrays['indptr'],
+             'indices': arrays['indices'], 'edge': arrays['edge'],
+             'node_columns': manifest['node_columns'], 'edge_columns': manifest['edge_columns'],
+             'nodes': {}, 'edges': {}}
+    for prefix, table, columns in [('n:', store['nodes'], manifest['node_columns']),
+                                   ('e:', store['edges'], manifest['edge_columns'])]:
+        for name, kind, bHas, parent, field in columns:
+            key = prefix + name
+            for suffix in ['', '#has', '#ptr']:
+                if key + suffix in arrays:
+                    table[name + suffix] = arrays[key + suffix]
+    return store
+
+def from_networkx (G):
+    """Packs a NetworkX graph with string node names into the array form returned by load_graph"""
+    return _decode (_encode (G))
+
+def save_graph (G, fname):
+    """Writes a NetworkX graph with string node names to fname, conventionally root.npz"""
+    with open (fname, 'wb') as fp:
+        np.savez_compressed (fp, **_encode (G))
+
+def load_graph (fname):
+    """Reads a graph file written by save_graph.
+
+    Returns:
+        dict: with keys names (node names by ID), ids (node ID by name),
+        src and dst (node IDs of each edge), indptr, indices and edge
+        (CSR adjacency), nodes and edges (attribute columns by name,
+        e.g. store['nodes']['ndata.x']), node_columns and edge_columns
+        (name, kind, whether a #has mask exists, the enclosing dictionary
+        column and the key within it, for each column)
+    """
+    with np.load (fname, allow_pickle=False) as npz:
+        return _decode ({key: npz[key] for key in npz.files})
+
+def read_feeder_graph (root):
+    """Reads the feeder graph from root.npz if it exists, otherwise from the node-link root.json"""
+    if os.path.exists (root + '.npz'):
+        return load_graph (root + '.npz')
+    with open (root + '.json', 'r') as fp:
+        G = nx.readwrite.json_graph.node_link_graph (json.load (fp))
+    return from_networkx (G)
+
+def _rows (table, columns, n):
+    """Rebuilds the attribute dictionaries of n nodes or edges from their columns"""
+    rows = [{} for i in range(n)]
+    parents = {}
+    for name, kind, bHas, parent, field in columns:
+        if bHas:
+            has = table[name + '#has'].tolist()
+        else:
+            has = [True] * n
+        targets = rows if parent is None else parents[parent]
+        if kind == 'dict':
+            subdicts = [{} if has[i] else None for i in range(n)]
+            for i in range(n):
+                if has[i]:
+                    targets[i][field] = subdicts[i]
+            parents[name] = subdicts
+            continue
+        vals = table[name].tolist()
+        if kind == 'strlist':
+            ptr = table[name + '#ptr'].tolist()
+            vals = [vals[ptr[i]:ptr[i+1]] for i in range(n)]
+        for i in range(n):
+            if has[i]:
+                val = vals[i]
+                if kind == 'json':
+                    val = json.loads (val)
+                targets[i][field] = val
+    return rows
+
+def to_networkx (store):
+    """Builds an undirected NetworkX graph with the node and edge attributes of the original graph"""
+    names = store['names'].tolist()
+    G = nx.Graph()
+    G.add_nodes_from (zip (names, _rows (store['nodes'], store['node_columns'], len(names))))
+    src = store['src'].tolist()
+    dst = store['dst'].tolist()
+    erows = _rows (store['edges'], store['edge_columns'], len(src))
+    G.add_edges_from ([(names[src[i]], names[dst[i]], erows[i]) for i in range(len(src))])
+    return G
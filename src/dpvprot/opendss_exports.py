@@ -0,0 +1,203 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: opendss_exports.py
+""" Readers for the OpenDSS export and report files used by RunReduction.py,
+RunSettings.py and CheckReducedLoads.py.
+
+Each file is read in one pass into a NumPy structured array, with bus and
+element names in upper case. Tables are cached by file name, modification
+time and size, so that a file read again is parsed only once, while a file
+rewritten by another OpenDSS solution is parsed again. The cached tables
+are shared, so they are returned read-only.
+
+Public Functions:
+    :read_seqz: short-circuit impedances from cktname_EXP_SEQZ.CSV
+    :read_buses: bus voltages, coordinates and phases from cktname_Buses.Txt
+    :read_elements: two-terminal element buses from cktname_Elements.Txt
+    :read_profile: branch distances from cktname_EXP_Profile.CSV
+    :read_branch_powers: line and transformer terminal flows from cktname_Power_elem_kVA.txt
+    :read_zone: branches of an energy meter zone from cktname_ZoneOut_meter.txt
+    :read_csv_columns: element names and numeric columns from other CSV exports
+"""
+
+import csv
+import math
+import os
+import numpy as np
+
+_cache = {}
+
+def _cached (parse, fname, *args):
+    st = os.stat (fname)
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = (os.path.abspath (fname), parse.__name__, args)
+    hit = _cache.get (key)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    tables = parse (fname, *args)
+    for tbl in (tables if isinstance (tables, tuple) else (tables,)):
+        tbl.flags.writeable = False
+    _cache[key] = (stamp, tables)
+    return tables
+
+def _table (rows, fields):
+    """Packs row tuples into a structured array, sizing each str field to its longest value"""
+    dtype = []
+    for i, (name, typ) in enumerate (fields):
+        if typ is str:
+            width = max ([len(row[i]) for row in rows], default=1)
+            dtype.append ((name, 'U{:d}'.format (max (width, 1))))
+        else:
+            dtype.append ((name, typ))
+    return np.array (rows, dtype=dtype)
+
+def _parse_seqz (fname):
+    rows = []
+    with open (fname, mode='r') as infile:
+        reader = csv.reader (infile)
+        next (reader, None)
+        for row in reader:
+            rows.append ((row[0].upper(), int(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5])))
+    return _table (rows, [('bus', str), ('nph', int), ('r1', float), ('x1', float), ('r0', float), ('x0', float)])
+
+def read_seqz (fname):
+    """Returns bus, nph, r1, x1, r0, x0 [Ohms] from an EXP_SEQZ.CSV file"""
+    return _cached (_parse_seqz, fname)
+
+def _parse_buses (fname):
+    rows = []
+    with open (fname, mode='r') as infile:
+        for i in range(6):
+            next (infile)
+        for line in infile:
+            row = line.split()
+            if len(row) < 1:
+                continue
+            nph_col = 8
+            try:
+                x = float(row[3])
+            except (ValueError, IndexError):
+                x = 0.0
+                nph_col = 7 # because the NA, appears as one token, not NA ,
+            try:
+                y = float(row[5])
+            except (ValueError, IndexError):
+                y = 0.0
+            nph = int(row[nph_col])
+            nodes = row[nph_col+1:nph_col+1+nph]
+            phases = ''
+            for phs, node in zip ('ABC', '123'):
+                if node in nodes:
+                    phases = phases + phs
+            rows.append ((row[0].strip('"').upper(), float(row[1]), x, y, nph, phases))
+    return _table (rows, [('bus', str), ('kV', float), ('x', float), ('y', float), ('nph', int), ('phases', str)])
+
+def read_buses (fname):
+    """Returns bus, kV, x, y, nph and phases (e.g. ABC) from a Buses.Txt file"""
+    return _cached (_parse_buses, fname)
+
+def _parse_elements (fname):
+    rows = []
+    with open (fname, mode='r') as infile:
+        for i in range(7):
+            next (infile)
+        for line in infile:
+            row = line.split()
+            if len(row) < 1:
+                break  # one-bus power conversion elements are up next
+            key = row[0].strip('"').upper()
+            toks = key.split('.')
+            rows.append ((key, toks[0], toks[1], row[1].upper(), row[2].upper()))
+    return _table (rows, [('key', str), ('class', str), ('name', str), ('bus1', str), ('bus2', str)])
+
+def read_elements (fname):
+    """Returns key (class.name), class, name, bus1 and bus2 of the power delivery elements in an Elements.Txt file"""
+    return _cached (_parse_elements, fname)
+
+def _parse_profile (fname):
+    rows = []
+    with open (fname, mode='r') as infile:
+        reader = csv.reader (infile)
+        next (reader, None)
+        for row in reader:
+            rows.append ((row[0].upper(), float(row[1]), float(row[3])))
+    return _table (rows, [('branch', str), ('d1', float), ('d2', float)])
+
+def read_profile (fname):
+    """Returns branch, d1 and d2, the distances of the branch terminals, from an EXP_Profile.CSV file"""
+    return _cached (_parse_profile, fname)
+
+def _parse_branch_powers (fname, classes):
+    keys = []
+    rows = []
+    key = None
+    with open (fname, mode='r') as infile:
+        for ln in infile:
+            line = ln.strip()
+            if len(line) < 1:
+                continue
+            if 'ELEMENT =' in line:
+                key = line.split()[2].strip('"').upper()
+                if key.split('.')[0] in classes:
+                    keys.append (key)
+                else:
+                    key = None
+            elif 'TERMINAL TOTAL' in line:
+                continue
+            elif 'Power Conversion Elements' in line:
+                break
+            elif '= = = = = = =' in line:
+                break
+            elif key is not None:
+                row = line.split()
+                phs = int(row[1])
+                if phs > 0:
+                    rows.append ((key, row[0].strip('"').upper(), phs, float(row[2]), float(row[4])))
+    return (_table ([(k,) for k in keys], [('key', str)])['key'],
+            _table (rows, [('key', str), ('bus', str), ('phase', int), ('p', float), ('q', float)]))
+
+def read_branch_powers (fname, classes=('LINE', 'TRANSFORMER')):
+    """Reads the power delivery element flows from a Power_elem_kVA.txt file.
+
+    Returns:
+        array: the element keys (class.name) in file order
+        array: key, bus, phase (1..3), p [kW] and q [kVAR] for each terminal conductor
+    """
+    return _cached (_parse_branch_powers, fname, tuple (classes))
+
+def _parse_zone (fname):
+    rows = []
+    with open (fname, mode='r') as infile:
+        for ln in infile:
+            line = ln.strip().upper()
+            if ('LINE.' in line) or ('TRANSFORMER.' in line):
+                idx = line.find('(')
+                idxb = line.find(' ')
+                if idxb >= 0 and idxb < idx:
+                    idx = idxb
+                rows.append ((line[:idx], ln.count('\t')))
+    return _table (rows, [('branch', str), ('level', int)])
+
+def read_zone (fname):
+    """Returns branch and level, the tree depth, of the lines and transformers in a ZoneOut file"""
+    return _cached (_parse_zone, fname)
+
+def _parse_csv_columns (fname, columns):
+    rows = []
+    with open (fname, mode='r') as infile:
+        reader = csv.reader (infile)
+        next (reader, None)
+        for row in reader:
+            vals = [row[0].strip().upper()]
+            for col in columns:
+                if col < len(row) and len(row[col].strip()) > 0:
+                    vals.append (float(row[col]))
+                else:
+                    vals.append (math.nan)
+            rows.append (tuple (vals))
+    return _table (rows, [('name', str)] + [('c{:d}'.format (col), float) for col in columns])
+
+def read_csv_columns (fname, columns):
+    """Returns the upper-case first column as name, and each of the numeric columns
+    as c<index>, from a CSV export such as EXP_VOLTAGES_ELEM or EXP_ElemPowers.
+    Columns beyond the end of a row are NaN."""
+    return _cached (_parse_csv_columns, fname, tuple (columns))
@@ -2,7 +2,9 @@
 # file: opendss_graph.py
 """ Build and save a NetworkX graph of the OpenDSS feeder.
 
-Paragraph.
+Writes the graph twice, as node-link JSON in root.json and in the compact
+binary form of graph_store.py in root.npz, which plot_opendss_feeder.py
+reads much faster on large feeders.
 
 Public Functions:
     :main: does the work
@@ -12,6 +14,7 @@ import math
 import sys
 import networkx as nx
 import json
+import dpvprot.graph_store as gs
 
 kvbases = [0.208, 0.418, 0.48, 4.16, 12.47, 13.2, 13.8, 34.5, 69.0, 115.0, 138.0, 230.0]
 def select_kvbase (val):
@@ -142,7 +145,7 @@ def format_ndata(ndata):
 # example: python opendss_graph.py ReducedNetwork ReducedXY.dss
 print ('usage: python opendss_graph.py ReducedNetwork ReducedXY.dss')
 print ('       reads ReducedNetwork.atpmap, ReducedNetwork.dss and ReducedXY.dss')
-print ('       writes ReducedNetwork.json')
+print ('       writes ReducedNetwork.json and ReducedNetwork.npz')
 
 # load in the bus names and numbers with XY coordinates
 busxy = {}
@@ -324,4 +327,5 @@ json_fp = open (root + '.json', 'w')
 json_data = nx.readwrite.json_graph.node_link_data(G)
 json.dump (json_data, json_fp, indent=2)
 json_fp.close()
+gs.save_graph (G, root + '.npz')
 
@@ -0,0 +1,54 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: phasors.py
+""" Sliding-window DFT phasors of sampled waveforms.
+
+The one-cycle DFT is evaluated for every sample at once, from a cumulative
+sum of the demodulated waveform, instead of a dot product per sample.
+Waveforms may be one channel of shape (n,) or a batch of shape (channels, n).
+
+Public Functions:
+    :get_phasors: complex phasor, RMS and referenced angle of waveforms
+"""
+
+import math
+import numpy as np
+
+def get_phasors(v, rs):
+    """Sliding one-cycle DFT of waveforms sampled at rs samples per cycle.
+
+    At sample i, the phasor is taken over the previous min(i, rs) samples,
+    excluding sample i, and the angle is referenced to a phasor rotating
+    at the fundamental frequency.
+
+    Args:
+        v (array): waveform samples, shape (n,) or (channels, n)
+        rs (int): samples per cycle
+
+    Returns:
+        array: complex phasors, peak magnitude, same shape as v
+        array: RMS magnitudes
+        array: angles in radians, between -pi and pi
+    """
+    v = np.asarray(v, dtype=np.float64)
+    n = v.shape[-1]
+    scale = 2 / float(rs)
+    dang = 2 * math.pi / float(rs)
+
+    # S[i] = sum of v[m] * exp(-j*dang*m) for m < i
+    rot = np.exp(-1j * dang * (np.arange(n) % rs))
+    S = np.zeros(v.shape[:-1] + (n + 1,), dtype=complex)
+    np.cumsum(v * rot, axis=-1, out=S[..., 1:])
+
+    # the first cycle grows its window from the start of the record; after
+    # that, the window slides and its DFT is rotated back to phase zero
+    cpx = np.empty(v.shape, dtype=complex)
+    nw = min(n, rs)
+    cpx[..., :nw] = scale * S[..., :nw]
+    cpx[..., nw:] = scale * np.conj(rot[nw:]) * (S[..., rs:n] - S[..., 0:n-rs])
+
+    rms = np.sqrt(0.5) * np.absolute(cpx)
+    ref = np.fmod(dang * np.arange(n), 2 * math.pi)
+    ang = np.angle(cpx) + math.pi - ref
+    ang[ang < 0] += 2 * math.pi
+    ang -= math.pi
+    return cpx, rms, ang
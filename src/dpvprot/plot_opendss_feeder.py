@@ -1,11 +1,12 @@
 # Copyright (C) 2018-2021 Battelle Memorial Institute
 # file: plot_opendss_feeder.py
-""" Plots the OpenDSS feeder from a JSON file
+""" Plots the OpenDSS feeder from its saved graph
 
-Reads the feeder components and coordinates from a local ReducedNetwork.json file.
+Reads the feeder components and coordinates from a local ReducedNetwork.npz file, in the
+binary form of graph_store.py, or from ReducedNetwork.json if there is no .npz file.
 Creates j1reduced.pdf high-quality plot, then shows a screen plot that may be saved to PNG.
 
-ReducedNetwork.json is output from RunReduction.py.  It contains a networkx graph,
+ReducedNetwork.json and ReducedNetwork.npz are output from opendss_graph.py. Each holds a networkx graph,
 with supplemental node and link data to describe the OpenDSS components. In this file,
 a node is as defined by networkx, not as defined by OpenDSS.
 
@@ -78,6 +79,8 @@ import matplotlib.patches as patches
 import networkx as nx
 import sys
 import csv
+import dpvprot.graph_store as gs
+import dpvprot.feeder_tree as ft
 
 lblDeltaY = 0.35
 
@@ -219,9 +222,7 @@ if __name__ == '__main__':
             else:
                 plotLabels = False
 
-    lp = open (feedername + '.json').read()
-    feeder = json.loads(lp)
-    G = nx.readwrite.json_graph.node_link_graph(feeder)
+    G = gs.to_networkx (gs.read_feeder_graph (feedername))
     nbus = G.number_of_nodes()
     nbranch = G.number_of_edges()
     print ('read graph with', nbus, 'nodes and', nbranch, 'edges')
@@ -284,7 +285,7 @@ if __name__ == '__main__':
                 nodeColors.append (get_node_color (nclass))
                 nodeSizes.append (get_node_size (nclass))
 
-    # extract the protection zones
+    # extract the protection zones, in one traversal of the tree from the source
     zones = {}  # keyed on the recloser buses
     target = config['source'][0].lower()
     for n in G.nodes():
@@ -292,16 +293,11 @@ if __name__ == '__main__':
             nclass = G.nodes()[n]['nclass']
             if nclass == 'recloser':
                 zones[n] = []
-    for n1,data in G.nodes(data=True):
-        try:
-            nodes = nx.shortest_path(G, n1, target)
-            for n2 in nodes:
-                if n2 in zones:
-                    zones[n2].append (n1)
-                    break
-#            print (n1, nodes)
-        except:
-            pass
+    if target in G:
+        zone = ft.protection_zones (ft.tree_index (G, target, zones))['zone']
+        for n1 in G.nodes():
+            if zone.get (n1) is not None:  # buses not connected to the source have no zone
+                zones[zone[n1]].append (n1)
     for key, val in zones.items():
         print ('Zone Start Bus {:s}; {:d} OpenDSS Buses; {:s}'.format (key, len(val), ','.join(val)))
     busmap = {}
@@ -0,0 +1,9 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: conftest.py
+""" Puts the dpvprot modules on the path, as the scripts import each other by module name.
+"""
+
+import os
+import sys
+
+sys.path.insert (0, os.path.join (os.path.dirname (os.path.abspath (__file__)), '..', 'src', 'dpvprot'))
@@ -0,0 +1,30 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: test_atp_channels.py
+""" Channel lookup of ATP-generated COMTRADE records.
+"""
+
+import atp_channels
+
+# the PV-to-transformer branch follows the transformer branch, so it would win without precedence
+IDS = ['V-node   FDR  A', 'V-node   FDR  B', 'V-node   FDR  C',
+       'I-branch XF1  ALOAD A', 'I-branch XF1  BLOAD B', 'I-branch XF1  CLOAD C',
+       'I-branch PV1  AXF1  A', 'I-branch PV1  BXF1  B', 'I-branch PV1  CXF1  C',
+       'V-node   XF1  A', 'V-node   XF1  B', 'V-node   XF1  C',
+       'I-branch MODELS WP1']
+
+def test_branch_found_under_both_nodes ():
+    chmap = atp_channels.parse_channel_ids (IDS)
+    assert atp_channels.find_phases (chmap, 'I-branch', 'PV1') == [6, 7, 8]
+    assert atp_channels.find_phases (chmap, 'I-branch', 'XF1') == [6, 7, 8]
+    assert atp_channels.find_phases (chmap, 'I-branch', 'LOAD') == [3, 4, 5]
+
+def test_pv_precedence_over_xf ():
+    chmap = atp_channels.parse_channel_ids (IDS)
+    assert atp_channels.find_phases (chmap, 'I-branch', 'XF1', ['PV1']) == [3, 4, 5]
+    assert atp_channels.find_phases (chmap, 'V-node', 'XF1', ['PV1']) == [9, 10, 11]
+    assert atp_channels.find_phases (chmap, 'V-node', 'FDR') == [0, 1, 2]
+    assert atp_channels.find_model (chmap, 'WP') == 12
+
+def test_only_excluded_channels ():
+    chmap = atp_channels.parse_channel_ids (IDS[6:9])
+    assert atp_channels.find_phases (chmap, 'I-branch', 'XF1', ['PV1']) == [None, None, None]
@@ -0,0 +1,79 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: test_comtrade.py
+""" Lazily decoded channels of a memory-mapped BINARY COMTRADE record.
+"""
+
+import struct
+import numpy as np
+from comtrade import Comtrade
+
+def write_binary (path, n=50, na=3, ns=2):
+    rng = np.random.default_rng (0)
+    cfg = ['STN,DEV,1999', '{:d},{:d}A,{:d}D'.format (na + ns, na, ns)]
+    for i in range(na):
+        cfg.append ('{:d},CH{:d},A,,V,{:g},0.0,0,-32767,32767,1,1,P'.format (i + 1, i, 0.5 + i))
+    for i in range(ns):
+        cfg.append ('{:d},S{:d},,,0'.format (i + 1, i))
+    cfg += ['60', '1', '10000,{:d}'.format (n), '01/01/2020,00:00:00.000000',
+            '01/01/2020,00:00:00.010000', 'BINARY', '1']
+    cfg_file = str (path / 'rec.cfg')
+    with open (cfg_file, 'w') as f:
+        f.write ('\n'.join (cfg) + '\n')
+    ana = rng.integers (-30000, 30000, (n, na))
+    st = rng.integers (0, 2, (n, ns))
+    with open (str (path / 'rec.dat'), 'wb') as f:
+        for r in range(n):
+            word = sum (int (st[r, k]) << k for k in range(ns))
+            f.write (struct.pack ('<II{:d}hH'.format (na), r + 1, 100 * r, *ana[r], word))
+    return cfg_file
+
+def test_lazy_channel_indexing (tmp_path):
+    cfg_file = write_binary (tmp_path)
+    ref = Comtrade ()
+    ref.load (cfg_file)
+    rec = Comtrade ().open (cfg_file)
+    parts = rec.analog[0:2]
+    assert len (parts) == 2
+    for i in range(2):
+        assert np.array_equal (parts[i], ref.analog[i])
+    assert np.array_equal (rec.analog[-1], ref.analog[2])
+    assert rec.analog[np.int64 (2)] is rec.analog[-1]
+    assert len (rec.analog[::-1]) == 3
+    assert np.array_equal (rec.status[-1], ref.status[1])
+
+def test_cache_follows_cfg_edits (tmp_path):
+    cfg_file = write_binary (tmp_path)
+    first = Comtrade ()
+    first.load (cfg_file)
+    assert (tmp_path / 'rec.npz').exists ()
+    with open (cfg_file) as f:
+        text = f.read ()
+    # double the multiplier of CH0, keeping the same file size
+    with open (cfg_file, 'w') as f:
+        f.write (text.replace ('CH0,A,,V,0.5,', 'CH0,A,,V,1.0,'))
+    rec = Comtrade ()
+    rec.load (cfg_file)
+    assert np.allclose (rec.analog[0], 2.0 * np.asarray (first.analog[0]))
+    assert list (tmp_path.glob ('*.tmp')) == []
+
+def test_corrupt_cache_is_rebuilt (tmp_path):
+    cfg_file = write_binary (tmp_path)
+    ref = Comtrade (use_cache=False)
+    ref.load (cfg_file)
+    Comtrade ().load (cfg_file)
+    cache_file = tmp_path / 'rec.npz'
+    data = cache_file.read_bytes ()
+    cache_file.write_bytes (data[:len(data) // 2])
+    rec = Comtrade ()
+    rec.load (cfg_file)
+    assert np.array_equal (rec.analog[1], ref.analog[1])
+    rec = Comtrade ()
+    rec.load (cfg_file)
+    assert np.array_equal (rec.analog[1], ref.analog[1])
+
+def test_channel_accessors (tmp_path):
+    cfg_file = write_binary (tmp_path)
+    rec = Comtrade ().open (cfg_file)
+    assert np.array_equal (rec.analog_channel (np.int64 (2)), rec.analog_channel ('CH2'))
+    assert np.array_equal (rec.analog_channel (-1), rec.analog[2])
+    assert np.array_equal (rec.status_channel (np.int32 (1)), rec.status_channel ('S1'))
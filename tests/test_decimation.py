@@ -0,0 +1,40 @@
+# Copyright (C) 2018-2021 Battelle Memorial Institute
+# file: test_decimation.py
+""" Rate factors and rate changes of the decimation module.
+"""
+
+import numpy as np
+import pytest
+import decimation
+
+RS60 = 256 * 60.0
+
+@pytest.mark.parametrize ('dt, factors', [
+    (1.0e-6, (48, 3125)),        # 1-MHz COMTRADE, exact
+    (1.0 / RS60, (1, 1)),        # already at the target rate
+    (6.5104e-5, (1, 1)),         # rounded ATP step at 256 samples per cycle
+    (6.51e-5, (1, 1)),           # rounded ATP step, not 15624 / 15625
+    (3.2552e-5, (1, 2)),         # rounded ATP step at 512 samples per cycle
+    (1.0 / 30720.0, (1, 2)),
+])
+def test_rate_factors (dt, factors):
+    assert decimation.rate_factors (1.0 / dt, RS60) == factors
+
+def test_approximate_rate_error ():
+    up, down = decimation.rate_factors (1.0 / 3.2552e-5, RS60)
+    assert abs (up / down * (1.0 / 3.2552e-5) / RS60 - 1.0) <= 1.0e-4
+
+def test_decimate_same_rate ():
+    x = np.arange (300.0).reshape (3, 100)
+    y = decimation.decimate (x, RS60, RS60)
+    assert np.array_equal (x, y)
+    assert y is not x
+    up, down, h = decimation.design_filter (RS60, RS60)
+    assert (up, down) == (1, 1)
+
+def test_decimate_rounded_step ():
+    fs = 1.0 / 6.5104e-5
+    x = np.ones ((3, 100))
+    assert decimation.decimate (x, fs, RS60).shape == (3, 100)
+    fs = 1.0 / 3.2552e-5
+    assert decimation.decimate (x, fs, RS60).shape == (3, 50)